@@ -0,0 +1,176 @@
+"""
+Activity Work-in-Progress — WIP and implied queue length per activity.
+
+A case is "in" an activity from the activity's event until the next event
+of the case; the last event of a case is instantaneous. This is the
+duration the bottleneck report gives the activity, so WIP and average
+duration describe the same waiting time (with completion timestamps, the
+time a case waits after the activity completed). A sweep line over these
+intervals (+1 at the start, -1 at the end, sorted per activity, O(n log n))
+gives the number of cases waiting in each activity at every instant:
+
+  - peak WIP:    the highest number of cases open in the activity at once
+  - average WIP: open case-seconds / log time span. By Little's law this is
+                 arrival rate x mean duration, i.e. the implied queue length.
+
+Per series window (process_timeseries bounds) the same metrics come from
+splitting the intervals at the window bounds (average) and from 0-delta
+sweep marks at every window start, which carry the open count into the
+window (peak). Intervals are clipped to the series range, whose ends are
+trimmed of outlying timestamps.
+
+As for the resource workload, intervals are spilled to disk per chunk as
+start-sorted runs and swept in time blocks that carry only the open
+intervals across block boundaries (resource_workload.IntervalRuns).
+
+Output: activity_wip.npz   (per-activity and [window x activity] peak/avg WIP)
+
+Usage:
+  wip = ActivityWIP(activities)
+  wip.update(case, act, ts)              # case-sorted chunks of whole cases
+  bottlenecks = wip.annotate(bottlenecks)
+  save_wip(wip, series.bounds)
+"""
+
+import numpy as np
+import pandas as pd
+
+from resource_workload import IntervalRuns, sweep_line
+
+
+WIP_FILE = 'activity_wip.npz'
+
+
+class ActivityWIP:
+    """Case intervals per activity code (spilled runs), with sweep-line WIP metrics."""
+
+    def __init__(self, activities, spill_dir=None):
+        self.activities = list(activities)
+        self.runs = IntervalRuns(spill_dir)
+        self.open_seconds = np.zeros(len(self.activities))
+        self.first_ts = np.iinfo(np.int64).max
+        self.last_ts = np.iinfo(np.int64).min
+
+    def update(self, case, act, ts, new=None):
+        """
+        Fold a case-sorted chunk of whole cases (no NaT timestamps). new:
+        optional mask of events not folded in before; only intervals that
+        end at a new event are added (a case's old last event gets its
+        interval once the next event arrives).
+        """
+        act = np.asarray(act, dtype=np.int64)
+        ts = np.asarray(ts, dtype=np.int64)
+        case = np.asarray(case)
+        if len(ts) == 0:
+            return self
+        end = ts.copy()
+        same_case = case[1:] == case[:-1]
+        end[:-1][same_case] = ts[1:][same_case]
+        # Events without an activity (code -1) still end the previous interval
+        span = (end > ts) & (act >= 0)
+        if new is not None:
+            span[:-1] &= new[1:]
+        self.open_seconds += np.bincount(act[span], weights=(end - ts)[span] / 1e9,
+                                         minlength=len(self.activities))
+        self.runs.append(act[span], ts[span], end[span])
+        self.first_ts = min(self.first_ts, int(ts.min()))
+        self.last_ts = max(self.last_ts, int(ts.max()))
+        return self
+
+    def merge(self, other):
+        """Fold in the intervals of a disjoint set of cases over the same activities."""
+        self.runs.merge(other.runs)
+        self.open_seconds += other.open_seconds
+        self.first_ts = min(self.first_ts, other.first_ts)
+        self.last_ts = max(self.last_ts, other.last_ts)
+        return self
+
+    def remap(self, activities):
+        """The same intervals keyed by the activity vocabulary of a rebuilt store."""
+        out = ActivityWIP(activities)
+        a = pd.Index(out.activities).get_indexer(self.activities)
+        if (a < 0).any():
+            raise ValueError("event store vocabularies lost names since the WIP state was saved")
+        out.open_seconds[a] = self.open_seconds
+        out.first_ts, out.last_ts = self.first_ts, self.last_ts
+        out.runs.merge(self.runs).remap_keys(a)
+        return out
+
+    def metrics(self):
+        """Peak and average WIP per activity code over the whole log span."""
+        n_act = len(self.activities)
+        peak = np.zeros(n_act, dtype=np.int64)
+        for _, _, act, start, end in self.runs.blocks():
+            point_act, _, open_cases = sweep_line(act, start, end)
+            np.maximum.at(peak, point_act, open_cases)
+        span = (self.last_ts - self.first_ts) / 1e9
+        avg = self.open_seconds / span if span > 0 else np.zeros(n_act)
+        return {'peak_wip': peak, 'avg_wip': avg}
+
+    def series(self, bounds):
+        """[window x activity] peak and average WIP for windows [bounds[w], bounds[w + 1])."""
+        bounds = np.asarray(bounds, dtype=np.int64)
+        n_win, n_act = len(bounds) - 1, len(self.activities)
+        open_seconds = np.zeros(n_win * n_act)
+        peak = np.zeros(n_win * n_act, dtype=np.int64)
+        for lo, hi, act, start, end in self.runs.blocks():
+            start = np.clip(start, bounds[0], bounds[-1])
+            end = np.clip(end, bounds[0], bounds[-1])
+            # Average: open case-seconds of each window / window length
+            first = np.clip(np.searchsorted(bounds, start, side='right') - 1, 0, n_win - 1)
+            last = np.clip(np.searchsorted(bounds, end, side='left') - 1, first, n_win - 1)
+            n_parts = last - first + 1
+            item = np.repeat(np.arange(len(act)), n_parts)
+            win = first[item] + np.arange(len(item)) - np.repeat(np.cumsum(n_parts) - n_parts,
+                                                                 n_parts)
+            seconds = (np.minimum(end[item], bounds[win + 1])
+                       - np.maximum(start[item], bounds[win])) / 1e9
+            open_seconds += np.bincount(win * n_act + act[item], weights=seconds,
+                                        minlength=n_win * n_act)
+
+            # Peak: sweep points plus a mark per (activity, window start in the block)
+            marks = bounds[:-1][bounds[:-1] >= lo]
+            if hi is not None:
+                marks = marks[marks < hi]
+            mark_act = np.repeat(np.arange(n_act), len(marks))
+            mark_ts = np.tile(marks, n_act)
+            point_act, point_ts, open_cases = sweep_line(act, start, end, mark_act, mark_ts)
+            point_win = np.clip(np.searchsorted(bounds, point_ts, side='right') - 1, 0, n_win - 1)
+            np.maximum.at(peak, point_win * n_act + point_act, open_cases)
+        avg = open_seconds.reshape(n_win, n_act) / (np.diff(bounds)[:, None] / 1e9)
+        return {'peak_wip': peak.reshape(n_win, n_act), 'avg_wip': avg}
+
+    def annotate(self, bottlenecks):
+        """Bottleneck report rows with peak_wip and avg_wip columns appended."""
+        m = self.metrics()
+        codes = {name: a for a, name in enumerate(self.activities)}
+        for row in bottlenecks:
+            a = codes.get(row['activity'])
+            row['peak_wip'] = int(m['peak_wip'][a]) if a is not None else 0
+            row['avg_wip'] = round(float(m['avg_wip'][a]), 2) if a is not None else 0
+        return bottlenecks
+
+
+def save_wip(wip, bounds, path=WIP_FILE):
+    m = wip.metrics()
+    series = wip.series(bounds)
+    np.savez_compressed(
+        path,
+        activities=np.array(wip.activities, dtype=str),
+        bounds=np.asarray(bounds, dtype=np.int64),
+        peak_wip=m['peak_wip'].astype(np.int32),
+        avg_wip=m['avg_wip'].astype(np.float32),
+        series_peak_wip=series['peak_wip'].astype(np.int32),
+        series_avg_wip=series['avg_wip'].astype(np.float32),
+    )
+    print(f"[OK] Saved '{path}' ({len(bounds) - 1} windows x {len(wip.activities)} activities, "
+          f"peak WIP {int(m['peak_wip'].max(initial=0))})")
+
+
+def load_wip(path=WIP_FILE):
+    """Arrays written by save_wip(), or None if there is no artifact."""
+    try:
+        with np.load(path) as data:
+            return {k: data[k] for k in data.files}
+    except FileNotFoundError:
+        return None
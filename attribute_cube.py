@@ -0,0 +1,209 @@
+"""
+Attribute OLAP Cube — bottleneck metrics by Spend area, Company and Item Type.
+
+A dense cube over (Spend area text x Company x Item Type x activity) holds
+event counts and duration counts/sums (time until the next event of the
+case), plus the number of cases per attribute combination. Every attribute
+has one extra "(missing)" slot. The real log has a few dozen attribute
+values, so the whole cube is a few hundred KB.
+
+The breakdowns analysts ask for are stored as roll-ups (one dimension kept,
+the others summed out), so "bottleneck scores per Company" is a read of a
+[value x activity] slice. Other combinations sum the relevant cells of the
+cube. Scores use the bottleneck_score() formula, normalised within each
+attribute value.
+
+Output: attribute_cube.npz
+
+Usage:
+  cube = AttributeCube.for_store(store, load_case_attributes())
+  cube.update(case, act, ts)                   # case-sorted chunks of whole cases
+  save_attribute_cube(cube)
+  data = load_attribute_cube()
+  query_attribute_cube(data, 'Company')        # {company: {cases, bottlenecks}}
+  query_attribute_cube(data, 'Item Type', where={'Spend area text': 'IT'})
+"""
+
+import numpy as np
+import pandas as pd
+
+from process_timeseries import bottleneck_rows
+
+
+ATTRIBUTE_CUBE_FILE = 'attribute_cube.npz'
+
+# Cube dimensions (trace attributes), in axis order
+CUBE_DIMENSIONS = ('Spend area text', 'Company', 'Item Type')
+MISSING = '(missing)'
+
+MEASURES = ('events', 'dur_n', 'dur_sum')
+
+
+class AttributeCube:
+    """Event and duration sums per (attribute values..., activity) cell."""
+
+    def __init__(self, activities, dimensions, labels, case_cells):
+        self.activities = list(activities)
+        self.dimensions = list(dimensions)
+        # Value names per dimension, the missing slot last
+        self.labels = [list(values) + [MISSING] for values in labels]
+        self.shape = tuple(len(values) for values in self.labels)
+        # Flat attribute cell of every case code
+        self.case_cells = np.asarray(case_cells, dtype=np.int64)
+        n_cells, n_act = int(np.prod(self.shape)), len(self.activities)
+
+        self.events = np.zeros((n_cells, n_act), dtype=np.int64)
+        self.dur_n = np.zeros((n_cells, n_act), dtype=np.int64)
+        self.dur_sum = np.zeros((n_cells, n_act))
+        self.cases = np.zeros(n_cells, dtype=np.int64)
+
+    @classmethod
+    def for_store(cls, store, attributes, dimensions=CUBE_DIMENSIONS):
+        """Cube over the store's activities and the dimensions it actually has."""
+        dimensions = [d for d in dimensions if d in attributes.vocab]
+        labels = [attributes.vocab[d] for d in dimensions]
+        coords = []
+        for d, values in zip(dimensions, labels):
+            codes = attributes.values(d).astype(np.int64)
+            coords.append(np.where(codes >= 0, codes, len(values)))
+        shape = tuple(len(values) + 1 for values in labels)
+        case_cells = (np.ravel_multi_index(coords, shape) if dimensions
+                      else np.zeros(attributes.n_cases, dtype=np.int64))
+        return cls(store.vocab['Activity'], dimensions, labels, case_cells)
+
+    def update(self, case, act, ts, new=None):
+        """
+        Fold a case-sorted chunk of whole cases (no NaT timestamps). new:
+        optional mask of events not folded in before; a case is counted
+        with its first event.
+        """
+        n_cells, n_act = len(self.events), len(self.activities)
+        act = np.asarray(act, dtype=np.int64)
+        case = np.asarray(case, dtype=np.int64)
+        ts = np.asarray(ts, dtype=np.int64)
+        if new is None:
+            new = np.ones(len(act), dtype=bool)
+        cell = self.case_cells[case] * n_act + act
+        # Events without an activity (code -1) have no cell and no duration
+        known = act >= 0
+
+        self.events += np.bincount(cell[new & known],
+                                   minlength=n_cells * n_act).reshape(n_cells, n_act)
+        pair = np.flatnonzero((case[1:] == case[:-1]) & new[1:] & known[:-1])
+        self.dur_n += np.bincount(cell[pair], minlength=n_cells * n_act).reshape(n_cells, n_act)
+        self.dur_sum += np.bincount(
+            cell[pair], weights=(ts[pair + 1] - ts[pair]) / 1e9, minlength=n_cells * n_act
+        ).reshape(n_cells, n_act)
+        first = np.r_[True, case[1:] != case[:-1]] if len(case) else np.empty(0, dtype=bool)
+        self.cases += np.bincount(self.case_cells[case[first & new]], minlength=n_cells)
+        return self
+
+    def merge(self, other):
+        """Fold in the sums of a disjoint set of cases over the same cells."""
+        for name in MEASURES + ('cases',):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        return self
+
+    def remap_into(self, cube):
+        """
+        Add this cube's sums into an empty cube built for a rebuilt store
+        (for_store()): same dimensions, vocabularies that only grew.
+        """
+        if cube.dimensions != self.dimensions:
+            raise ValueError("attribute cube dimensions changed since the state was saved")
+        a = pd.Index(cube.activities).get_indexer(self.activities)
+        # Old cell coordinates -> new ones, the missing slot onto the new missing slot
+        coords = np.unravel_index(np.arange(int(np.prod(self.shape))), self.shape)
+        lost = (a < 0).any()
+        new_coords = []
+        for old, new, c in zip(self.labels, cube.labels, coords):
+            mapping = np.r_[pd.Index(new[:-1]).get_indexer(old[:-1]), len(new) - 1]
+            lost |= (mapping < 0).any()
+            new_coords.append(mapping[c])
+        if lost:
+            raise ValueError("event store vocabularies lost names since the cube state was saved")
+        cells = (np.ravel_multi_index(new_coords, cube.shape) if self.dimensions
+                 else np.zeros(1, dtype=np.int64))
+        for name in MEASURES:
+            np.add.at(getattr(cube, name), (cells[:, None], a[None, :]), getattr(self, name))
+        np.add.at(cube.cases, cells, self.cases)
+        return cube
+
+    def to_arrays(self):
+        """Full cube plus one roll-up per dimension: '<measure>' and 'rollup__<dim>__<measure>'."""
+        arrays = {
+            'activities': np.array(self.activities, dtype=str),
+            'dimensions': np.array(self.dimensions, dtype=str),
+        }
+        n_act = len(self.activities)
+        for i, dim in enumerate(self.dimensions):
+            arrays[f'labels__{dim}'] = np.array(self.labels[i], dtype=str)
+        for name in MEASURES + ('cases',):
+            values = getattr(self, name)
+            full = values.reshape(self.shape + ((n_act,) if values.ndim == 2 else ()))
+            arrays[name] = full
+            for i, dim in enumerate(self.dimensions):
+                others = tuple(j for j in range(len(self.dimensions)) if j != i)
+                arrays[f'rollup__{dim}__{name}'] = full.sum(axis=others)
+        return arrays
+
+
+def save_attribute_cube(cube, path=ATTRIBUTE_CUBE_FILE):
+    np.savez_compressed(path, **cube.to_arrays())
+    print(f"[OK] Saved '{path}' ({' x '.join(map(str, cube.shape))} attribute cells x "
+          f"{len(cube.activities)} activities)")
+
+
+def load_attribute_cube(path=ATTRIBUTE_CUBE_FILE):
+    """Arrays written by save_attribute_cube(), or None if there is no artifact."""
+    try:
+        with np.load(path) as data:
+            return {k: data[k] for k in data.files}
+    except FileNotFoundError:
+        return None
+
+
+def query_attribute_cube(cube, by, where=None):
+    """
+    Bottleneck breakdown per value of dimension `by`: {value: {"cases": n,
+    "bottlenecks": [activity rows]}}, values without events left out.
+    where: optional {dimension: value or [values]} slice of the other
+    dimensions; without it the stored roll-up is read directly.
+    Raises ValueError for unknown dimensions.
+    """
+    dimensions = [str(d) for d in cube['dimensions']]
+    for dim in [by, *(where or {})]:
+        if dim not in dimensions:
+            raise ValueError(f"'{dim}' is not a cube dimension (known: {', '.join(dimensions)})")
+    activities = [str(a) for a in cube['activities']]
+    labels = [str(v) for v in cube[f'labels__{by}']]
+    axis = dimensions.index(by)
+
+    if not where:
+        measures = {name: cube[f'rollup__{by}__{name}'] for name in MEASURES + ('cases',)}
+    else:
+        # Keep the selected values of the filtered dimensions, then sum out all but `by`
+        index = []
+        for dim in dimensions:
+            if dim in where:
+                wanted = [where[dim]] if isinstance(where[dim], str) else where[dim]
+                dim_labels = [str(v) for v in cube[f'labels__{dim}']]
+                index.append([dim_labels.index(v) for v in wanted if v in dim_labels])
+            else:
+                index.append(slice(None))
+        others = tuple(j for j in range(len(dimensions)) if j != axis)
+        measures = {}
+        for name in MEASURES + ('cases',):
+            values = cube[name]
+            for j, sel in enumerate(index):
+                values = np.take(values, sel, axis=j) if isinstance(sel, list) else values
+            measures[name] = values.sum(axis=others)
+
+    return {
+        labels[v]: {
+            "cases": int(measures['cases'][v]),
+            "bottlenecks": bottleneck_rows(activities, measures['events'][v],
+                                           measures['dur_n'][v], measures['dur_sum'][v]),
+        }
+        for v in np.flatnonzero(measures['events'].sum(axis=1))
+    }
@@ -0,0 +1,148 @@
+"""
+Case Attribute Index — slice-and-dice filters over trace attributes.
+
+Trace attributes (Spend area text, Company, Vendor, Item Type, Value_EUR, ...)
+are constant within a case, so the index keeps one value per case code:
+  - categorical attributes: CSR posting lists, i.e. the sorted case codes of
+    every attribute value as a contiguous slice (value code -> cases)
+  - numeric attributes: case codes sorted by value, for range lookups
+
+A filter such as "IT spend, Company X, value > 50k" is then a few slices,
+a binary search and a boolean AND over cases. The resulting case mask is
+passed to discover_dfg() / detect_bottlenecks(), which select the matching
+rows of the case-sorted arrays directly, without building a filtered
+DataFrame per query.
+
+Output: sap_event_log.csv.store/case_attributes.npz
+
+Usage:
+  attrs = load_case_attributes()
+  cases = attrs.select({'Spend area text': 'IT', 'Company': ['companyID_0000'],
+                        'Value_EUR': (50_000, None)})
+  dfg_data, _ = discover_dfg(None, df, cases=cases)
+  bottlenecks = detect_bottlenecks(None, df, cases=cases)
+"""
+
+import os
+import numpy as np
+
+from case_index import load_case_index
+from event_store import SAP_CSV, open_event_store
+
+
+ATTRIBUTES_FILE = 'case_attributes.npz'
+
+# Event-level columns; every other store column is treated as a trace attribute
+EVENT_COLUMNS = {'Case_ID', 'Activity', 'Timestamp', 'Resource'}
+
+
+class CaseAttributeIndex:
+    """Per-case attribute values with posting lists (categorical) or sort orders (numeric)."""
+
+    def __init__(self, n_cases, vocab, arrays):
+        self.n_cases = n_cases
+        self.vocab = vocab          # categorical attribute -> value names
+        self.arrays = arrays        # '<attribute>__<part>' -> array (see build_case_attributes)
+
+    @property
+    def attributes(self):
+        return sorted({key.split('__')[0] for key in self.arrays})
+
+    def values(self, attribute):
+        """Per-case value codes (categorical, -1 = missing) or values (numeric, NaN = missing)."""
+        return self.arrays[f'{attribute}__values']
+
+    def cases_with(self, attribute, value):
+        """Sorted case codes whose categorical attribute equals value (empty if unknown)."""
+        names = self.vocab[attribute]
+        if value not in names:
+            return np.empty(0, dtype=np.int64)
+        code = names.index(value)
+        offsets = self.arrays[f'{attribute}__offsets']
+        return self.arrays[f'{attribute}__cases'][offsets[code]:offsets[code + 1]]
+
+    def cases_between(self, attribute, low=None, high=None):
+        """Case codes with low <= numeric attribute < high (None = unbounded)."""
+        ordered = self.arrays[f'{attribute}__sorted']
+        lo = 0 if low is None else np.searchsorted(ordered, low, side='left')
+        hi = np.searchsorted(ordered, np.inf if high is None else high, side='left')
+        return self.arrays[f'{attribute}__order'][lo:hi]
+
+    def select(self, filters):
+        """
+        Boolean mask over case codes for {attribute: criterion}, all criteria ANDed.
+        A criterion is a value or list of values (categorical, ORed), or a
+        number (equality) or (low, high) tuple with high exclusive (numeric).
+        """
+        mask = np.ones(self.n_cases, dtype=bool)
+        for attribute, criterion in filters.items():
+            if f'{attribute}__values' not in self.arrays:
+                raise ValueError(f"'{attribute}' is not an indexed case attribute "
+                                 f"(known: {', '.join(self.attributes)})")
+            hit = np.zeros(self.n_cases, dtype=bool)
+            if attribute in self.vocab:
+                wanted = [criterion] if isinstance(criterion, str) else criterion
+                for value in wanted:
+                    hit[self.cases_with(attribute, value)] = True
+            elif isinstance(criterion, tuple) and len(criterion) == 2:
+                hit[self.cases_between(attribute, *criterion)] = True
+            elif isinstance(criterion, (int, float, np.number)) and not isinstance(criterion, bool):
+                hit[self.cases_between(attribute, criterion, np.nextafter(criterion, np.inf))] = True
+            else:
+                raise ValueError(f"'{attribute}' is numeric: filter it by a number "
+                                 f"or a (low, high) range, not {criterion!r}")
+            mask &= hit
+        return mask
+
+
+def build_case_attributes(source=SAP_CSV):
+    """Compute and persist the attribute index for the event store of a source log."""
+    store = open_event_store(source)
+    index = load_case_index(source)
+    n_cases = index.n_cases
+    nonempty = index.nonempty_cases()
+
+    arrays = {}
+    vocab = {}
+    for col in store.columns:
+        if col in EVENT_COLUMNS or store.kind(col) == 'time':
+            continue
+        # Trace attributes: the value at each case's first event
+        if store.kind(col) == 'code':
+            values = np.full(n_cases, -1, dtype=np.int32)
+            values[nonempty] = index.first(store.array(col))
+            order = np.argsort(values, kind='stable')
+            arrays[f'{col}__cases'] = order
+            arrays[f'{col}__offsets'] = np.searchsorted(
+                values[order], np.arange(len(store.vocab[col]) + 1), side='left')
+            vocab[col] = list(store.vocab[col])
+        else:
+            values = np.full(n_cases, np.nan)
+            values[nonempty] = index.first(store.array(col))
+            # NaN sorts last and falls outside every finite range
+            order = np.argsort(values, kind='stable')
+            arrays[f'{col}__order'] = order
+            arrays[f'{col}__sorted'] = values[order]
+        arrays[f'{col}__values'] = values
+
+    np.savez(os.path.join(store.store_dir, ATTRIBUTES_FILE), **arrays)
+    print(f"[OK] Case attribute index: {len(vocab)} categorical + "
+          f"{len(arrays) // 3 - len(vocab)} numeric attributes over {n_cases} cases")
+    return CaseAttributeIndex(n_cases, vocab, arrays)
+
+
+def load_case_attributes(source=SAP_CSV):
+    """
+    Load the persisted attribute index, building it on first use. Like the
+    case offsets it lives in the store directory, so a rebuilt store never
+    serves a stale index.
+    """
+    store = open_event_store(source)
+    path = os.path.join(store.store_dir, ATTRIBUTES_FILE)
+    if not os.path.exists(path):
+        return build_case_attributes(source)
+    with np.load(path) as data:
+        arrays = {k: data[k] for k in data.files}
+    vocab = {col: list(store.vocab[col]) for col in store.vocab
+             if f'{col}__offsets' in arrays}
+    return CaseAttributeIndex(len(store.vocab['Case_ID']), vocab, arrays)
@@ -0,0 +1,161 @@
+"""
+CSR Case Index over the case-sorted event store.
+
+The store keeps events sorted by (Case_ID, Timestamp), so all events of case
+code c are the contiguous rows offsets[c]:offsets[c+1]. Any trace is an O(1)
+slice of the store's columns: no per-case dict or DataFrame is needed.
+
+Output: sap_event_log.csv.store/case_offsets.npy   (int64, length n_cases + 1)
+
+Usage:
+  store = open_event_store()
+  index = load_case_index()
+  rows = index.rows(case_code)                   # slice into every column
+  acts = store.array('Activity')[rows]           # that case's activity codes
+  last_ts = index.last(store.array('Timestamp')) # per-case last timestamp
+"""
+
+import os
+import numpy as np
+
+from event_store import SAP_CSV, open_event_store
+
+
+OFFSETS_FILE = 'case_offsets.npy'
+
+
+class CaseIndex:
+    """Case code -> contiguous event range (optionally through a row selection)."""
+
+    def __init__(self, offsets, rows=None):
+        self.offsets = offsets
+        # Optional indirection: positions in `rows` instead of store rows (see filter())
+        self.row_ids = rows
+        self.n_cases = len(offsets) - 1
+
+    @classmethod
+    def from_sorted_codes(cls, case_codes, n_cases=None):
+        """Build offsets from an array of case codes that is already case-sorted."""
+        case_codes = np.asarray(case_codes)
+        if n_cases is None:
+            n_cases = int(case_codes.max()) + 1 if len(case_codes) else 0
+        # Missing cases (code -1) sort first and fall outside every range
+        offsets = np.searchsorted(case_codes, np.arange(n_cases + 1), side='left')
+        return cls(offsets.astype(np.int64))
+
+    def lengths(self):
+        """Events per case."""
+        return np.diff(self.offsets)
+
+    def bounds(self, case):
+        return int(self.offsets[case]), int(self.offsets[case + 1])
+
+    def rows(self, case):
+        """Store rows of one case: a slice (zero-copy) or an index array after filter()."""
+        start, end = self.bounds(case)
+        if self.row_ids is None:
+            return slice(start, end)
+        return self.row_ids[start:end]
+
+    def endpoints(self, case):
+        """Store rows of the first and last event of a non-empty case."""
+        start, end = self.bounds(case)
+        if self.row_ids is None:
+            return start, end - 1
+        return int(self.row_ids[start]), int(self.row_ids[end - 1])
+
+    def rows_of(self, cases):
+        """Store rows of a sorted array of case codes: their CSR ranges, concatenated."""
+        offsets = np.asarray(self.offsets)
+        cases = np.asarray(cases, dtype=np.int64)
+        starts = offsets[cases]
+        sizes = offsets[cases + 1] - starts
+        rows = np.repeat(starts - (np.cumsum(sizes) - sizes), sizes) + np.arange(sizes.sum())
+        return rows if self.row_ids is None else self.row_ids[rows]
+
+    def event_rows(self):
+        """Store rows of all indexed events, in index order."""
+        if self.row_ids is None:
+            return slice(int(self.offsets[0]), int(self.offsets[-1]))
+        return self.row_ids
+
+    def positions(self, case):
+        """Slice of one case into arrays aligned with event_rows()."""
+        start, end = self.bounds(case)
+        return slice(start - int(self.offsets[0]), end - int(self.offsets[0]))
+
+    def take(self, values, case):
+        """values[rows of case] for a store column (or any aligned array)."""
+        return values[self.rows(case)]
+
+    def nonempty_cases(self):
+        return np.flatnonzero(self.lengths() > 0)
+
+    def _positions(self, which):
+        pos = self.offsets[:-1] if which == 'first' else self.offsets[1:] - 1
+        pos = pos[self.lengths() > 0]
+        return pos if self.row_ids is None else self.row_ids[pos]
+
+    def first(self, values):
+        """First value of every non-empty case."""
+        return np.asarray(values)[self._positions('first')]
+
+    def last(self, values):
+        """Last value of every non-empty case."""
+        return np.asarray(values)[self._positions('last')]
+
+    def event_cases(self):
+        """Case code of every indexed event, aligned with event_rows()."""
+        return np.repeat(np.arange(self.n_cases), self.lengths())
+
+    def is_last(self):
+        """Mask aligned with event_rows(): True for the last event of its case."""
+        mask = np.zeros(self.offsets[-1] - self.offsets[0], dtype=bool)
+        ends = self.offsets[1:][self.lengths() > 0] - 1 - self.offsets[0]
+        mask[ends] = True
+        return mask
+
+    def next_within_case(self, values, fill):
+        """
+        Store column shifted by -1 inside each case, aligned with event_rows();
+        the last event of a case gets fill.
+        """
+        values = np.asarray(values)[self.event_rows()]
+        out = np.empty(len(values), dtype=np.result_type(values.dtype, np.asarray(fill).dtype))
+        out[:-1] = values[1:]
+        out[self.is_last()] = fill
+        return out
+
+    def filter(self, mask):
+        """Index over only the events where mask is True (cases keep their codes)."""
+        mask = np.asarray(mask, dtype=bool)
+        if self.row_ids is None and mask[self.offsets[0]:self.offsets[-1]].all():
+            return self
+        base = self.row_ids if self.row_ids is not None else np.arange(self.offsets[0], self.offsets[-1])
+        keep = mask[base]
+        # Count kept events per case, then prefix-sum into new offsets
+        kept = np.bincount(self.event_cases()[keep], minlength=self.n_cases)
+        offsets = np.concatenate([[0], np.cumsum(kept)]).astype(np.int64)
+        return CaseIndex(offsets, rows=base[keep])
+
+
+def build_case_index(source=SAP_CSV):
+    """Compute and persist case offsets for the event store of a source log."""
+    store = open_event_store(source)
+    case_codes = store.array('Case_ID')
+    index = CaseIndex.from_sorted_codes(case_codes, n_cases=len(store.vocab['Case_ID']))
+    np.save(os.path.join(store.store_dir, OFFSETS_FILE), index.offsets)
+    print(f"[OK] Case index: {index.n_cases} cases over {store.n_events} events")
+    return index
+
+
+def load_case_index(source=SAP_CSV):
+    """
+    Memory-map the persisted case offsets, building them on first use.
+    A rebuilt store starts without an offsets file, so the index never goes stale.
+    """
+    store = open_event_store(source)
+    path = os.path.join(store.store_dir, OFFSETS_FILE)
+    if not os.path.exists(path):
+        return build_case_index(source)
+    return CaseIndex(np.load(path, mmap_mode='r'))
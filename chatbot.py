@@ -97,6 +97,14 @@ class ProcessChatbot:
 - Training Timesteps: {opt.get('timesteps', 'N/A')}
 """
 
+        # Sampled conformance is an estimate: show it as "≈ 87.3% ± 0.4%"
+        conformance = stats.get('conformance', {})
+        conformance_text = f"{conformance.get('fitness_percentage', 'N/A')}%"
+        if conformance.get('sampled'):
+            conformance_text = (f"≈ {conformance['fitness_percentage']}% ± "
+                                f"{conformance['error_bound_percentage']}% "
+                                f"(sample of {conformance['sample_size']} cases)")
+
         # Construct a data-rich system prompt
         system_prompt = f"""
 You are an expert AI Process Analyst for a large SAP procurement process.
@@ -106,7 +114,7 @@ Your goal is to analyze the provided process data, identify inefficiencies, and
 - Total Cases: {stats.get('overview', {}).get('total_cases', 'N/A')}
 - Total Events: {stats.get('overview', {}).get('total_events', 'N/A')}
 - Optimization Score: {stats.get('optimization_score', 'N/A')}/100
-- Conformance Fitness: {stats.get('conformance', {}).get('fitness_percentage', 'N/A')}%
+- Conformance Fitness: {conformance_text}
 
 ### KEY BOTTLENECKS (Top 5)
 {json.dumps(bottlenecks.get('bottlenecks', [])[:5], indent=2)}
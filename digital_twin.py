@@ -1,9 +1,11 @@
 import simpy
-import pandas as pd
 import numpy as np
 import json
 from collections import defaultdict
 
+from case_index import load_case_index
+from event_store import NAT, open_event_store
+
 class DigitalTwin:
     def __init__(self, event_log_path='sap_event_log.csv', stats_path='process_stats.json'):
         self.env = simpy.Environment()
@@ -12,8 +14,8 @@ class DigitalTwin:
         self.data = None
         self.resource_pools = {}  # {activity: simpy.FilterStore or Resource}
         self.resources = {}       # {resource_id: simpy.Resource}
-        self.case_traces = {}     # {case_id: [(activity, duration, resource_id), ...]}
-        self.start_times = {}     # {case_id: start_timestamp}
+        self.case_index = None    # CaseIndex: case code -> slice of trace arrays
+        self.start_times = None   # first timestamp (epoch ns) per case in case_codes
         self.pools = {}           # {activity: [resource_ids]}
         
         # Simulation Metrics
@@ -27,46 +29,50 @@ class DigitalTwin:
     def load_data(self):
         print(f"[INFO] Loading Digital Twin data from {self.log_path}...")
         try:
-            df = pd.read_csv(self.log_path, parse_dates=['Timestamp'], dtype={'Case_ID': str, 'Activity': str, 'Resource': str})
+            store = open_event_store(self.log_path)
+            ts_all = store.array('Timestamp')
+            # Case index over events with a valid timestamp
+            index = load_case_index(self.log_path).filter(ts_all != NAT)
         except Exception as e:
             print(f"[ERROR] Failed to load data: {e}")
             return
-        # Sort by Case then Time
-        df = df.sort_values(['Case_ID', 'Timestamp'])
-        
-        # Vectorized Duration Calculation
+
+        # Events are already case-sorted, so durations are a shift inside each case
         print("[INFO] Calculating durations...")
-        df['next_ts'] = df.groupby('Case_ID')['Timestamp'].shift(-1)
-        df['duration'] = (df['next_ts'] - df['Timestamp']).dt.total_seconds()
-        df['duration'] = df['duration'].fillna(1800) # Default 30 mins for last event
-        df['duration'] = df['duration'].clip(upper=28800) # Cap at 8 hours
-        
-        self.data = df
-        
-        # Build traces
-        print("[INFO] Building simulation traces (Vectorized)...")
-        
-        # Group to Dict
-        # This is much faster than iterating
-        self.start_times = df.groupby('Case_ID')['Timestamp'].first().to_dict()
-        
-        # Create traces dictionary: Case_ID -> List of dicts
-        # Only keep necessary columns to save memory
-        traces_df = df[['Case_ID', 'Activity', 'Resource', 'duration']]
-        
-        # Groupby apply is still slowish for 12k groups, but faster than loop.
-        # Alternative: Iterate fast.
-        self.case_traces = {}
-        for case_id, group in traces_df.groupby('Case_ID'):
-            self.case_traces[case_id] = group.to_dict('records')
-            
-        print(f"[INFO] Prepared {len(self.case_traces)} traces.")
-        
+        rows = index.event_rows()
+        ts = ts_all[rows]
+        next_ts = index.next_within_case(ts_all, NAT)
+        duration = np.full(len(ts), 1800.0)  # Default 30 mins for last event
+        has_next = next_ts != NAT
+        duration[has_next] = (next_ts[has_next] - ts[has_next]) / 1e9
+        duration = np.minimum(duration, 28800)  # Cap at 8 hours
+
+        self.data = store
+
+        # Traces are O(1) slices of these arrays (see process_case)
+        print("[INFO] Building simulation traces (case index)...")
+        self.case_index = index
+        self.activity_names = store.vocab['Activity']
+        self.trace_activities = store.array('Activity')[rows]
+        self.trace_durations = duration
+
+        self.case_codes = index.nonempty_cases()
+        self.start_times = index.first(ts_all)
+
+        print(f"[INFO] Prepared {len(self.case_codes)} traces.")
+
         # Identify Resource-Activity Mapping (Who CAN do what)
+        # Unique (activity, resource) code pairs instead of a row-by-row scan
+        resource_names = store.vocab['Resource']
+        acts = self.trace_activities.astype(np.int64)
+        res = store.array('Resource')[rows].astype(np.int64)
+        valid = (acts >= 0) & (res >= 0)
+        pairs = np.unique(acts[valid] * len(resource_names) + res[valid])
         self.activity_resources = defaultdict(set)
-        for _, row in df.iterrows():
-            self.activity_resources[row['Activity']].add(row['Resource'])
-            
+        for act, r in zip(pairs // len(resource_names), pairs % len(resource_names)):
+            self.activity_resources[self.activity_names[act]].add(resource_names[r])
+        self.known_resources = {resource_names[r] for r in np.unique(res[res >= 0])}
+
     def configure_resources(self, override_mapping=None):
         """
         Setup SimPy resources.
@@ -83,7 +89,7 @@ class DigitalTwin:
         
         # 1. Create all unique resources as SimPy resources (Capacity=1)
         if self.data is not None:
-            unique_users = set(self.data['Resource'].unique())
+            unique_users = set(self.known_resources)
             # Add any new users from overrides if they don't exist in data
             if override_mapping:
                 for users in override_mapping.values():
@@ -107,20 +113,20 @@ class DigitalTwin:
         print(f"[INFO] Running Simulation (Max {max_cases} cases)...")
         
         # Sort cases by start time
-        sorted_cases = sorted(self.start_times.items(), key=lambda x: x[1])
-        if not sorted_cases:
+        if self.start_times is None or not len(self.start_times):
             print("[WARN] No cases to simulate.")
             return {}
-            
-        base_time = sorted_cases[0][1]
+        order = np.argsort(self.start_times, kind='stable')
+
+        base_time = self.start_times[order[0]]
         
         count = 0
-        for case_id, start_ts in sorted_cases:
+        for i in order:
             if count >= max_cases: break
             
             # Arrival delay relative to first case
-            arrival_delay = (start_ts - base_time).total_seconds()
-            self.env.process(self.process_case(case_id, arrival_delay))
+            arrival_delay = float(self.start_times[i] - base_time) / 1e9
+            self.env.process(self.process_case(self.case_codes[i], arrival_delay))
             count += 1
             
         self.env.run()
@@ -139,15 +145,15 @@ class DigitalTwin:
             "total_duration_simulated_hours": self.env.now / 3600
         }
         
-    def process_case(self, case_id, arrival_delay):
+    def process_case(self, case_code, arrival_delay):
         yield self.env.timeout(arrival_delay)
         
-        trace = self.case_traces[case_id]
+        steps = self.case_index.positions(case_code)
         case_start = self.env.now
         
-        for step in trace:
-            act = step['Activity']
-            duration = step['duration']
+        for act_code, duration in zip(self.trace_activities[steps].tolist(),
+                                       self.trace_durations[steps].tolist()):
+            act = self.activity_names[act_code]
             
             # Request Resource
             allowed_users = self.pools.get(act, [])
@@ -0,0 +1,304 @@
+"""
+Shared Event Log Access
+One-time conversion of the SAP event log into a binary, case-sorted,
+memory-mapped columnar store, plus the loader every pipeline stage uses.
+
+  - String columns (Case_ID, Activity, Resource, Vendor, Spend area text, ...)
+    are dictionary-encoded: int32 codes + shared vocabulary tables. Vocabularies
+    are sorted, so ordering by code is the same as ordering by name.
+  - Timestamp is stored as int64 nanoseconds since the epoch (UTC).
+  - Rows are sorted by (Case_ID, Timestamp), ties kept in source order.
+
+The store is rebuilt automatically when the source CSV/Parquet changes.
+Each source file gets its own store, and when both sap_event_log.csv and
+sap_event_log.parquet exist the newer one is read (with a warning), so a
+stale CSV next to a fresh Parquet log never replaces the Parquet store.
+
+Output: sap_event_log.csv.store/   (or sap_event_log.parquet.store/;
+                                    meta.json + one .npy file per column)
+
+Usage:
+  store = open_event_store()
+  acts = store.array('Activity')        # zero-copy int32 codes (np.memmap)
+  ts = store.array('Timestamp')         # int64 epoch ns
+  store.vocab['Activity'][code]         # code -> name
+  df = read_event_log(columns=['Case_ID', 'Activity', 'Timestamp'])
+"""
+
+import json
+import os
+import shutil
+import time
+import numpy as np
+import pandas as pd
+
+
+SAP_CSV = 'sap_event_log.csv'
+STORE_SUFFIX = '.store'
+SOURCE_EXTENSIONS = ('.csv', '.parquet')
+META_FILE = 'meta.json'
+
+# Columns that are never dictionary-encoded
+NON_CATEGORICAL = {'Timestamp', 'Value_EUR'}
+
+# int64 value of NaT, used for missing timestamps
+NAT = np.iinfo(np.int64).min
+
+# Rows per chunk when converting a CSV source
+CHUNK_ROWS = 250_000
+
+
+def store_path(source=SAP_CSV):
+    """Store directory of one source file: sap_event_log.csv -> sap_event_log.csv.store/."""
+    return source + STORE_SUFFIX
+
+
+def resolve_source(source=SAP_CSV):
+    """
+    The event log file to read for source. Of the CSV and Parquet files
+    sharing its name, the most recently modified one wins; without either,
+    the one with the most recently built store. Returns source unchanged
+    if there is neither a log nor a store.
+    """
+    stem = os.path.splitext(source)[0]
+    candidates = [stem + ext for ext in SOURCE_EXTENSIONS]
+    if source not in candidates:
+        candidates.append(source)
+    found = {p: os.path.getmtime(p) for p in candidates if os.path.exists(p)}
+    if not found:
+        metas = {p: os.path.join(store_path(p), META_FILE) for p in candidates}
+        found = {p: os.path.getmtime(m) for p, m in metas.items() if os.path.exists(m)}
+    if not found:
+        return source
+    newest = max(found, key=found.get)
+    if newest != source and os.path.exists(source):
+        print(f"[WARN] '{newest}' is newer than '{source}'; reading '{newest}'")
+    return newest
+
+
+def _source_signature(path):
+    """Size + mtime of the source log, used to detect a stale store."""
+    st = os.stat(path)
+    return {"path": os.path.basename(path), "size": st.st_size, "mtime": int(st.st_mtime)}
+
+
+def encode_frame(df, vocab):
+    """Convert the vocabulary columns of df to categoricals with the shared codes."""
+    for col, names in vocab.items():
+        if col in df.columns:
+            df[col] = pd.Categorical(df[col], categories=names)
+    return df
+
+
+def decode(vocab, column, codes):
+    """Map integer codes of a column back to names (-1 -> None)."""
+    names = vocab[column]
+    return [names[c] if c >= 0 else None for c in codes]
+
+
+def to_epoch_ns(timestamps):
+    """Datetime-like Series -> int64 ns since epoch (UTC), NaT -> NAT."""
+    ts = pd.to_datetime(timestamps, errors='coerce', utc=True).dt.tz_convert(None)
+    return ts.to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+
+def from_epoch_ns(values):
+    """int64 ns since epoch -> tz-aware UTC Series."""
+    return pd.Series(np.asarray(values).view('datetime64[ns]')).dt.tz_localize('UTC')
+
+
+def _iter_source_chunks(source, chunksize=CHUNK_ROWS):
+    """Read a CSV (as text) or Parquet event log in bounded-size chunks."""
+    if source.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        pf = pq.ParquetFile(source)
+        for i in range(pf.num_row_groups):
+            yield pf.read_row_group(i).to_pandas()
+    else:
+        yield from pd.read_csv(source, dtype=str, chunksize=chunksize)
+
+
+def _scan_columns(source):
+    """
+    First pass: decide each column's storage kind and collect vocabularies.
+    Text columns whose values all parse as numbers are stored as numbers,
+    mirroring pandas' default CSV type inference.
+    """
+    order = []
+    numeric = {}
+    integral = {}
+    values = {}
+    for chunk in _iter_source_chunks(source):
+        for col in chunk.columns:
+            if col not in numeric:
+                order.append(col)
+                numeric[col] = integral[col] = True
+                values[col] = set()
+            s = chunk[col]
+            if col == 'Timestamp':
+                continue
+            if pd.api.types.is_numeric_dtype(s.dtype) and not pd.api.types.is_bool_dtype(s.dtype):
+                num = s
+            else:
+                num = pd.to_numeric(s, errors='coerce')
+                values[col].update(s.dropna().astype(str).unique())
+            numeric[col] &= bool(num.notna().sum() == s.notna().sum())
+            integral[col] &= bool(s.notna().all() and (num % 1 == 0).all())
+
+    kinds = {}
+    vocab = {}
+    for col in order:
+        if col == 'Timestamp':
+            kinds[col] = 'time'
+        elif col in NON_CATEGORICAL or numeric[col]:
+            kinds[col] = 'int' if integral[col] and col not in NON_CATEGORICAL else 'float'
+        else:
+            kinds[col] = 'code'
+            vocab[col] = sorted(values[col])
+    return kinds, vocab
+
+
+def build_event_store(source=SAP_CSV, store_dir=None):
+    """
+    Convert an event log CSV/Parquet into the memory-mapped columnar store.
+    Two chunked passes (vocabularies, then codes), so only the integer and
+    float columns of the full log are ever held in memory.
+    """
+    store_dir = store_dir or store_path(source)
+    print(f"[INFO] Building event store {store_dir} from {source}...")
+    start = time.time()
+
+    kinds, vocab = _scan_columns(source)
+
+    parts = {col: [] for col in kinds}
+    for chunk in _iter_source_chunks(source):
+        for col, kind in kinds.items():
+            s = chunk[col] if col in chunk.columns else pd.Series(index=chunk.index, dtype=object)
+            if kind == 'code':
+                text = s.where(s.isna(), s.astype(str))
+                parts[col].append(pd.Categorical(text, categories=vocab[col]).codes.astype(np.int32))
+            elif kind == 'time':
+                parts[col].append(to_epoch_ns(s))
+            elif kind == 'int':
+                parts[col].append(pd.to_numeric(s).to_numpy(dtype=np.int64))
+            else:
+                parts[col].append(pd.to_numeric(s, errors='coerce').to_numpy(dtype=np.float64))
+
+    arrays = {col: np.concatenate(chunks) if chunks else np.empty(0) for col, chunks in parts.items()}
+    n_events = len(next(iter(arrays.values()))) if arrays else 0
+    columns = {col: {"kind": kind, "file": f"col_{i}.npy"} for i, (col, kind) in enumerate(kinds.items())}
+
+    # Case-sorted order; lexsort is stable, so ties keep source order
+    keys = [arrays[k] for k in ('Timestamp', 'Case_ID') if k in arrays]
+    order = np.lexsort(keys) if keys else np.arange(n_events)
+
+    tmp_dir = store_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for col, info in columns.items():
+        np.save(os.path.join(tmp_dir, info["file"]), arrays[col][order])
+
+    meta = {
+        "source": _source_signature(source),
+        "n_events": int(n_events),
+        "sorted_by": [k for k in ('Case_ID', 'Timestamp') if k in arrays],
+        "columns": columns,
+        "vocab": vocab,
+    }
+    with open(os.path.join(tmp_dir, META_FILE), 'w') as f:
+        json.dump(meta, f)
+
+    shutil.rmtree(store_dir, ignore_errors=True)
+    os.replace(tmp_dir, store_dir)
+
+    elapsed = time.time() - start
+    print(f"[OK] Event store ready: {n_events} events, {len(columns)} columns ({elapsed:.1f}s)")
+    return EventStore(store_dir, meta)
+
+
+class EventStore:
+    """Read-only, memory-mapped view of the case-sorted event log."""
+
+    def __init__(self, store_dir, meta):
+        self.store_dir = store_dir
+        self.meta = meta
+        self.n_events = meta["n_events"]
+        self.columns = list(meta["columns"])
+        self.vocab = meta["vocab"]
+        self._arrays = {}
+
+    def kind(self, column):
+        return self.meta["columns"][column]["kind"]
+
+    def array(self, column):
+        """Raw column: int32 codes, int64 epoch ns, int64 or float64 (memory-mapped)."""
+        if column not in self._arrays:
+            path = os.path.join(self.store_dir, self.meta["columns"][column]["file"])
+            self._arrays[column] = np.load(path, mmap_mode='r')
+        return self._arrays[column]
+
+    def series(self, column):
+        """Column as a pandas Series (categorical / UTC datetime / numeric)."""
+        values = self.array(column)
+        kind = self.kind(column)
+        if kind == 'code':
+            categories = pd.Index(self.vocab[column], dtype=object)
+            return pd.Series(pd.Categorical.from_codes(values, categories=categories, validate=False),
+                             name=column)
+        if kind == 'time':
+            return from_epoch_ns(values).rename(column)
+        return pd.Series(values, name=column)
+
+    def value(self, column, row, default=None):
+        """Decoded scalar at one row (NaN for missing, default if no such column)."""
+        if column not in self.meta["columns"]:
+            return default
+        v = self.array(column)[row]
+        kind = self.kind(column)
+        if kind == 'code':
+            return self.vocab[column][v] if v >= 0 else np.nan
+        if kind == 'time':
+            return pd.Timestamp(int(v), tz='UTC') if v != NAT else pd.NaT
+        return v.item()
+
+    def to_frame(self, columns=None):
+        """DataFrame with dictionary-encoded string columns and UTC timestamps."""
+        columns = [c for c in (columns or self.columns) if c in self.meta["columns"]]
+        return pd.DataFrame({col: self.series(col) for col in columns})
+
+
+def open_event_store(source=SAP_CSV, store_dir=None):
+    """
+    Open the event store for a source log, converting it on first use or
+    when the source has changed since the store was built. source is
+    resolved to the newer of its CSV and Parquet files (resolve_source()).
+    """
+    source = resolve_source(source)
+    store_dir = store_dir or store_path(source)
+    meta = None
+    try:
+        with open(os.path.join(store_dir, META_FILE), 'r') as f:
+            meta = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    if os.path.exists(source):
+        if meta is None or meta.get("source") != _source_signature(source):
+            return build_event_store(source, store_dir)
+    elif meta is None:
+        raise FileNotFoundError(f"'{source}' not found and no event store at '{store_dir}'")
+
+    return EventStore(store_dir, meta)
+
+
+def load_vocabularies(source=SAP_CSV):
+    """Shared vocabulary tables: {column: [name, ...]}, code = list index."""
+    return open_event_store(source).vocab
+
+
+def read_event_log(csv_path=SAP_CSV, columns=None):
+    """
+    Load the event log (case-sorted) with dictionary-encoded string columns
+    and UTC timestamps. columns: optional subset of columns to load.
+    """
+    return open_event_store(csv_path).to_frame(columns)
@@ -10,6 +10,9 @@ from faker import Faker
 import random
 from datetime import timedelta
 
+from case_index import load_case_index
+from event_store import NAT, decode, open_event_store
+
 fake = Faker()
 Faker.seed(42)
 np.random.seed(42)
@@ -80,36 +83,35 @@ def derive_priority(value_eur):
 def generate_jira_tickets(sap_csv='sap_event_log.csv'):
     print(f"[INFO] Reading {sap_csv}...")
     try:
-        df = pd.read_csv(sap_csv)
+        store = open_event_store(sap_csv)
     except FileNotFoundError:
         print(f"[ERROR] '{sap_csv}' not found. Run parse_sap_xes.py first!")
         return
 
-    df['Timestamp'] = pd.to_datetime(df['Timestamp'], errors='coerce', utc=True)
-    df = df.dropna(subset=['Timestamp'])
+    # Case index over events with a valid timestamp: each PO is an O(1) slice
+    index = load_case_index(sap_csv).filter(store.array('Timestamp') != NAT)
+    cases = index.nonempty_cases()
 
-    # Group by Case_ID (each SAP PO item)
-    groups = df.groupby('Case_ID')
-    print(f"[INFO] Found {len(groups)} unique SAP purchase orders")
+    print(f"[INFO] Found {len(cases)} unique SAP purchase orders")
+    activity_codes = store.array('Activity')
 
     jira_tickets = []
     ticket_counter = 1
 
-    for case_id, group in groups:
-        group = group.sort_values('Timestamp')
-        first_event = group.iloc[0]
-        last_event = group.iloc[-1]
+    for case in cases:
+        case_id = store.vocab['Case_ID'][case]
+        first_row, last_row = index.endpoints(case)
 
         # Get trace-level attributes
-        value_eur = first_event.get('Value_EUR', 0)
+        value_eur = store.value('Value_EUR', first_row, 0)
         if pd.isna(value_eur):
             value_eur = random.uniform(500, 50000)
         value_eur = float(value_eur)
 
-        spend_area = str(first_event.get('Spend area text', ''))
-        vendor = str(first_event.get('Vendor', ''))
-        company = str(first_event.get('Company', ''))
-        item_type = str(first_event.get('Item Type', ''))
+        spend_area = str(store.value('Spend area text', first_row, ''))
+        vendor = str(store.value('Vendor', first_row, ''))
+        company = str(store.value('Company', first_row, ''))
+        item_type = str(store.value('Item Type', first_row, ''))
         domain = SPEND_TO_DOMAIN.get(spend_area, random.choice(['frontend', 'backend', 'devops']))
 
         # Determine priority from value
@@ -119,10 +121,12 @@ def generate_jira_tickets(sap_csv='sap_event_log.csv'):
         num_tickets = random.choices([1, 2, 3, 4, 5], weights=[0.3, 0.3, 0.2, 0.1, 0.1])[0]
 
         # Timeline: spread tickets across the PO lifecycle
-        po_start = first_event['Timestamp']
-        po_end = last_event['Timestamp']
+        po_start = store.value('Timestamp', first_row)
+        po_end = store.value('Timestamp', last_row)
         po_duration = (po_end - po_start).total_seconds()
 
+        activities_in_po = decode(store.vocab, 'Activity', index.take(activity_codes, case))
+
         for i in range(num_tickets):
             ticket_id = f"JIRA-{ticket_counter:05d}"
             ticket_counter += 1
@@ -136,7 +140,6 @@ def generate_jira_tickets(sap_csv='sap_event_log.csv'):
             resolved = created + timedelta(hours=resolution_hours)
 
             # Pick a relevant SAP activity for this ticket
-            activities_in_po = group['Activity'].tolist()
             sap_activity = random.choice(activities_in_po) if activities_in_po else 'SRM: Created'
             ticket_type = SAP_TO_JIRA_TYPE.get(sap_activity, 'Task')
 
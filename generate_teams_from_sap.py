@@ -11,6 +11,9 @@ from faker import Faker
 import random
 from datetime import timedelta
 
+from case_index import load_case_index
+from event_store import NAT, decode, open_event_store
+
 fake = Faker()
 Faker.seed(42)
 np.random.seed(42)
@@ -32,28 +35,27 @@ ACTIVITY_WEIGHTS = [0.55, 0.15, 0.10, 0.05, 0.10, 0.05]
 def generate_teams_data(sap_csv='sap_event_log.csv'):
     print(f"[INFO] Reading {sap_csv}...")
     try:
-        df = pd.read_csv(sap_csv)
+        store = open_event_store(sap_csv)
     except FileNotFoundError:
         print(f"[ERROR] '{sap_csv}' not found. Run parse_sap_xes.py first!")
         return
 
-    df['Timestamp'] = pd.to_datetime(df['Timestamp'], errors='coerce', utc=True)
-    df = df.dropna(subset=['Timestamp'])
+    # Case index over events with a valid timestamp: each PO is an O(1) slice
+    index = load_case_index(sap_csv).filter(store.array('Timestamp') != NAT)
+    cases = index.nonempty_cases()
 
-    # Group by SAP Case_ID (purchase order items)
-    groups = df.groupby('Case_ID')
-    print(f"[INFO] Generating Teams chatter for {len(groups)} SAP purchase orders...")
+    print(f"[INFO] Generating Teams chatter for {len(cases)} SAP purchase orders...")
+    resource_codes = store.array('Resource')
 
     teams_data = []
     po_count = 0
 
-    for case_id, group in groups:
-        group = group.sort_values('Timestamp')
-        first_event = group.iloc[0]
-        last_event = group.iloc[-1]
+    for case in cases:
+        case_id = store.vocab['Case_ID'][case]
+        first_row, last_row = index.endpoints(case)
 
-        po_start = first_event['Timestamp']
-        po_end = last_event['Timestamp']
+        po_start = store.value('Timestamp', first_row)
+        po_end = store.value('Timestamp', last_row)
         lifespan = po_end - po_start
 
         if lifespan.total_seconds() <= 0:
@@ -61,9 +63,10 @@ def generate_teams_data(sap_csv='sap_event_log.csv'):
             po_end = po_start + lifespan
 
         # Get PO attributes
-        value_eur = float(first_event.get('Value_EUR', 0)) if pd.notna(first_event.get('Value_EUR', None)) else random.uniform(500, 50000)
-        num_events = len(group)
-        resources_involved = group['Resource'].nunique()
+        value_eur = float(store.value('Value_EUR', first_row, 0)) if pd.notna(store.value('Value_EUR', first_row)) else random.uniform(500, 50000)
+        case_resources = index.take(resource_codes, case)
+        num_events = len(case_resources)
+        resources_involved = len(np.unique(case_resources[case_resources >= 0]))
 
         # Determine chatter level based on PO complexity
         # High-value, many-event, many-resource POs are "noisy"
@@ -76,7 +79,9 @@ def generate_teams_data(sap_csv='sap_event_log.csv'):
             num_messages = random.randint(2, 8)
 
         # Get SAP resource involved for sender bias
-        sap_resources = group['Resource'].unique().tolist()
+        # Unique in order of first appearance, like Series.unique()
+        _, first_seen = np.unique(case_resources, return_index=True)
+        sap_resources = decode(store.vocab, 'Resource', case_resources[np.sort(first_seen)])
 
         for _ in range(num_messages):
             random_seconds = random.randint(0, int(lifespan.total_seconds()))
@@ -3,22 +3,30 @@ Phase 2A — Process Graph Builder
 Converts process mining outputs into a PyTorch Geometric graph for GNN training.
 
 Node types:
-  - Activity nodes (~42): features from bottleneck report
+  - Activity nodes (~42): features from bottleneck report, plus rework
+    (repeat/self-loop rate, loop length, hours lost) from rework_report.json
   - Resource nodes (~628): features from resource utilization
 
 Edge types:
   - Activity → Activity: directly-follows (from DFG)
   - Resource → Activity: resource performs activity (from event log)
+  - Resource → Resource: handover of work (from handover_matrix.npz, if present)
 
 Output: process_graph.pt (PyG Data object)
 """
 
 import json
-import pandas as pd
 import numpy as np
 import torch
 from torch_geometric.data import Data
 
+from event_store import read_event_log
+from handover import load_handover
+from rework import load_rework
+
+# Activity node features from rework_report.json (zeros when absent)
+REWORK_FEATURES = ('repeat_rate', 'self_loop_rate', 'avg_loop_length', 'rework_hours')
+
 
 def load_mining_outputs():
     """Load Phase 1 outputs."""
@@ -50,7 +58,13 @@ def build_node_features(bottlenecks, resources):
     activity_names = []
     activity_features = []
 
+    rework = load_rework()
+    if rework is None:
+        print("   [WARN] rework_report.json not found, rework features are zero")
+    rework_rows = {r['activity']: r for r in rework['activities']} if rework else {}
+
     for b in bottlenecks:
+        rw = rework_rows.get(b['activity'], {})
         activity_names.append(b['activity'])
         activity_features.append([
             b.get('frequency', 0),
@@ -61,6 +75,7 @@ def build_node_features(bottlenecks, resources):
             b.get('bottleneck_score', 0),
             b.get('avg_value_eur', 0),
             b.get('total_value_eur', 0),
+            *(rw.get(name, 0) for name in REWORK_FEATURES),
         ])
 
     n_activities = len(activity_names)
@@ -80,6 +95,7 @@ def build_node_features(bottlenecks, resources):
             r.get('total_value_handled', 0),
             0,  # padding
             0,  # padding
+            *(0 for _ in REWORK_FEATURES),  # padding
         ])
 
     n_resources = len(resource_names)
@@ -118,7 +134,7 @@ def build_edges(dfg, activity_names, resource_names, sap_csv='sap_event_log.csv'
     edge_src = []
     edge_dst = []
     edge_features = []
-    edge_types = []  # 0 = activity->activity, 1 = resource->activity
+    edge_types = []  # 0 = activity->activity, 1 = resource->activity, 2 = resource->resource
 
     # === DFG EDGES (Activity → Activity) ===
     dfg_count = 0
@@ -138,23 +154,48 @@ def build_edges(dfg, activity_names, resource_names, sap_csv='sap_event_log.csv'
     # === RESOURCE → ACTIVITY EDGES ===
     # Load SAP event log to get resource-activity relationships
     print("   Loading event log for resource-activity edges...")
-    df = pd.read_csv(sap_csv, usecols=['Activity', 'Resource'])
-
-    ra_stats = df.groupby(['Resource', 'Activity']).size().reset_index(name='frequency')
+    df = read_event_log(sap_csv, columns=['Activity', 'Resource'])
+    res_vocab = df['Resource'].cat.categories
+    act_vocab = df['Activity'].cat.categories
+
+    # Count (resource, activity) code pairs; sorted pair keys keep name order
+    res_codes = df['Resource'].cat.codes.to_numpy().astype(np.int64)
+    act_codes = df['Activity'].cat.codes.to_numpy().astype(np.int64)
+    valid = (res_codes >= 0) & (act_codes >= 0)
+    pair_keys, pair_freq = np.unique(
+        res_codes[valid] * len(act_vocab) + act_codes[valid], return_counts=True
+    )
 
-    ra_count = 0
-    for _, row in ra_stats.iterrows():
-        res = row['Resource']
-        act = row['Activity']
-        if res in res_to_idx and act in act_to_idx:
-            edge_src.append(res_to_idx[res])
-            edge_dst.append(act_to_idx[act])
-            edge_features.append([
-                row['frequency'],
-                0,  # no duration for this edge type
-            ])
-            edge_types.append(1)
-            ra_count += 1
+    # Vocabulary code -> graph node index (-1 if not a node)
+    res_node = np.array([res_to_idx.get(name, -1) for name in res_vocab], dtype=np.int64)
+    act_node = np.array([act_to_idx.get(name, -1) for name in act_vocab], dtype=np.int64)
+    src_nodes = res_node[pair_keys // len(act_vocab)]
+    dst_nodes = act_node[pair_keys % len(act_vocab)]
+    keep = (src_nodes >= 0) & (dst_nodes >= 0)
+
+    ra_count = int(keep.sum())
+    edge_src.extend(src_nodes[keep].tolist())
+    edge_dst.extend(dst_nodes[keep].tolist())
+    edge_features.extend([freq, 0] for freq in pair_freq[keep].tolist())  # no duration for this edge type
+    edge_types.extend([1] * ra_count)
+
+    # === RESOURCE → RESOURCE HANDOVER EDGES ===
+    # Sparse pairs from process_mining; features: handovers, avg handover hours
+    rr_count = 0
+    handover = load_handover()
+    if handover is None:
+        print("   [WARN] handover_matrix.npz not found, skipping handover edges")
+    else:
+        ho_node = np.array([res_to_idx.get(str(name), -1) for name in handover['resources']],
+                           dtype=np.int64)
+        src_nodes, dst_nodes = ho_node[handover['src']], ho_node[handover['dst']]
+        keep = (src_nodes >= 0) & (dst_nodes >= 0)
+        rr_count = int(keep.sum())
+        edge_src.extend(src_nodes[keep].tolist())
+        edge_dst.extend(dst_nodes[keep].tolist())
+        avg_hours = handover['dur_sum'][keep] / handover['count'][keep] / 3600
+        edge_features.extend([n, h] for n, h in zip(handover['count'][keep].tolist(), avg_hours.tolist()))
+        edge_types.extend([2] * rr_count)
 
     # Build tensors
     edge_index = torch.tensor([edge_src, edge_dst], dtype=torch.long)
@@ -170,7 +211,8 @@ def build_edges(dfg, activity_names, resource_names, sap_csv='sap_event_log.csv'
 
     print(f"   {dfg_count} activity->activity edges (DFG)")
     print(f"   {ra_count} resource->activity edges")
-    print(f"   {dfg_count + ra_count} total edges")
+    print(f"   {rr_count} resource->resource handover edges")
+    print(f"   {dfg_count + ra_count + rr_count} total edges")
 
     return edge_index, edge_attr, edge_type_tensor
 
@@ -0,0 +1,501 @@
+"""
+Mining Aggregates — bounded running state for out-of-core process mining.
+
+Streams the case-sorted event store in chunks of whole cases and keeps only
+what the Phase 1 artifacts need:
+  - per activity:  event count, duration count/sum/max + quantile sketch, value sum
+  - per edge:      directly-follows count, duration sum + quantile sketch, first occurrence
+  - per resource:  event count, value sum, activities performed, cases touched
+  - per case:      first/last timestamp, first/last activity, variant number
+
+Activity and edge state is O(activities²), resource state O(resources x
+activities), case state a few integers per case. No DataFrame of the full
+log is ever built. States over disjoint sets of cases merge, so case-hash
+shards can be mined in parallel and reduced into one state. The state can be
+persisted with an ingest watermark and later re-keyed to a rebuilt store, so
+nightly runs only fold in the new events.
+
+Output (incremental mode): mining_state/   (state.json + arrays.npz)
+
+Usage:
+  store = open_event_store()
+  agg = MiningAggregates.for_store(store)
+  for chunk in iter_case_chunks(store, load_case_index()):
+      agg.update(**chunk)
+  agg.merge(other_shard_agg)
+  agg.dfg(); agg.activity_frame(); agg.resource_frame(); agg.summary()
+  save_mining_state(agg, watermark); agg, watermark = load_mining_state()
+"""
+
+import json
+import os
+import shutil
+import zlib
+from collections import Counter
+import numpy as np
+import pandas as pd
+
+from event_store import NAT
+from quantile_sketch import REPORT_QUANTILES, QuantileSketch
+
+
+# Rows per streamed chunk (rounded up to whole cases)
+CHUNK_ROWS = 250_000
+
+# Sentinel for "edge not seen yet" in the first-occurrence keys
+NEVER = np.iinfo(np.int64).max
+
+# Persisted state for incremental re-mining
+STATE_DIR = 'mining_state'
+STATE_FILE = 'state.json'
+ARRAYS_FILE = 'arrays.npz'
+
+# Array attributes of MiningAggregates, saved as-is
+STATE_ARRAYS = (
+    'act_events', 'act_dur_n', 'act_dur_sum', 'act_dur_max', 'act_value_n', 'act_value_sum',
+    'edge_count', 'edge_dur_sum', 'edge_first_case', 'edge_first_pos',
+    'res_events', 'res_value_sum', 'res_cases', 'res_activities',
+    'case_events', 'case_first_ts', 'case_last_ts', 'case_first_act', 'case_last_act', 'case_variant',
+)
+
+
+def read_chunk(store, rows):
+    """Columns the miner needs for a range of store rows, without NaT-timestamp events."""
+    ts = np.asarray(store.array('Timestamp')[rows])
+    keep = ts != NAT
+    chunk = {
+        'case': np.asarray(store.array('Case_ID')[rows])[keep],
+        'act': np.asarray(store.array('Activity')[rows])[keep],
+        'ts': ts[keep],
+        'res': np.asarray(store.array('Resource')[rows])[keep],
+        'value': None,
+    }
+    if 'Value_EUR' in store.columns:
+        chunk['value'] = np.asarray(store.array('Value_EUR')[rows])[keep]
+    return chunk
+
+
+def iter_case_chunks(store, index, chunk_rows=CHUNK_ROWS):
+    """Yield read_chunk() dicts of ~chunk_rows store rows, always cut at a case boundary."""
+    offsets = np.asarray(index.offsets)
+    start = int(offsets[0])
+    while start < offsets[-1]:
+        # First case boundary at or after start + chunk_rows
+        cut = np.searchsorted(offsets, start + chunk_rows, side='left')
+        end = int(offsets[cut]) if cut < len(offsets) else int(offsets[-1])
+        yield read_chunk(store, slice(start, end))
+        start = end
+
+
+def case_shards(case_names, n_shards):
+    """Shard number of every case: stable CRC32 hash of the case id, modulo n_shards."""
+    return np.fromiter((zlib.crc32(str(name).encode()) % n_shards for name in case_names),
+                       dtype=np.int64, count=len(case_names))
+
+
+def iter_shard_chunks(store, index, cases, chunk_rows=CHUNK_ROWS):
+    """Yield read_chunk() dicts for a sorted subset of case codes, ~chunk_rows rows each."""
+    offsets = np.asarray(index.offsets)
+    lengths = offsets[cases + 1] - offsets[cases]
+    cum = np.cumsum(lengths)
+    first = 0
+    while first < len(cases):
+        last = max(int(np.searchsorted(cum, (cum[first - 1] if first else 0) + chunk_rows)), first) + 1
+        yield read_chunk(store, index.rows_of(cases[first:last]))
+        first = last
+
+
+def _runs(values):
+    """Start/end positions of runs of equal values in a sorted array."""
+    if len(values) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+    return starts, np.r_[starts[1:], len(values)]
+
+
+class MiningAggregates:
+    """Running Phase 1 statistics, keyed by the event store's vocabulary codes."""
+
+    def __init__(self, activities, resources, cases, has_value=True):
+        self.activities = list(activities)
+        self.resources = list(resources)
+        self.cases = list(cases)
+        self.has_value = has_value
+        n_act, n_res, n_case = len(self.activities), len(self.resources), len(self.cases)
+
+        self.n_events = 0
+
+        # Per activity (durations: time until the next event of the same case)
+        self.act_events = np.zeros(n_act, dtype=np.int64)
+        self.act_dur_n = np.zeros(n_act, dtype=np.int64)
+        self.act_dur_sum = np.zeros(n_act)
+        self.act_dur_max = np.full(n_act, -np.inf)
+        self.act_sketches = [QuantileSketch() for _ in range(n_act)]
+        self.act_value_n = np.zeros(n_act, dtype=np.int64)
+        self.act_value_sum = np.zeros(n_act)
+
+        # Per directly-follows edge (source x target)
+        self.edge_count = np.zeros((n_act, n_act), dtype=np.int64)
+        self.edge_dur_sum = np.zeros((n_act, n_act))
+        self.edge_sketches = {}   # (source, target) -> QuantileSketch, created on first use
+        # First occurrence as (case code, position in case): PM4Py's key order
+        self.edge_first_case = np.full((n_act, n_act), NEVER, dtype=np.int64)
+        self.edge_first_pos = np.full((n_act, n_act), NEVER, dtype=np.int64)
+
+        # Per resource
+        self.res_events = np.zeros(n_res, dtype=np.int64)
+        self.res_value_sum = np.zeros(n_res)
+        self.res_cases = np.zeros(n_res, dtype=np.int64)
+        self.res_activities = np.zeros((n_res, n_act), dtype=bool)
+
+        # Per case
+        self.case_events = np.zeros(n_case, dtype=np.int64)
+        self.case_first_ts = np.full(n_case, NAT, dtype=np.int64)
+        self.case_last_ts = np.full(n_case, NAT, dtype=np.int64)
+        self.case_first_act = np.full(n_case, -1, dtype=np.int32)
+        self.case_last_act = np.full(n_case, -1, dtype=np.int32)
+        self.case_variant = np.full(n_case, -1, dtype=np.int64)
+
+        # Distinct activity sequences: code bytes -> variant number
+        self.variant_ids = {}
+        self.variant_seqs = []
+
+    @classmethod
+    def for_store(cls, store):
+        """Empty state sized for an event store's vocabularies."""
+        return cls(store.vocab['Activity'], store.vocab['Resource'], store.vocab['Case_ID'],
+                   has_value='Value_EUR' in store.columns)
+
+    def update(self, case, act, ts, res, value=None, new=None):
+        """
+        Fold a case-sorted chunk of whole cases into the state.
+        new: optional mask of events that were not folded in before. The other
+        events of those cases only provide context (the previous event of a
+        case, resources already counted for it), so re-mining can add events
+        to cases that are still open.
+        """
+        n_act, n_res = len(self.activities), len(self.resources)
+        act = act.astype(np.int64)
+        res = res.astype(np.int64)
+        if new is None:
+            new = np.ones(len(case), dtype=bool)
+        starts, ends = _runs(case)
+        self.n_events += int(new.sum())
+
+        # Event counts and values
+        a_new = act[new & (act >= 0)]
+        self.act_events += np.bincount(a_new, minlength=n_act)
+        r_mask = new & (res >= 0)
+        self.res_events += np.bincount(res[r_mask], minlength=n_res)
+        self.res_activities[res[r_mask & (act >= 0)], act[r_mask & (act >= 0)]] = True
+        if value is not None:
+            v_mask = new & ~np.isnan(value)
+            a_val = v_mask & (act >= 0)
+            self.act_value_n += np.bincount(act[a_val], minlength=n_act)
+            self.act_value_sum += np.bincount(act[a_val], weights=value[a_val], minlength=n_act)
+            r_val = v_mask & (res >= 0)
+            self.res_value_sum += np.bincount(res[r_val], weights=value[r_val], minlength=n_res)
+
+        # Directly-follows pairs i -> i+1 whose target event is new; a source
+        # without an activity (code -1) has no duration to attribute
+        pair = np.flatnonzero((case[1:] == case[:-1]) & new[1:] & (act[:-1] >= 0))
+        src, dst = act[pair], act[pair + 1]
+        duration_ns = ts[pair + 1] - ts[pair]
+        seconds = duration_ns / 1e9
+        self.act_dur_n += np.bincount(src, minlength=n_act)
+        self.act_dur_sum += np.bincount(src, weights=seconds, minlength=n_act)
+        np.maximum.at(self.act_dur_max, src, seconds)
+        for a in np.unique(src):
+            self.act_sketches[a].add(seconds[src == a])
+
+        # Edges need a known activity at both ends
+        linked = dst >= 0
+        pair, edge = pair[linked], src[linked] * n_act + dst[linked]
+        clamped = np.maximum(seconds[linked], 0)
+        self.edge_count += np.bincount(edge, minlength=n_act * n_act).reshape(n_act, n_act)
+        self.edge_dur_sum += np.bincount(
+            edge, weights=clamped, minlength=n_act * n_act
+        ).reshape(n_act, n_act)
+        order = np.argsort(edge, kind='stable')
+        edge_starts, edge_ends = _runs(edge[order])
+        for s, e in zip(edge_starts.tolist(), edge_ends.tolist()):
+            key = divmod(int(edge[order[s]]), n_act)
+            self.edge_sketches.setdefault(key, QuantileSketch()).add(clamped[order[s:e]])
+        if len(edge):
+            keys, first = np.unique(edge, return_index=True)
+            run = np.searchsorted(starts, pair[first], side='right') - 1
+            first_case = case[pair[first]].astype(np.int64)
+            first_pos = pair[first] - starts[run]
+            s, d = keys // n_act, keys % n_act
+            earlier = (first_case < self.edge_first_case[s, d]) | (
+                (first_case == self.edge_first_case[s, d]) & (first_pos < self.edge_first_pos[s, d])
+            )
+            self.edge_first_case[s[earlier], d[earlier]] = first_case[earlier]
+            self.edge_first_pos[s[earlier], d[earlier]] = first_pos[earlier]
+
+        # Cases touched per resource: (case, resource) pairs not seen in the case's earlier events
+        run_of_row = np.repeat(np.arange(len(starts)), ends - starts)
+        pair_keys = run_of_row * n_res + res
+        seen = np.unique(pair_keys[~new & (res >= 0)])
+        fresh = np.setdiff1d(np.unique(pair_keys[new & (res >= 0)]), seen, assume_unique=True)
+        self.res_cases += np.bincount(fresh % n_res, minlength=n_res)
+
+        # Case state is recomputed from the whole case
+        cases = case[starts]
+        self.case_events[cases] = ends - starts
+        self.case_first_ts[cases] = ts[starts]
+        self.case_last_ts[cases] = ts[ends - 1]
+        self.case_first_act[cases] = act[starts]
+        self.case_last_act[cases] = act[ends - 1]
+        # Variant keys leave out events without an activity (code -1)
+        acts32 = act.astype(np.int32)
+        for c, s, e in zip(cases.tolist(), starts.tolist(), ends.tolist()):
+            seq = acts32[s:e]
+            key = seq[seq >= 0].tobytes()
+            vid = self.variant_ids.get(key)
+            if vid is None:
+                vid = self.variant_ids[key] = len(self.variant_seqs)
+                self.variant_seqs.append(key)
+            self.case_variant[c] = vid
+
+    def merge(self, other):
+        """
+        Fold in the state of another miner over the same store vocabularies.
+        The two states must hold disjoint sets of cases (e.g. case-hash shards).
+        """
+        assert len(other.activities) == len(self.activities) and len(other.cases) == len(self.cases)
+        self.n_events += other.n_events
+
+        self.act_events += other.act_events
+        self.act_dur_n += other.act_dur_n
+        self.act_dur_sum += other.act_dur_sum
+        np.maximum(self.act_dur_max, other.act_dur_max, out=self.act_dur_max)
+        for mine, theirs in zip(self.act_sketches, other.act_sketches):
+            mine.merge(theirs)
+        self.act_value_n += other.act_value_n
+        self.act_value_sum += other.act_value_sum
+
+        self.edge_count += other.edge_count
+        self.edge_dur_sum += other.edge_dur_sum
+        for key, sketch in other.edge_sketches.items():
+            self.edge_sketches.setdefault(key, QuantileSketch()).merge(sketch)
+        earlier = (other.edge_first_case < self.edge_first_case) | (
+            (other.edge_first_case == self.edge_first_case) & (other.edge_first_pos < self.edge_first_pos)
+        )
+        self.edge_first_case[earlier] = other.edge_first_case[earlier]
+        self.edge_first_pos[earlier] = other.edge_first_pos[earlier]
+
+        self.res_events += other.res_events
+        self.res_value_sum += other.res_value_sum
+        self.res_cases += other.res_cases
+        self.res_activities |= other.res_activities
+
+        # Cases: take theirs, renumbering their variants into ours
+        theirs = np.flatnonzero(other.case_events > 0)
+        remap = np.empty(len(other.variant_seqs), dtype=np.int64)
+        for vid, key in enumerate(other.variant_seqs):
+            if key not in self.variant_ids:
+                self.variant_ids[key] = len(self.variant_seqs)
+                self.variant_seqs.append(key)
+            remap[vid] = self.variant_ids[key]
+        self.case_events[theirs] = other.case_events[theirs]
+        self.case_first_ts[theirs] = other.case_first_ts[theirs]
+        self.case_last_ts[theirs] = other.case_last_ts[theirs]
+        self.case_first_act[theirs] = other.case_first_act[theirs]
+        self.case_last_act[theirs] = other.case_last_act[theirs]
+        self.case_variant[theirs] = remap[other.case_variant[theirs]]
+        return self
+
+    def remap(self, activities, resources, cases):
+        """
+        The same state keyed by the vocabularies of a rebuilt store. The new
+        vocabularies must contain every old name (vocabularies only grow when
+        events are appended); raises ValueError otherwise.
+        """
+        out = MiningAggregates(activities, resources, cases, self.has_value)
+        a = pd.Index(out.activities).get_indexer(self.activities)
+        r = pd.Index(out.resources).get_indexer(self.resources)
+        c = pd.Index(out.cases).get_indexer(self.cases)
+        if (a < 0).any() or (r < 0).any() or (c < 0).any():
+            raise ValueError("event store vocabularies lost names since the state was saved")
+
+        out.n_events = self.n_events
+        for name in ('act_events', 'act_dur_n', 'act_dur_sum', 'act_dur_max', 'act_value_n', 'act_value_sum'):
+            getattr(out, name)[a] = getattr(self, name)
+        for old, new in enumerate(a):
+            out.act_sketches[new] = self.act_sketches[old]
+
+        for name in ('edge_count', 'edge_dur_sum', 'edge_first_pos'):
+            getattr(out, name)[np.ix_(a, a)] = getattr(self, name)
+        seen = self.edge_first_case != NEVER
+        first_case = self.edge_first_case.copy()
+        first_case[seen] = c[first_case[seen]]
+        out.edge_first_case[np.ix_(a, a)] = first_case
+        out.edge_sketches = {(int(a[s]), int(a[d])): sk for (s, d), sk in self.edge_sketches.items()}
+
+        for name in ('res_events', 'res_value_sum', 'res_cases'):
+            getattr(out, name)[r] = getattr(self, name)
+        out.res_activities[np.ix_(r, a)] = self.res_activities
+
+        for name in ('case_events', 'case_first_ts', 'case_last_ts', 'case_variant'):
+            getattr(out, name)[c] = getattr(self, name)
+        for name in ('case_first_act', 'case_last_act'):
+            codes = getattr(self, name)
+            getattr(out, name)[c] = np.where(codes >= 0, a[codes], -1)
+
+        for key in self.variant_seqs:
+            codes = np.frombuffer(key, dtype=np.int32)
+            codes = np.where(codes >= 0, a[codes], -1).astype(np.int32).tobytes()
+            out.variant_ids[codes] = len(out.variant_seqs)
+            out.variant_seqs.append(codes)
+        return out
+
+    # ---- Artifacts ---------------------------------------------------------
+
+    def activity_frame(self):
+        """Per-activity duration/value statistics, same columns as detect_bottlenecks()."""
+        rows = []
+        for a in np.flatnonzero(self.act_events > 0):
+            n = self.act_dur_n[a]
+            mean = self.act_dur_sum[a] / n if n else np.float64(np.nan)
+            p50, p90, p99 = (np.float64(v) for v in self.act_sketches[a].quantiles(REPORT_QUANTILES))
+            row = {
+                'activity': self.activities[a],
+                'frequency': int(self.act_events[a]),
+                'avg_duration_hours': round(mean / 3600, 2),
+                'median_duration_hours': round(p50 / 3600, 2),
+                'p90_duration_hours': round(p90 / 3600, 2),
+                'p99_duration_hours': round(p99 / 3600, 2),
+                'max_duration_hours': round(self.act_dur_max[a] / 3600, 2) if n else 0,
+                'total_duration_hours': round(self.act_dur_sum[a] / 3600, 2),
+            }
+            if self.has_value:
+                vn = self.act_value_n[a]
+                row['avg_value_eur'] = self.act_value_sum[a] / vn if vn else np.nan
+                row['total_value_eur'] = self.act_value_sum[a]
+            rows.append(row)
+        frame = pd.DataFrame(rows)
+        if self.has_value and len(frame):
+            frame['avg_value_eur'] = frame['avg_value_eur'].round(2)
+            frame['total_value_eur'] = frame['total_value_eur'].round(2)
+        return frame
+
+    def resource_frame(self):
+        """Per-resource counts, same columns as analyze_resources() before ranking."""
+        active = np.flatnonzero(self.res_events > 0)
+        frame = pd.DataFrame({
+            'resource': [self.resources[r] for r in active],
+            'events_handled': self.res_events[active],
+            'unique_activities': self.res_activities[active].sum(axis=1),
+            'unique_cases': self.res_cases[active],
+        })
+        if self.has_value:
+            frame['total_value_handled'] = self.res_value_sum[active].round(2)
+        return frame
+
+    def n_activities(self):
+        return int((self.act_events > 0).sum())
+
+    def _first_seen_counts(self, codes):
+        codes = codes[codes >= 0]
+        uniq, first, counts = np.unique(codes, return_index=True, return_counts=True)
+        return {self.activities[uniq[i]]: int(counts[i]) for i in np.argsort(first, kind='stable')}
+
+    def dfg(self):
+        """(dfg_freq, dfg_perf, start_activities, end_activities) like discover_dfg_native()."""
+        src, dst = np.nonzero(self.edge_count)
+        order = np.lexsort((self.edge_first_pos[src, dst], self.edge_first_case[src, dst]))
+        dfg_freq = {}
+        dfg_perf = {}
+        for s, d in zip(src[order], dst[order]):
+            edge = (self.activities[s], self.activities[d])
+            dfg_freq[edge] = int(self.edge_count[s, d])
+            dfg_perf[edge] = float(self.edge_dur_sum[s, d] / self.edge_count[s, d])
+        seen = self.case_events > 0
+        return (dfg_freq, dfg_perf,
+                self._first_seen_counts(self.case_first_act[seen]),
+                self._first_seen_counts(self.case_last_act[seen]))
+
+    def edge_quantiles(self):
+        """{(source, target): (p50, p90, p99) seconds} from the edge sketches."""
+        return {
+            (self.activities[s], self.activities[d]): tuple(sketch.quantiles(REPORT_QUANTILES))
+            for (s, d), sketch in self.edge_sketches.items()
+        }
+
+    def variants(self, return_cases=False):
+        """Variant Counter (and variant number per case) like process_mining.trace_variants()."""
+        vids = self.case_variant[self.case_events > 0]
+        uniq, first, inverse, counts = np.unique(
+            vids, return_index=True, return_inverse=True, return_counts=True
+        )
+        order = np.argsort(first, kind='stable')
+        variants = Counter()
+        for i in order:
+            codes = np.frombuffer(self.variant_seqs[uniq[i]], dtype=np.int32)
+            variants[tuple(self.activities[c] for c in codes)] = int(counts[i])
+        if not return_cases:
+            return variants
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        return variants, rank[inverse]
+
+    def summary(self):
+        """Log-level numbers for build_process_stats(), like summarize_log()."""
+        seen = self.case_events > 0
+        first, last = self.case_first_ts[seen], self.case_last_ts[seen]
+        return {
+            'total_cases': int(seen.sum()),
+            'total_events': int(self.n_events),
+            'total_activities': self.n_activities(),
+            'total_resources': int((self.res_events > 0).sum()),
+            'start': pd.Timestamp(int(first.min()), tz='UTC') if len(first) else pd.NaT,
+            'end': pd.Timestamp(int(last.max()), tz='UTC') if len(last) else pd.NaT,
+            'case_duration_hours': pd.Series((last - first) / 1e9 / 3600),
+        }
+
+
+def save_mining_state(agg, watermark, state_dir=STATE_DIR):
+    """Persist aggregates + ingest watermark (max folded timestamp, epoch ns)."""
+    tmp_dir = state_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.savez(os.path.join(tmp_dir, ARRAYS_FILE), **{name: getattr(agg, name) for name in STATE_ARRAYS})
+    state = {
+        "watermark": int(watermark),
+        "n_events": int(agg.n_events),
+        "has_value": agg.has_value,
+        "activities": agg.activities,
+        "resources": agg.resources,
+        "cases": agg.cases,
+        "variants": [np.frombuffer(key, dtype=np.int32).tolist() for key in agg.variant_seqs],
+        "act_sketches": [sketch.to_dict() for sketch in agg.act_sketches],
+        "edge_sketches": [[s, d, sketch.to_dict()] for (s, d), sketch in agg.edge_sketches.items()],
+    }
+    with open(os.path.join(tmp_dir, STATE_FILE), 'w') as f:
+        json.dump(state, f)
+    shutil.rmtree(state_dir, ignore_errors=True)
+    os.replace(tmp_dir, state_dir)
+
+
+def load_mining_state(state_dir=STATE_DIR):
+    """(MiningAggregates, watermark) from save_mining_state(), or None if there is no state."""
+    try:
+        with open(os.path.join(state_dir, STATE_FILE), 'r') as f:
+            state = json.load(f)
+        arrays = np.load(os.path.join(state_dir, ARRAYS_FILE))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    agg = MiningAggregates(state["activities"], state["resources"], state["cases"], state["has_value"])
+    agg.n_events = state["n_events"]
+    for name in STATE_ARRAYS:
+        setattr(agg, name, arrays[name])
+    for seq in state["variants"]:
+        key = np.asarray(seq, dtype=np.int32).tobytes()
+        agg.variant_ids[key] = len(agg.variant_seqs)
+        agg.variant_seqs.append(key)
+    agg.act_sketches = [QuantileSketch.from_dict(d) for d in state["act_sketches"]]
+    agg.edge_sketches = {(s, d): QuantileSketch.from_dict(sk) for s, d, sk in state["edge_sketches"]}
+    return agg, state["watermark"]
@@ -0,0 +1,253 @@
+"""
+Mining Artifacts — the chunk accumulators next to MiningAggregates, folded in one pass.
+
+Activity WIP, rework, resource workload, handovers, the windowed series,
+the day cube and the attribute cube all fold case-sorted chunks of whole
+cases. ChunkArtifacts hands every chunk to all of them, so a streaming or
+sharded run reads the event store once (together with MiningAggregates)
+instead of once per artifact, and the in-memory run folds the DataFrame's
+code arrays once.
+
+Like MiningAggregates, the accumulators merge across case-hash shards,
+take a `new` mask for events not folded in before, can be re-keyed to a
+rebuilt store, and persist with the ingest watermark. Incremental re-mining
+then folds only the cases that gained events into every artifact. The
+state lives next to mining_state/ rather than in it, because the WIP and
+workload interval runs are moved, not copied, when it is saved.
+
+Output (incremental mode): mining_artifacts/   (meta.json + arrays.npz + interval runs)
+
+Usage:
+  artifacts = ChunkArtifacts.for_store(store, load_case_attributes(), window='month')
+  for chunk in iter_case_chunks(store, load_case_index()):
+      agg.update(**chunk)
+      artifacts.update(**chunk)
+  artifacts.merge(other_shard_artifacts)
+  save_artifact_state(artifacts, watermark)
+  artifacts = load_artifact_state(store, attributes, window, watermark)   # None if unusable
+"""
+
+import json
+import os
+import shutil
+import numpy as np
+
+from activity_wip import ActivityWIP
+from attribute_cube import MEASURES, AttributeCube
+from handover import HandoverMatrix
+from process_timeseries import STATE_ARRAYS as SERIES_ARRAYS
+from process_timeseries import WindowedSeries, series_time_range
+from resource_workload import IntervalRuns, ResourceWorkload
+from rework import ACTIVITY_ARRAYS, CASE_ARRAYS, ReworkStats
+from time_cube import CUBE_KINDS, DayCube
+
+
+# Persisted artifact state for incremental re-mining
+ARTIFACT_STATE_DIR = 'mining_artifacts'
+META_FILE = 'meta.json'
+ARRAYS_FILE = 'arrays.npz'
+
+# Spilled interval runs, per accumulator, inside the state (or spill) directory
+RUN_DIRS = {'wip': 'wip_runs', 'workload': 'workload_runs'}
+
+
+class ChunkArtifacts:
+    """The per-chunk accumulators of Phase 1, keyed by the event store's codes."""
+
+    def __init__(self, wip, rework, workload, handovers, series, cube, attribute_cube):
+        self.wip = wip
+        self.rework = rework
+        self.workload = workload
+        self.handovers = handovers
+        self.series = series                # None for an empty log
+        self.cube = cube
+        self.attribute_cube = attribute_cube
+
+    @classmethod
+    def for_store(cls, store, attributes, window='month', spill_dir=None):
+        """
+        Empty accumulators for an event store; the series windows cover its
+        time range. spill_dir: parent directory for the interval runs (a
+        temporary one per accumulator when None).
+        """
+        activities, resources, cases = (store.vocab[col]
+                                        for col in ('Activity', 'Resource', 'Case_ID'))
+        runs = {name: os.path.join(spill_dir, d) if spill_dir else None
+                for name, d in RUN_DIRS.items()}
+        time_range = series_time_range(store.array('Timestamp'))
+        return cls(
+            ActivityWIP(activities, spill_dir=runs['wip']),
+            ReworkStats(activities, cases),
+            ResourceWorkload(resources, spill_dir=runs['workload']),
+            HandoverMatrix(resources),
+            WindowedSeries.for_range(activities, *time_range, window) if time_range else None,
+            DayCube(activities),
+            AttributeCube.for_store(store, attributes),
+        )
+
+    def update(self, case, act, ts, res, value=None, new=None):
+        """Fold a case-sorted chunk of whole cases (read_chunk() columns) into every artifact."""
+        self.wip.update(case, act, ts, new)
+        self.rework.update(case, act, ts, new)
+        self.workload.update(case, res, ts, new)
+        self.handovers.update(case, res, ts, new)
+        if self.series is not None:
+            self.series.update(case, act, ts, new)
+        self.cube.update(case, act, ts, new)
+        self.attribute_cube.update(case, act, ts, new)
+        return self
+
+    def merge(self, other):
+        """Fold in the artifacts of a disjoint set of cases (e.g. a case-hash shard)."""
+        self.wip.merge(other.wip)
+        self.rework.merge(other.rework)
+        self.workload.merge(other.workload)
+        self.handovers.merge(other.handovers)
+        if self.series is not None:
+            self.series.merge(other.series)
+        self.cube.merge(other.cube)
+        self.attribute_cube.merge(other.attribute_cube)
+        return self
+
+    def remap(self, store, attributes, last_ts=None):
+        """
+        The same artifacts keyed by a rebuilt store's vocabularies, with the
+        series extended to its time range. last_ts: latest timestamp folded
+        in so far. Accumulators whose vocabulary did not change are kept as
+        they are. Raises ValueError when a vocabulary lost names or the
+        series windows of a full pass would differ (WindowedSeries.extend()).
+        """
+        activities, resources, cases = (list(store.vocab[col])
+                                        for col in ('Activity', 'Resource', 'Case_ID'))
+        same_act = self.wip.activities == activities
+        same_res = self.workload.resources == resources
+        series = self.series
+        if series is not None:
+            series = series if same_act else series.remap(activities)
+            time_range = series_time_range(store.array('Timestamp'))
+            if time_range is not None:
+                series.extend(*time_range, last_ts)
+        return ChunkArtifacts(
+            self.wip if same_act else self.wip.remap(activities),
+            (self.rework if same_act and self.rework.cases == cases
+             else self.rework.remap(activities, cases)),
+            self.workload if same_res else self.workload.remap(resources),
+            self.handovers if same_res else self.handovers.remap(resources),
+            series,
+            self.cube if same_act else self.cube.remap(activities),
+            self.attribute_cube.remap_into(AttributeCube.for_store(store, attributes)),
+        )
+
+
+def _state_arrays(artifacts):
+    arrays = {'wip__open_seconds': artifacts.wip.open_seconds,
+              'workload__active_start': artifacts.workload.active_start,
+              'workload__active_end': artifacts.workload.active_end}
+    for name, values in zip(('res', 'bucket', 'seconds'), artifacts.workload.cells):
+        arrays[f'workload__cells_{name}'] = values
+    for name in ACTIVITY_ARRAYS + CASE_ARRAYS:
+        arrays[f'rework__{name}'] = getattr(artifacts.rework, name)
+    for name in ('keys', 'count', 'dur_sum'):
+        arrays[f'handovers__{name}'] = getattr(artifacts.handovers, name)
+    if artifacts.series is not None:
+        arrays['series__bounds'] = artifacts.series.bounds
+        for name in SERIES_ARRAYS:
+            arrays[f'series__{name}'] = getattr(artifacts.series, name)
+    for kind, part in artifacts.cube.parts().items():
+        for name, values in zip(('keys', 'counts', 'sums'), part):
+            arrays[f'cube__{kind}_{name}'] = values
+    for name in MEASURES + ('cases',):
+        arrays[f'attribute_cube__{name}'] = getattr(artifacts.attribute_cube, name)
+    return arrays
+
+
+def save_artifact_state(artifacts, watermark, state_dir=ARTIFACT_STATE_DIR):
+    """
+    Persist the artifacts with the ingest watermark of the mining state.
+    The interval runs are moved into the state directory, and the
+    accumulators keep reading them from there.
+    """
+    tmp_dir = state_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.savez(os.path.join(tmp_dir, ARRAYS_FILE), **_state_arrays(artifacts))
+    cube = artifacts.attribute_cube
+    meta = {
+        "watermark": int(watermark),
+        "activities": artifacts.wip.activities,
+        "resources": artifacts.workload.resources,
+        "cases": artifacts.rework.cases,
+        "window": artifacts.series.window if artifacts.series is not None else None,
+        "wip_span": [artifacts.wip.first_ts, artifacts.wip.last_ts],
+        "bucket_ns": artifacts.workload.bucket_ns,
+        "dimensions": cube.dimensions,
+        "labels": [values[:-1] for values in cube.labels],
+    }
+    with open(os.path.join(tmp_dir, META_FILE), 'w') as f:
+        json.dump(meta, f)
+    for name, run_dir in RUN_DIRS.items():
+        IntervalRuns(os.path.join(tmp_dir, run_dir)).merge(getattr(artifacts, name).runs)
+    shutil.rmtree(state_dir, ignore_errors=True)
+    os.replace(tmp_dir, state_dir)
+    for name, run_dir in RUN_DIRS.items():
+        getattr(artifacts, name).runs = IntervalRuns(os.path.join(state_dir, run_dir))
+
+
+def load_artifact_state(store, attributes, window='month', watermark=None,
+                        state_dir=ARTIFACT_STATE_DIR):
+    """
+    ChunkArtifacts from save_artifact_state(), re-keyed to the store, or None
+    if there is no state, it was saved at another watermark or window, or
+    the store lost names since. An empty log saves no series, so its state
+    never matches a window and the next run is a full pass.
+    """
+    try:
+        with open(os.path.join(state_dir, META_FILE), 'r') as f:
+            meta = json.load(f)
+        with np.load(os.path.join(state_dir, ARRAYS_FILE)) as data:
+            arrays = {k: data[k] for k in data.files}
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if meta["watermark"] != watermark or meta["window"] != window:
+        return None
+
+    activities, resources, cases = meta["activities"], meta["resources"], meta["cases"]
+    wip = ActivityWIP(activities, spill_dir=os.path.join(state_dir, RUN_DIRS['wip']))
+    wip.open_seconds = arrays['wip__open_seconds']
+    wip.first_ts, wip.last_ts = meta["wip_span"]
+
+    workload = ResourceWorkload(resources, meta["bucket_ns"],
+                                spill_dir=os.path.join(state_dir, RUN_DIRS['workload']))
+    workload.active_start = arrays['workload__active_start']
+    workload.active_end = arrays['workload__active_end']
+    workload.cells = tuple(arrays[f'workload__cells_{name}']
+                           for name in ('res', 'bucket', 'seconds'))
+
+    rework = ReworkStats(activities, cases)
+    for name in ACTIVITY_ARRAYS + CASE_ARRAYS:
+        setattr(rework, name, arrays[f'rework__{name}'])
+
+    handovers = HandoverMatrix(resources)
+    for name in ('keys', 'count', 'dur_sum'):
+        setattr(handovers, name, arrays[f'handovers__{name}'])
+
+    series = WindowedSeries(activities, arrays['series__bounds'], window)
+    for name in SERIES_ARRAYS:
+        setattr(series, name, arrays[f'series__{name}'])
+
+    cube = DayCube.from_parts(activities, {
+        kind: tuple(arrays[f'cube__{kind}_{name}'] for name in ('keys', 'counts', 'sums'))
+        for kind in CUBE_KINDS
+    })
+
+    attribute_cube = AttributeCube(activities, meta["dimensions"], meta["labels"],
+                                   np.empty(0, dtype=np.int64))
+    for name in MEASURES + ('cases',):
+        setattr(attribute_cube, name, arrays[f'attribute_cube__{name}'])
+
+    artifacts = ChunkArtifacts(wip, rework, workload, handovers, series, cube, attribute_cube)
+    try:
+        return artifacts.remap(store, attributes, watermark)
+    except ValueError as e:
+        print(f"[WARN] {e}")
+        return None
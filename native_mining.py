@@ -0,0 +1,216 @@
+"""
+Native DFG and Bottleneck Mining — numpy/pandas only.
+
+Directly-follows graph and per-activity duration statistics computed on the
+case-sorted code arrays of the event store (activity codes, case codes,
+epoch-ns timestamps), without PM4Py. process_mining.py runs them on the
+loaded log's codes; the API server runs them on the rows of a case subset,
+gathered from the memory-mapped store through the CSR case index, so a
+filtered topology neither imports PM4Py nor loads the whole log.
+
+Usage:
+  cases = load_case_attributes().select({'Spend area text': 'IT'})
+  bottlenecks, dfg_data = mine_cases(cases)
+"""
+
+import numpy as np
+import pandas as pd
+
+from case_index import CaseIndex, load_case_index
+from event_store import NAT, SAP_CSV, open_event_store
+from mining_aggregates import read_chunk
+from quantile_sketch import REPORT_QUANTILES, group_quantiles, quantile_accuracy
+
+
+def _first_seen_counts(names, codes):
+    """{name: count} for codes, keyed in order of first occurrence (like a Counter)."""
+    uniq, first_pos, counts = np.unique(codes, return_index=True, return_counts=True)
+    order = np.argsort(first_pos, kind='stable')
+    return {names[uniq[i]]: int(counts[i]) for i in order}
+
+
+def dfg_arrays(names, act, case, ts):
+    """
+    Frequency DFG, mean performance DFG and start/end activities in a single
+    shifted-array pass over case-sorted codes, keys in the first-occurrence
+    order PM4Py produces. Also returns {edge: (p50, p90, p99) seconds}.
+    """
+    act = np.asarray(act, dtype=np.int64)
+    ts = np.asarray(ts, dtype=np.int64)
+    index = CaseIndex.from_sorted_codes(case)
+
+    # Directly-follows pairs: row i -> row i+1 inside the same case, both
+    # with a known activity (code -1 has no name)
+    known = act >= 0
+    follows = np.flatnonzero(~index.is_last() & known & np.roll(known, -1))
+    pair_keys = act[follows] * len(names) + act[follows + 1]
+    duration_ns = np.maximum(ts[follows + 1] - ts[follows], 0)
+
+    keys, first_pos, inverse, freq = np.unique(
+        pair_keys, return_index=True, return_inverse=True, return_counts=True
+    )
+    if np.all(duration_ns % 10**9 == 0):
+        # Whole seconds: float64 sums are exact, so sum / count is the
+        # correctly rounded mean, exactly as statistics.mean computes it
+        duration_sum = np.bincount(inverse, weights=duration_ns // 10**9, minlength=len(keys))
+    else:
+        duration_sum = np.bincount(inverse, weights=duration_ns / 1e9, minlength=len(keys))
+    mean_seconds = duration_sum / freq
+    # Percentiles through the same sketches the streaming miner keeps
+    tails = group_quantiles(duration_ns / 1e9, inverse, len(keys))
+
+    dfg_freq = {}
+    dfg_perf = {}
+    quantiles = {}
+    for i in np.argsort(first_pos, kind='stable'):
+        edge = (names[keys[i] // len(names)], names[keys[i] % len(names)])
+        dfg_freq[edge] = int(freq[i])
+        dfg_perf[edge] = float(mean_seconds[i])
+        quantiles[edge] = tuple(tails[i].tolist())
+
+    nonempty = index.lengths() > 0
+    first = act[index.offsets[:-1][nonempty]]
+    last = act[index.offsets[1:][nonempty] - 1]
+    start_activities = _first_seen_counts(names, first[first >= 0])
+    end_activities = _first_seen_counts(names, last[last >= 0])
+
+    return dfg_freq, dfg_perf, start_activities, end_activities, quantiles
+
+
+def activity_arrays(names, act, case, ts, value=None):
+    """
+    Per-activity frequency, duration (time until the next event of the case)
+    and value statistics of case-sorted codes, unranked: the columns
+    rank_bottlenecks() scores. value: optional per-event Value_EUR.
+    """
+    act = np.asarray(act, dtype=np.int64)
+    index = CaseIndex.from_sorted_codes(case)
+    ts = np.asarray(ts, dtype=np.int64)
+    next_ts = index.next_within_case(ts, NAT)
+    has_next = next_ts != NAT
+    duration = np.full(len(ts), np.nan)
+    duration[has_next] = (next_ts[has_next] - ts[has_next]) / 1e9
+
+    # Per-activity stats
+    # (built-in cythonized aggregations; durations in hours rounded afterwards).
+    # The median is exact; the p90/p99 tails go through the same sketches the
+    # streaming miner keeps
+    known = act >= 0
+    grouped = pd.Series(duration[known]).groupby(act[known])
+    hours = grouped.agg(['mean', 'median', 'max', 'sum']) / 3600
+    tails = pd.DataFrame(group_quantiles(duration, act, len(names)) / 3600,
+                         columns=REPORT_QUANTILES).loc[hours.index]
+    activity_stats = pd.DataFrame({
+        'activity': [names[a] for a in hours.index],
+        'frequency': grouped.size().to_numpy(),
+        'avg_duration_hours': hours['mean'].round(2).to_numpy(),
+        'median_duration_hours': hours['median'].round(2).to_numpy(),
+        'p90_duration_hours': tails[0.9].round(2).to_numpy(),
+        'p99_duration_hours': tails[0.99].round(2).to_numpy(),
+        'max_duration_hours': hours['max'].round(2).fillna(0).to_numpy(),
+        'total_duration_hours': hours['sum'].round(2).to_numpy(),
+    })
+
+    # Add value info
+    if value is not None:
+        values = pd.Series(np.asarray(value, dtype=float)[known]).groupby(act[known])
+        activity_stats['avg_value_eur'] = values.mean().round(2).to_numpy()
+        activity_stats['total_value_eur'] = values.sum().round(2).to_numpy()
+
+    return activity_stats
+
+
+def dfg_report(dfg_freq, dfg_perf, start_activities, end_activities, quantiles=None):
+    """
+    Serialisable DFG data (dfg_data.json) from discovered frequencies/durations.
+    quantiles: optional {edge: (p50, p90, p99) seconds} for tail durations.
+    """
+    # Build serialisable DFG data
+    dfg_data = {
+        "edges": [],
+        "start_activities": dict(start_activities),
+        "end_activities": dict(end_activities),
+    }
+    if quantiles:
+        dfg_data["duration_quantiles"] = quantile_accuracy()
+
+    for (src, tgt), freq in dfg_freq.items():
+        duration = dfg_perf.get((src, tgt), 0)
+        if isinstance(duration, (int, float)):
+            duration_hours = round(duration / 3600, 2)
+        else:
+            duration_hours = 0
+        dfg_data["edges"].append({
+            "source": src,
+            "target": tgt,
+            "frequency": int(freq),
+            "avg_duration_hours": duration_hours
+        })
+        if quantiles and (src, tgt) in quantiles:
+            for q, seconds in zip(REPORT_QUANTILES, quantiles[(src, tgt)]):
+                dfg_data["edges"][-1][f"p{round(q * 100)}_duration_hours"] = round(seconds / 3600, 2)
+
+    # Sort by frequency descending
+    dfg_data["edges"].sort(key=lambda x: x["frequency"], reverse=True)
+
+    print(f"   Found {len(dfg_data['edges'])} edges in DFG")
+    print(f"   Top 5 transitions:")
+    for edge in dfg_data["edges"][:5]:
+        print(f"      {edge['source']} -> {edge['target']}: "
+              f"{edge['frequency']}x, avg {edge['avg_duration_hours']}h")
+
+    return dfg_data
+
+
+def rank_bottlenecks(activity_stats):
+    """Score, rank and serialise per-activity statistics."""
+    # Bottleneck score: weighted combination of duration and frequency
+    max_dur = activity_stats['avg_duration_hours'].max()
+    max_freq = activity_stats['frequency'].max()
+
+    if max_dur > 0 and max_freq > 0:
+        activity_stats['bottleneck_score'] = (
+            0.6 * (activity_stats['avg_duration_hours'] / max_dur) +
+            0.4 * (activity_stats['frequency'] / max_freq)
+        ).round(3)
+    else:
+        activity_stats['bottleneck_score'] = 0
+
+    activity_stats = activity_stats.sort_values('bottleneck_score', ascending=False)
+
+    # Build report
+    bottlenecks = activity_stats.to_dict(orient='records')
+
+    # Clean NaN values for JSON
+    for b in bottlenecks:
+        for k, v in b.items():
+            if isinstance(v, float) and (np.isnan(v) or np.isinf(v)):
+                b[k] = 0
+
+    print(f"   Top 5 bottlenecks:")
+    for b in bottlenecks[:5]:
+        score = b['bottleneck_score']
+        dur = b['avg_duration_hours']
+        freq = b['frequency']
+        print(f"      [{score:.3f}] {b['activity']}: "
+              f"avg {dur}h, {freq} occurrences")
+
+    return bottlenecks
+
+
+def mine_cases(cases, csv_path=SAP_CSV):
+    """
+    Bottlenecks and DFG data of the cases selected by a boolean mask over
+    case codes (CaseAttributeIndex.select()). Only the rows of those cases
+    are read, as CSR ranges of the memory-mapped store; events without a
+    timestamp are skipped like in the mined reports.
+    """
+    store = open_event_store(csv_path)
+    index = load_case_index(csv_path)
+    chunk = read_chunk(store, index.rows_of(np.flatnonzero(cases)))
+    names = store.vocab['Activity']
+    dfg_data = dfg_report(*dfg_arrays(names, chunk['act'], chunk['case'], chunk['ts']))
+    if len(chunk['ts']) == 0:
+        return [], dfg_data
+    stats = activity_arrays(names, chunk['act'], chunk['case'], chunk['ts'], chunk['value'])
+    return rank_bottlenecks(stats), dfg_data
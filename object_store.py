@@ -0,0 +1,339 @@
+"""
+Object-Centric Event Store — SAP, Jira and Teams events linked through shared objects.
+
+Instead of one case notion per row, every event references the objects it
+touches:
+  - SAP events:   their PO item
+  - Jira events:  the ticket and the PO item it was raised for (SAP_PO_ID)
+  - Teams events: the message thread and the PO item it discusses
+
+Events from all sources are merged into one time-sorted columnar store
+(int64 epoch ns, int32 activity/resource codes over shared vocabularies).
+The event-object relation is kept twice, in CSR form:
+  - event -> objects: e2o_offsets / e2o_objects
+  - object -> events: o2e_offsets / o2e_events, each object's events in time order
+
+Object ids are grouped by type, so all objects of one type are a contiguous
+id range and their event lists a contiguous slice of o2e_events.
+Flattening the log onto one object type (e.g. PO item as case, which pulls
+in the Jira and Teams events of that PO) is then one slice. The
+object-centric DFG follows every object's own event sequence, so no joins
+are needed.
+
+Output: process_ocel.store/   (meta.json + one .npy file per array)
+
+Usage:
+  ocel = open_object_store()                   # builds/rebuilds from the three sources
+  chunk = ocel.flatten('po_item')              # case-sorted {'case', 'act', 'ts', 'res'}
+  df = ocel.flatten_frame('jira_ticket')       # Case_ID / Activity / Timestamp / Resource
+  ocel.events_of(ocel.object_id('po_item', '4507000182_00030'))
+  ocel.oc_dfg()                                # {object type: {"edges": [...], ...}}
+"""
+
+import json
+import os
+import shutil
+import time
+import numpy as np
+import pandas as pd
+
+from event_store import (META_FILE, NAT, SAP_CSV, _source_signature, from_epoch_ns,
+                         open_event_store, resolve_source, to_epoch_ns)
+
+
+JIRA_CSV = 'synthetic_jira_data.csv'
+TEAMS_CSV = 'synthetic_teams_data.csv'
+OCEL_STORE = 'process_ocel.store'
+
+# Object types, in object-id order
+OBJECT_TYPES = ('po_item', 'jira_ticket', 'teams_thread')
+SOURCES = ('SAP', 'Jira', 'Teams')
+
+ARRAYS = ('ts', 'act', 'res', 'source', 'e2o_offsets', 'e2o_objects',
+          'o2e_offsets', 'o2e_events', 'type_offsets')
+
+
+def _codes(values, names):
+    """Codes of values in the sorted vocabulary names (-1 for missing)."""
+    return pd.Categorical(values, categories=names).codes.astype(np.int32)
+
+
+def _csr_offsets(sorted_keys, n_keys):
+    """CSR offsets of keys 0..n_keys-1 over an already sorted key array."""
+    return np.searchsorted(sorted_keys, np.arange(n_keys + 1)).astype(np.int64)
+
+
+def _read_sources(sap_csv, jira_csv, teams_csv):
+    """
+    Per source: event columns and (event row, object type, object name)
+    links. SAP comes from the event store, already dictionary-encoded.
+    """
+    store = open_event_store(sap_csv)
+    ts = np.asarray(store.array('Timestamp'))
+    keep = ts != NAT
+    sap_case = np.asarray(store.array('Case_ID'))[keep]
+    sap_names = {col: np.array(store.vocab[col], dtype=object) for col in ('Activity', 'Resource')}
+    sap_act = np.asarray(store.array('Activity'))[keep]
+    sap_res = np.asarray(store.array('Resource'))[keep]
+    sources = [{
+        'ts': ts[keep],
+        'act': np.where(sap_act >= 0, sap_names['Activity'][np.maximum(sap_act, 0)], None),
+        'res': np.where(sap_res >= 0, sap_names['Resource'][np.maximum(sap_res, 0)], None),
+        'links': [('po_item', np.array(store.vocab['Case_ID'], dtype=object)[sap_case])],
+    }]
+
+    jira = pd.read_csv(jira_csv, usecols=['Case_ID', 'SAP_PO_ID', 'Status', 'Assignee',
+                                          'Timestamp'], dtype=str)
+    jira_ts = to_epoch_ns(jira['Timestamp'])
+    jira = jira[jira_ts != NAT]
+    sources.append({
+        'ts': jira_ts[jira_ts != NAT],
+        # Ticket lifecycle = one event per ticket, as in unify_datasets
+        'act': ('Jira: ' + jira['Status'].astype(str)).to_numpy(dtype=object),
+        'res': jira['Assignee'].to_numpy(dtype=object),
+        'links': [('jira_ticket', jira['Case_ID'].to_numpy(dtype=object)),
+                  ('po_item', jira['SAP_PO_ID'].to_numpy(dtype=object))],
+    })
+
+    teams = pd.read_csv(teams_csv, dtype=str)
+    teams_ts = to_epoch_ns(teams['Timestamp'])
+    teams = teams[teams_ts != NAT]
+    # Teams threads are keyed by the PO item they discuss
+    po = teams['SAP_PO_ID'] if 'SAP_PO_ID' in teams.columns else teams['Case_ID']
+    sources.append({
+        'ts': teams_ts[teams_ts != NAT],
+        'act': teams['Activity'].to_numpy(dtype=object),
+        'res': teams['Resource'].to_numpy(dtype=object),
+        'links': [('teams_thread', teams['Case_ID'].to_numpy(dtype=object)),
+                  ('po_item', po.to_numpy(dtype=object))],
+    })
+    return sources, [sap_csv, jira_csv, teams_csv]
+
+
+def build_object_store(sap_csv=SAP_CSV, jira_csv=JIRA_CSV, teams_csv=TEAMS_CSV,
+                       store_dir=OCEL_STORE):
+    """Merge the three sources into the object-centric store (see module docstring)."""
+    print(f"[INFO] Building object-centric store {store_dir}...")
+    start = time.time()
+    sources, paths = _read_sources(resolve_source(sap_csv), jira_csv, teams_csv)
+
+    # Shared vocabularies (sorted, like the event store)
+    def vocabulary(values):
+        names = pd.unique(np.concatenate(values))
+        return sorted(str(v) for v in names if isinstance(v, str))
+
+    activities = vocabulary([s['act'] for s in sources])
+    resources = vocabulary([s['res'] for s in sources])
+    objects = {t: vocabulary([names for s in sources for typ, names in s['links'] if typ == t])
+               for t in OBJECT_TYPES}
+    type_offsets = np.concatenate([[0], np.cumsum([len(objects[t]) for t in OBJECT_TYPES])])
+
+    # Events of all sources, time-sorted (stable: ties keep source order)
+    ts = np.concatenate([s['ts'] for s in sources])
+    order = np.argsort(ts, kind='stable')
+    event_id = np.empty(len(ts), dtype=np.int64)
+    event_id[order] = np.arange(len(ts))
+    act = np.concatenate([_codes(s['act'], activities) for s in sources])[order]
+    res = np.concatenate([_codes(s['res'], resources) for s in sources])[order]
+    source = np.repeat(np.arange(len(sources), dtype=np.int8), [len(s['ts']) for s in sources])[order]
+
+    # Event-object links as global ids
+    link_event, link_object = [], []
+    first_row = np.concatenate([[0], np.cumsum([len(s['ts']) for s in sources])])
+    for i, s in enumerate(sources):
+        rows = event_id[first_row[i]:first_row[i + 1]]
+        for typ, names in s['links']:
+            code = _codes(names, objects[typ]).astype(np.int64)
+            link_event.append(rows[code >= 0])
+            link_object.append(code[code >= 0] + type_offsets[OBJECT_TYPES.index(typ)])
+    link_event = np.concatenate(link_event)
+    link_object = np.concatenate(link_object)
+
+    # Both CSR directions; sorting by event id keeps every object's events in time order
+    by_event = np.lexsort((link_object, link_event))
+    by_object = np.lexsort((link_event, link_object))
+
+    arrays = {
+        'ts': ts[order], 'act': act, 'res': res, 'source': source,
+        'e2o_offsets': _csr_offsets(link_event[by_event], len(ts)),
+        'e2o_objects': link_object[by_event],
+        'o2e_offsets': _csr_offsets(link_object[by_object], int(type_offsets[-1])),
+        'o2e_events': link_event[by_object],
+        'type_offsets': type_offsets.astype(np.int64),
+    }
+    tmp_dir = store_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for name in ARRAYS:
+        np.save(os.path.join(tmp_dir, f'{name}.npy'), arrays[name])
+    meta = {
+        "sources": [_source_signature(p) for p in paths],
+        "n_events": int(len(ts)),
+        "n_objects": int(type_offsets[-1]),
+        "n_links": int(len(link_event)),
+        "vocab": {"activities": activities, "resources": resources,
+                  "sources": list(SOURCES), "objects": objects},
+    }
+    with open(os.path.join(tmp_dir, META_FILE), 'w') as f:
+        json.dump(meta, f)
+    shutil.rmtree(store_dir, ignore_errors=True)
+    os.replace(tmp_dir, store_dir)
+
+    elapsed = time.time() - start
+    print(f"[OK] Object-centric store ready: {meta['n_events']} events, "
+          f"{meta['n_objects']} objects ({', '.join(f'{len(objects[t])} {t}' for t in OBJECT_TYPES)}), "
+          f"{meta['n_links']} event-object links ({elapsed:.1f}s)")
+    return ObjectStore(store_dir, meta)
+
+
+class ObjectStore:
+    """Read-only, memory-mapped view of the object-centric event log."""
+
+    def __init__(self, store_dir, meta):
+        self.store_dir = store_dir
+        self.meta = meta
+        self.n_events = meta["n_events"]
+        self.n_objects = meta["n_objects"]
+        self.vocab = meta["vocab"]
+        self._arrays = {}
+
+    def array(self, name):
+        if name not in self._arrays:
+            self._arrays[name] = np.load(os.path.join(self.store_dir, f'{name}.npy'),
+                                         mmap_mode='r')
+        return self._arrays[name]
+
+    def object_range(self, object_type):
+        """[first, last) global object ids of a type."""
+        offsets = self.array('type_offsets')
+        t = OBJECT_TYPES.index(object_type)
+        return int(offsets[t]), int(offsets[t + 1])
+
+    def object_id(self, object_type, name):
+        """Global object id of a named object, or None if there is no such object."""
+        names = self.vocab["objects"][object_type]
+        i = np.searchsorted(names, name)
+        if i == len(names) or names[i] != name:
+            return None
+        return self.object_range(object_type)[0] + int(i)
+
+    def object_name(self, obj):
+        offsets = self.array('type_offsets')
+        t = int(np.searchsorted(offsets, obj, side='right')) - 1
+        return OBJECT_TYPES[t], self.vocab["objects"][OBJECT_TYPES[t]][obj - offsets[t]]
+
+    def events_of(self, obj):
+        """Event ids of an object, in time order."""
+        offsets = self.array('o2e_offsets')
+        return self.array('o2e_events')[offsets[obj]:offsets[obj + 1]]
+
+    def objects_of(self, event):
+        """Global object ids referenced by an event."""
+        offsets = self.array('e2o_offsets')
+        return self.array('e2o_objects')[offsets[event]:offsets[event + 1]]
+
+    def flatten(self, object_type):
+        """
+        Case-sorted event arrays with the objects of one type as cases:
+        {'case': object code within the type, 'act', 'ts', 'res'}. An event
+        linked to several objects of the type appears once per object.
+        """
+        lo, hi = self.object_range(object_type)
+        offsets = self.array('o2e_offsets')
+        events = np.asarray(self.array('o2e_events')[offsets[lo]:offsets[hi]])
+        case = np.repeat(np.arange(hi - lo, dtype=np.int32), np.diff(offsets[lo:hi + 1]))
+        return {
+            'case': case,
+            'act': np.asarray(self.array('act'))[events],
+            'ts': np.asarray(self.array('ts'))[events],
+            'res': np.asarray(self.array('res'))[events],
+        }
+
+    def flatten_frame(self, object_type):
+        """flatten() as an event log DataFrame (categorical names, UTC timestamps)."""
+        chunk = self.flatten(object_type)
+        categorical = {
+            'Case_ID': (chunk['case'], self.vocab["objects"][object_type]),
+            'Activity': (chunk['act'], self.vocab["activities"]),
+            'Resource': (chunk['res'], self.vocab["resources"]),
+        }
+        frame = {col: pd.Categorical.from_codes(codes, categories=pd.Index(names, dtype=object))
+                 for col, (codes, names) in categorical.items()}
+        frame['Timestamp'] = from_epoch_ns(chunk['ts'])
+        return pd.DataFrame(frame)[['Case_ID', 'Activity', 'Timestamp', 'Resource']]
+
+    def oc_dfg(self, object_types=OBJECT_TYPES):
+        """
+        Object-centric DFG: per object type, directly-follows edges along each
+        object's own event sequence, in the dfg_data.json edge shape, plus
+        start/end activity counts.
+        """
+        n_act = len(self.vocab["activities"])
+        names = self.vocab["activities"]
+        offsets = np.asarray(self.array('o2e_offsets'))
+        events = np.asarray(self.array('o2e_events'))
+        act = np.asarray(self.array('act')).astype(np.int64)[events]
+        ts = np.asarray(self.array('ts'))[events]
+        lengths = np.diff(offsets)
+        owner = np.repeat(np.arange(self.n_objects), lengths)
+        owner_type = np.searchsorted(self.array('type_offsets'), owner, side='right') - 1
+
+        # Directly-follows pairs of an object, both ends with a known activity
+        pair = np.flatnonzero((owner[1:] == owner[:-1]) & (act[1:] >= 0) & (act[:-1] >= 0))
+        keys = (owner_type[pair] * n_act + act[pair]) * n_act + act[pair + 1]
+        uniq, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        dur_sum = np.bincount(inverse, weights=(ts[pair + 1] - ts[pair]) / 1e9,
+                              minlength=len(uniq))
+        nonempty = lengths > 0
+        first, last = offsets[:-1][nonempty], offsets[1:][nonempty] - 1
+        first_type = owner_type[first]
+        last_type = owner_type[last]
+
+        result = {}
+        for t, object_type in enumerate(OBJECT_TYPES):
+            if object_type not in object_types:
+                continue
+            sel = np.flatnonzero(uniq // (n_act * n_act) == t)
+            edges = [
+                {"source": names[(uniq[k] // n_act) % n_act], "target": names[uniq[k] % n_act],
+                 "frequency": int(counts[k]),
+                 "avg_duration_hours": round(float(dur_sum[k] / counts[k]) / 3600, 2)}
+                for k in sel
+            ]
+            edges.sort(key=lambda e: e["frequency"], reverse=True)
+            of_type = first_type == t
+            starts = first[of_type & (act[first] >= 0)]
+            ends = last[(last_type == t) & (act[last] >= 0)]
+            result[object_type] = {
+                "objects": int(of_type.sum()),
+                "edges": edges,
+                "start_activities": {names[a]: int(n) for a, n in enumerate(
+                    np.bincount(act[starts], minlength=n_act)) if n},
+                "end_activities": {names[a]: int(n) for a, n in enumerate(
+                    np.bincount(act[ends], minlength=n_act)) if n},
+            }
+        return result
+
+
+def open_object_store(sap_csv=SAP_CSV, jira_csv=JIRA_CSV, teams_csv=TEAMS_CSV,
+                      store_dir=OCEL_STORE):
+    """
+    Open the object-centric store, building it on first use or when any of
+    the three sources has changed since it was built.
+    """
+    meta = None
+    try:
+        with open(os.path.join(store_dir, META_FILE), 'r') as f:
+            meta = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    paths = [resolve_source(sap_csv), jira_csv, teams_csv]
+    if all(os.path.exists(p) for p in paths):
+        if meta is None or meta.get("sources") != [_source_signature(p) for p in paths]:
+            return build_object_store(*paths, store_dir)
+    elif meta is None:
+        missing = [p for p in paths if not os.path.exists(p)]
+        raise FileNotFoundError(f"{', '.join(missing)} not found and no object store at '{store_dir}'")
+
+    return ObjectStore(store_dir, meta)
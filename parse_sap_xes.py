@@ -1,20 +1,70 @@
 """
 Parse BPI Challenge 2019 XES file (real SAP procurement data).
 Uses iterative XML parsing for the 728MB file.
-Output: sap_event_log.csv
+Events are handed on as columnar batches ({attribute key: values}) of at
+most --batch-size rows rather than one dict per event.
+With --workers N the file is split into byte ranges of at most SHARD_BYTES
+at <trace> boundaries and the shards are parsed in a process pool (output
+order is preserved).
+With --stream the batches are flushed as they arrive, in fixed-size Parquet
+row groups, so peak memory does not grow with the size of the log.
+Output: sap_event_log.csv (or sap_event_log.parquet with --stream)
 """
 import xml.etree.ElementTree as ET
 import pandas as pd
+import argparse
 import csv
+import io
+import mmap
+import os
+import re
 import sys
 import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import unescape
+
+import event_store
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None  # only needed for --stream
 
 XES_FILE = 'BPI_Challenge_2019.xes'
 OUTPUT_FILE = 'sap_event_log.csv'
+PARQUET_FILE = 'sap_event_log.parquet'
+
+# Rows per Parquet row group in --stream mode
+BATCH_SIZE = 100_000
 
 # XES namespace
 NS = '{http://www.xes-standard.org/}'
 
+# Byte markers used to cut the file into trace-aligned shards
+TRACE_OPEN = b'<trace'
+LOG_CLOSE = b'</log>'
+
+# Key of every attribute element, for the --stream schema pre-scan
+ATTRIBUTE_KEY = re.compile(rb'<(?:string|int|float|date|boolean)\s[^>]*?\bkey="([^"]*)"')
+
+# Shards per worker: more, smaller shards keep the pool busy at the tail
+SHARDS_PER_WORKER = 4
+
+# Upper bound on the XML bytes of one shard, so the batches a worker returns
+# (and the 2 x workers shards in flight) do not grow with the log
+SHARD_BYTES = 32 << 20
+
+# Standardized names for the XES keys we rely on downstream
+RENAME_MAP = {
+    'concept:name': 'Activity',
+    'time:timestamp': 'Timestamp',
+    'org:resource': 'Resource',
+    'Cumulative net worth (EUR)': 'Value_EUR',
+}
+PRIORITY_COLS = ['Case_ID', 'Activity', 'Timestamp', 'Resource', 'Value_EUR']
+
 
 def parse_attributes(elem):
     """Extract all key-value attributes from an XES element's children."""
@@ -28,21 +78,19 @@ def parse_attributes(elem):
     return attrs
 
 
-def parse_xes(filepath):
+def iter_xes_rows(source, on_trace_end=None):
     """
-    Stream-parse a large XES file.
+    Stream-parse an XES source (path or binary file object).
     Yields one dict per event, with trace-level attributes merged in.
+    on_trace_end(trace_count, event_count) is called after every trace.
     """
-    print(f"[INFO] Parsing {filepath} (this will take a few minutes)...")
-    start = time.time()
-
     trace_attrs = {}
     in_trace = False
     in_event = False
     trace_count = 0
     event_count = 0
 
-    context = ET.iterparse(filepath, events=('start', 'end'))
+    context = ET.iterparse(source, events=('start', 'end'))
 
     for evt, elem in context:
         tag = elem.tag.replace(NS, '')
@@ -56,9 +104,8 @@ def parse_xes(filepath):
         elif evt == 'end' and tag == 'trace':
             in_trace = False
             trace_count += 1
-            if trace_count % 5000 == 0:
-                elapsed = time.time() - start
-                print(f"   Processed {trace_count} traces, {event_count} events ({elapsed:.0f}s)")
+            if on_trace_end:
+                on_trace_end(trace_count, event_count)
             # Free memory
             elem.clear()
 
@@ -84,25 +131,179 @@ def parse_xes(filepath):
                 value = elem.get('value', '')
                 trace_attrs[key] = value
 
+
+def to_columns(rows):
+    """
+    Columnar batch of event dicts: {key: [value per row]}, keys in order of
+    first occurrence and NaN where a row lacks the key (as pd.DataFrame(rows)).
+    """
+    columns = {}
+    n = 0
+    for row in rows:
+        for key, value in row.items():
+            columns.setdefault(key, [float('nan')] * n).append(value)
+        n += 1
+        for values in columns.values():
+            if len(values) < n:
+                values.append(float('nan'))
+    return columns
+
+
+def iter_xes_batches(rows, batch_size=BATCH_SIZE):
+    """Group event dicts (iter_xes_rows()) into columnar batches of at most batch_size rows."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield to_columns(batch)
+            batch = []
+    if batch:
+        yield to_columns(batch)
+
+
+def parse_xes(filepath):
+    """
+    Stream-parse a large XES file.
+    Yields one dict per event, with trace-level attributes merged in.
+    """
+    print(f"[INFO] Parsing {filepath} (this will take a few minutes)...")
+    start = time.time()
+    counts = [0, 0]
+
+    def report(trace_count, event_count):
+        counts[:] = [trace_count, event_count]
+        if trace_count % 5000 == 0:
+            elapsed = time.time() - start
+            print(f"   Processed {trace_count} traces, {event_count} events ({elapsed:.0f}s)")
+
+    yield from iter_xes_rows(filepath, on_trace_end=report)
+
+    elapsed = time.time() - start
+    print(f"[OK] Done. {counts[0]} traces, {counts[1]} events in {elapsed:.1f}s")
+
+
+def _find_trace_start(buf, pos, end):
+    """Offset of the next '<trace' start tag at or after pos (-1 if none before end)."""
+    while True:
+        pos = buf.find(TRACE_OPEN, pos, end)
+        if pos == -1:
+            return -1
+        # Reject longer tag names that merely start with 'trace'
+        if buf[pos + len(TRACE_OPEN):pos + len(TRACE_OPEN) + 1] in (b'>', b' ', b'\t', b'\r', b'\n', b'/'):
+            return pos
+        pos += len(TRACE_OPEN)
+
+
+def find_trace_shards(filepath, n_shards):
+    """
+    Split an XES file into at most n_shards byte ranges that each hold whole traces.
+    Returns (header_bytes, [(start, end), ...]); the header is everything before the
+    first trace (XML declaration, <log> tag, extensions, globals).
+    """
+    with open(filepath, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return b'', []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            end = buf.rfind(LOG_CLOSE)
+            if end == -1:
+                end = size
+            first = _find_trace_start(buf, 0, end)
+            if first == -1:
+                return buf[:end], []
+
+            bounds = [first]
+            for i in range(1, n_shards):
+                pos = _find_trace_start(buf, max(bounds[-1] + 1, size * i // n_shards), end)
+                if pos == -1:
+                    break
+                bounds.append(pos)
+            bounds.append(end)
+            header = buf[:first]
+
+    return header, list(zip(bounds[:-1], bounds[1:]))
+
+
+def _parse_shard(args):
+    """
+    Worker: parse one trace-aligned byte range.
+    Returns (columnar batches, trace_count, event_count).
+    """
+    filepath, header, start, end, batch_size = args
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        body = f.read(end - start)
+
+    counts = [0, 0]
+
+    def count(trace_count, event_count):
+        counts[:] = [trace_count, event_count]
+
+    # Re-wrap the shard in the original header so namespaces and encoding still apply
+    source = io.BytesIO(header + body + LOG_CLOSE)
+    del body
+    batches = list(iter_xes_batches(iter_xes_rows(source, on_trace_end=count), batch_size))
+    return batches, counts[0], counts[1]
+
+
+def parse_xes_parallel(filepath, workers=None, batch_size=BATCH_SIZE):
+    """
+    Parse a large XES file in a process pool, sharded at <trace> boundaries.
+    Yields columnar batches of the same rows, in the same order, as
+    parse_xes(); a batch never spans two shards.
+    """
+    workers = workers or os.cpu_count() or 1
+    print(f"[INFO] Parsing {filepath} with {workers} workers...")
+    start = time.time()
+
+    n_shards = max(workers * SHARDS_PER_WORKER, -(-os.path.getsize(filepath) // SHARD_BYTES))
+    header, shards = find_trace_shards(filepath, n_shards)
+    print(f"   Split into {len(shards)} trace-aligned shards")
+
+    trace_count = 0
+    event_count = 0
+    tasks = deque((filepath, header, s, e, batch_size) for s, e in shards)
+    pending = deque()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Keep a bounded window of shards in flight and consume them in
+        # submission order, so rows stay in file order and memory stays flat
+        while tasks or pending:
+            while tasks and len(pending) < workers * 2:
+                pending.append(pool.submit(_parse_shard, tasks.popleft()))
+            batches, n_traces, n_events = pending.popleft().result()
+            if (trace_count + n_traces) // 5000 > trace_count // 5000:
+                elapsed = time.time() - start
+                print(f"   Processed {trace_count + n_traces} traces, "
+                      f"{event_count + n_events} events ({elapsed:.0f}s)")
+            trace_count += n_traces
+            event_count += n_events
+            yield from batches
+
     elapsed = time.time() - start
     print(f"[OK] Done. {trace_count} traces, {event_count} events in {elapsed:.1f}s")
 
 
-def main():
-    rows = []
-    for row in parse_xes(XES_FILE):
-        rows.append(row)
+def scan_attribute_keys(filepath):
+    """
+    Every attribute key in the XES file (globals, trace and event
+    attributes), in order of first occurrence. A regex pass over the
+    memory-mapped bytes, much cheaper than parsing the XML.
+    """
+    keys = {}
+    with open(filepath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            for match in ATTRIBUTE_KEY.finditer(buf):
+                keys.setdefault(match.group(1), None)
+    return [unescape(key.decode('utf-8'), {'&quot;': '"', '&apos;': "'"}) for key in keys]
 
-    df = pd.DataFrame(rows)
 
+def normalize_events(df):
+    """Standardize column names and normalise Case_ID, Timestamp and Value_EUR."""
     # Standardize key columns
-    rename_map = {
-        'concept:name': 'Activity',
-        'time:timestamp': 'Timestamp',
-        'org:resource': 'Resource',
-        'Cumulative net worth (EUR)': 'Value_EUR',
-    }
-    df = df.rename(columns={k: v for k, v in rename_map.items() if k in df.columns})
+    df = df.rename(columns={k: v for k, v in RENAME_MAP.items() if k in df.columns})
 
     # The trace-level 'concept:name' is actually the Case ID (PO item ID)
     # But it gets overwritten by event-level 'concept:name' (Activity).
@@ -128,10 +329,120 @@ def main():
         df['Value_EUR'] = pd.to_numeric(df['Value_EUR'], errors='coerce')
 
     # Select and order columns
-    priority_cols = ['Case_ID', 'Activity', 'Timestamp', 'Resource', 'Value_EUR']
-    other_cols = [c for c in df.columns if c not in priority_cols]
-    final_cols = [c for c in priority_cols if c in df.columns] + other_cols
-    df = df[final_cols]
+    other_cols = [c for c in df.columns if c not in PRIORITY_COLS]
+    final_cols = [c for c in PRIORITY_COLS if c in df.columns] + other_cols
+    return df[final_cols]
+
+
+def _stream_schema(df, keys):
+    """
+    Fixed Parquet schema: the columns normalize_events() makes of all
+    attribute keys, plus any other column of the first (normalized) batch.
+    """
+    columns = list(normalize_events(pd.DataFrame(columns=list(keys))).columns) if keys else []
+    columns += [col for col in df.columns if col not in columns]
+
+    fields = []
+    for col in columns:
+        if col == 'Timestamp':
+            fields.append(pa.field(col, pa.timestamp('ns', tz='UTC')))
+        elif col == 'Value_EUR':
+            fields.append(pa.field(col, pa.float64()))
+        else:
+            # XES attribute values are parsed as text
+            fields.append(pa.field(col, pa.string()))
+    return pa.schema(fields)
+
+
+def write_event_log_stream(batches, output_file=PARQUET_FILE, batch_size=BATCH_SIZE, keys=()):
+    """
+    Write columnar event batches to Parquet in fixed-size row groups, as
+    they arrive. At most one row group of events is held in memory.
+    keys: every attribute key of the log (scan_attribute_keys()), so the
+    schema fixed by the first row group has a column for all of them.
+    """
+    if pq is None:
+        raise ImportError("pyarrow is required for --stream (pip install pyarrow)")
+
+    writer = None
+    schema = None
+    dropped = set()
+    total = 0
+    n_cases = 0
+    last_case = None
+    ts_min = ts_max = None
+
+    def flush(df):
+        nonlocal writer, schema, total, n_cases, last_case, ts_min, ts_max
+        df = normalize_events(df)
+        if writer is None:
+            schema = _stream_schema(df, keys)
+            writer = pq.ParquetWriter(output_file, schema)
+
+        # Only keys missed by the pre-scan can be absent from the schema
+        new_cols = set(df.columns) - set(schema.names) - dropped
+        if new_cols:
+            print(f"   [WARN] Dropping columns not in the schema: {sorted(new_cols)}")
+            dropped.update(new_cols)
+
+        df = df.reindex(columns=schema.names)
+        writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+
+        # Events arrive trace by trace, so cases are runs of equal Case_IDs
+        total += len(df)
+        case_ids = df['Case_ID'].dropna()
+        if len(case_ids):
+            starts = case_ids.ne(case_ids.shift()).to_numpy(copy=True)
+            starts[0] = case_ids.iloc[0] != last_case
+            n_cases += int(starts.sum())
+            last_case = case_ids.iloc[-1]
+        lo, hi = df['Timestamp'].min(), df['Timestamp'].max()
+        if pd.notna(lo):
+            ts_min = lo if ts_min is None else min(ts_min, lo)
+            ts_max = hi if ts_max is None else max(ts_max, hi)
+
+    # Re-cut the incoming batches (which end at shard boundaries) into row groups
+    pending = []
+    n_pending = 0
+    for batch in batches:
+        pending.append(pd.DataFrame(batch))
+        n_pending += len(pending[-1])
+        if n_pending < batch_size:
+            continue
+        df = pd.concat(pending, ignore_index=True, sort=False)
+        while len(df) >= batch_size:
+            flush(df.iloc[:batch_size].reset_index(drop=True))
+            df = df.iloc[batch_size:]
+        pending, n_pending = [df], len(df)
+    if n_pending:
+        flush(pd.concat(pending, ignore_index=True, sort=False))
+    if writer is None:
+        print(f"[WARN] No events parsed; '{output_file}' not written")
+        return
+    writer.close()
+
+    print(f"\n[SUCCESS] Saved {total} events to '{output_file}'")
+    print(f"   Unique cases: {n_cases}")
+    print(f"   Date range: {ts_min} to {ts_max}")
+    print(f"   Columns: {schema.names}")
+
+
+def main(workers=1, stream=False, batch_size=BATCH_SIZE):
+    if workers > 1:
+        batches = parse_xes_parallel(XES_FILE, workers, batch_size)
+    else:
+        batches = iter_xes_batches(parse_xes(XES_FILE), batch_size)
+
+    if stream:
+        write_event_log_stream(batches, PARQUET_FILE, batch_size,
+                               keys=scan_attribute_keys(XES_FILE))
+        event_store.build_event_store(PARQUET_FILE)
+        return
+
+    frames = [pd.DataFrame(batch) for batch in batches]
+    df = normalize_events(pd.concat(frames, ignore_index=True, sort=False) if frames
+                          else pd.DataFrame())
+    del frames
 
     df.to_csv(OUTPUT_FILE, index=False, quoting=csv.QUOTE_NONNUMERIC)
     print(f"\n[SUCCESS] Saved {len(df)} events to '{OUTPUT_FILE}'")
@@ -139,6 +450,19 @@ def main():
     print(f"   Date range: {df['Timestamp'].min()} to {df['Timestamp'].max()}")
     print(f"   Columns: {list(df.columns)}")
 
+    # One-time conversion into the memory-mapped store every stage loads from
+    del df
+    event_store.build_event_store(OUTPUT_FILE)
+
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Parser processes (1 = serial, 0 = all cores)')
+    parser.add_argument('--stream', action='store_true',
+                        help=f'Write {PARQUET_FILE} in row groups instead of one in-memory CSV')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                        help='Rows per columnar batch (and Parquet row group in --stream mode)')
+    args = parser.parse_args()
+    main(workers=args.workers if args.workers > 0 else (os.cpu_count() or 1),
+         stream=args.stream, batch_size=args.batch_size)
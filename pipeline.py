@@ -0,0 +1,250 @@
+"""
+Pipeline Runner — content-hash artifact cache for the end-to-end chain
+parse_sap_xes → process_mining → graph_builder → train_gnn → train_gnn_agent.
+
+Every stage declares its data inputs, the code it runs and its outputs. After
+a stage succeeds, the SHA-256 of each input, code file and output is recorded
+together with the stage's command-line parameters. On the next run a stage is
+skipped when all of these are unchanged; otherwise the first reason found is
+printed (e.g. "code changed: graph_builder.py"). A stage whose outputs come
+out byte-identical after a rebuild does not invalidate the stages after it.
+
+The parsed event log is sap_event_log.csv, or sap_event_log.parquet when
+parse_sap_xes runs with --stream; the stages list it as EVENT_LOG, which is
+resolved from the parse_sap_xes parameters.
+
+Output: pipeline_manifest.json   (per-stage hashes, parameters, timings)
+
+Usage:
+  python pipeline.py                                 # run what is out of date
+  python pipeline.py --dry-run                       # only show what would run and why
+  python pipeline.py --force graph_builder           # rebuild one stage (and what changes after it)
+  python pipeline.py --args process_mining="--streaming --workers 0"
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shlex
+import subprocess
+import sys
+import time
+
+
+MANIFEST_FILE = 'pipeline_manifest.json'
+
+# Bytes read per hashing step
+HASH_BLOCK = 1 << 20
+
+# Placeholder for the event log written by parse_sap_xes (see event_log_path())
+EVENT_LOG = '<event log>'
+
+STAGES = [
+    {
+        "name": "parse_sap_xes",
+        "inputs": ["BPI_Challenge_2019.xes"],
+        "code": ["parse_sap_xes.py", "event_store.py"],
+        "outputs": [EVENT_LOG],
+    },
+    {
+        "name": "process_mining",
+        "inputs": [EVENT_LOG],
+        "code": ["process_mining.py", "native_mining.py", "event_store.py", "case_index.py",
+                 "mining_aggregates.py", "mining_artifacts.py", "quantile_sketch.py",
+                 "process_timeseries.py", "time_cube.py", "case_attributes.py", "attribute_cube.py",
+                 "handover.py", "resource_workload.py", "activity_wip.py",
+                 "variant_trie.py", "rework.py"],
+        "outputs": ["bottleneck_report.json", "dfg_data.json", "process_stats.json",
+                    "rework_report.json", "process_timeseries.npz", "process_cube.npz", "attribute_cube.npz",
+                    "handover_matrix.npz", "resource_workload.npz",
+                    "activity_wip.npz", "process_variants.npz"],
+    },
+    {
+        "name": "graph_builder",
+        "inputs": ["bottleneck_report.json", "dfg_data.json", "process_stats.json",
+                   EVENT_LOG, "handover_matrix.npz", "rework_report.json"],
+        "code": ["graph_builder.py", "event_store.py", "handover.py", "rework.py",
+                 "resource_workload.py"],
+        "outputs": ["process_graph.pt"],
+    },
+    {
+        "name": "train_gnn",
+        "inputs": ["bottleneck_report.json", "dfg_data.json", "process_stats.json",
+                   EVENT_LOG, "handover_matrix.npz", "rework_report.json"],
+        "code": ["train_gnn.py", "gnn_model.py", "graph_builder.py", "event_store.py",
+                 "handover.py", "rework.py", "resource_workload.py"],
+        "outputs": ["gnn_process_model.pt", "node_embeddings.pt", "gnn_comparison.json"],
+    },
+    {
+        "name": "train_gnn_agent",
+        "inputs": ["training_data.csv", "node_embeddings.pt", "bottleneck_report.json",
+                   "process_stats.json"],
+        "code": ["train_gnn_agent.py", "gnn_env.py"],
+        "outputs": ["ppo_gnn_best.zip", "agent_comparison.json"],
+    },
+]
+
+
+def event_log_path(stage_args):
+    """The event log parse_sap_xes writes with its parameters: Parquet with --stream, else CSV."""
+    if '--stream' in stage_args.get('parse_sap_xes', []):
+        return 'sap_event_log.parquet'
+    return 'sap_event_log.csv'
+
+
+def resolve_stage(stage, event_log):
+    """The stage with EVENT_LOG replaced by the event log path in its inputs and outputs."""
+    return {**stage, **{kind: [event_log if p == EVENT_LOG else p for p in stage[kind]]
+                        for kind in ("inputs", "outputs")}}
+
+
+def load_manifest(path=MANIFEST_FILE):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"stages": {}, "hash_cache": {}}
+
+
+def save_manifest(manifest, path=MANIFEST_FILE):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+def file_hash(path, hash_cache):
+    """
+    SHA-256 of a file, or None if it does not exist. Digests are cached by
+    (size, mtime), so unchanged multi-GB inputs are not re-read on every run.
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    cached = hash_cache.get(path)
+    if cached and cached["size"] == st.st_size and cached["mtime_ns"] == st.st_mtime_ns:
+        return cached["sha256"]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b''):
+            digest.update(block)
+    hash_cache[path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest.hexdigest()}
+    return digest.hexdigest()
+
+
+def stage_key(stage, params, hash_cache):
+    """Hashes of everything a stage's outputs depend on."""
+    return {
+        "inputs": {p: file_hash(p, hash_cache) for p in stage["inputs"]},
+        "code": {p: file_hash(p, hash_cache) for p in stage["code"]},
+        "params": params,
+    }
+
+
+def rebuild_reason(stage, key, record, hash_cache):
+    """Why a stage has to run, or None if its recorded outputs are still valid."""
+    if record is None:
+        return "never built"
+    for kind in ("inputs", "code"):
+        for path, digest in key[kind].items():
+            if record[kind].get(path) != digest:
+                return f"{kind[:-1] if kind == 'inputs' else kind} changed: {path}"
+    if record["params"] != key["params"]:
+        return f"parameters changed: {record['params']!r} -> {key['params']!r}"
+    for path in stage["outputs"]:
+        digest = file_hash(path, hash_cache)
+        if digest is None:
+            return f"output missing: {path}"
+        if digest != record["outputs"].get(path):
+            return f"output modified outside the pipeline: {path}"
+    return None
+
+
+def run_pipeline(stage_args=None, force=(), dry_run=False, manifest_path=MANIFEST_FILE):
+    """Run the out-of-date stages in order. Returns {stage: 'skipped' | 'built' | reason}."""
+    stage_args = stage_args or {}
+    manifest = load_manifest(manifest_path)
+    hash_cache = manifest.setdefault("hash_cache", {})
+    event_log = event_log_path(stage_args)
+    results = {}
+
+    print("=" * 55)
+    print("  Pipeline: parse → mine → graph → GNN → agent")
+    print("=" * 55 + "\n")
+
+    for i, stage in enumerate(STAGES, 1):
+        stage = resolve_stage(stage, event_log)
+        name = stage["name"]
+        params = stage_args.get(name, [])
+        key = stage_key(stage, params, hash_cache)
+        record = manifest["stages"].get(name)
+        reason = "forced" if name in force else rebuild_reason(stage, key, record, hash_cache)
+
+        if reason is None:
+            print(f"[{i}/{len(STAGES)}] {name}: up to date, skipped")
+            results[name] = "skipped"
+            continue
+
+        missing = [p for p, digest in key["inputs"].items() if digest is None]
+        if missing and all(os.path.exists(p) for p in stage["outputs"]):
+            # e.g. the raw XES is not on this machine but the CSV was mounted
+            print(f"[{i}/{len(STAGES)}] {name}: inputs missing ({', '.join(missing)}), "
+                  f"keeping existing outputs")
+            results[name] = "skipped"
+            continue
+
+        print(f"[{i}/{len(STAGES)}] {name}: rebuilding ({reason})")
+        if dry_run:
+            results[name] = reason
+            continue
+        if missing:
+            print(f"   [ERROR] Missing inputs: {', '.join(missing)}")
+            results[name] = f"failed: missing {', '.join(missing)}"
+            break
+
+        start = time.time()
+        proc = subprocess.run([sys.executable, f"{name}.py", *params])
+        elapsed = time.time() - start
+        if proc.returncode != 0:
+            print(f"   [ERROR] {name} exited with code {proc.returncode}")
+            results[name] = f"failed: exit code {proc.returncode}"
+            break
+
+        manifest["stages"][name] = {
+            **key,
+            "outputs": {p: file_hash(p, hash_cache) for p in stage["outputs"]},
+            "built_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "seconds": round(elapsed, 1),
+        }
+        save_manifest(manifest, manifest_path)
+        print(f"   [OK] {name} done in {elapsed:.1f}s")
+        results[name] = "built"
+
+    save_manifest(manifest, manifest_path)
+    return results
+
+
+if __name__ == '__main__':
+    stage_names = [s["name"] for s in STAGES]
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Only report which stages would run and why')
+    parser.add_argument('--force', nargs='+', default=[], choices=stage_names,
+                        help='Rebuild these stages even if they are up to date')
+    parser.add_argument('--args', action='append', default=[], metavar='STAGE="ARGS"',
+                        help='Command-line parameters for a stage (part of its cache key)')
+    args = parser.parse_args()
+
+    stage_args = {}
+    for item in args.args:
+        name, _, value = item.partition('=')
+        if name not in stage_names:
+            parser.error(f"unknown stage '{name}' in --args")
+        stage_args[name] = shlex.split(value)
+
+    results = run_pipeline(stage_args, force=set(args.force), dry_run=args.dry_run)
+    if any(r.startswith('failed') for r in results.values()):
+        sys.exit(1)
@@ -6,14 +6,38 @@ from the SAP procurement event log.
 Outputs:
   - bottleneck_report.json   (activity-level bottleneck analysis)
   - dfg_data.json            (directly-follows graph with frequencies & durations)
+  - rework_report.json       (repeated activities, self-loops, loop lengths, time lost)
   - process_stats.json       (overall process statistics & resource utilization)
+  - process_timeseries.npz   (weekly/monthly DFG counts, durations and bottleneck scores)
+  - process_cube.npz         (per-day running totals for date-range DFG/bottleneck queries)
+  - attribute_cube.npz       (bottleneck metrics by Spend area / Company / Item Type)
+  - handover_matrix.npz      (sparse resource -> resource handover-of-work counts)
+  - resource_workload.npz    (sparse resource x day workload, busy/idle/peak concurrency)
+  - activity_wip.npz         (peak/average WIP per activity, overall and per series window)
+  - process_variants.npz     (variant table with duration stats + activity prefix trie)
+  - process_mining_profile.json  (per-stage wall/CPU time, peak RSS, rows; with --profile
+                                  or PROCESS_MINING_PROFILE=1)
+
+Usage:
+  python process_mining.py               # in memory (pandas)
+  python process_mining.py --streaming   # out of core, chunked over the event store
+  python process_mining.py --shards 8    # map-reduce over case-hash shards in a process pool
+  python process_mining.py --incremental # fold only events newer than the saved watermark
+  python process_mining.py --window week # weekly instead of monthly trend windows
 """
 
 import pandas as pd
 import numpy as np
+import argparse
 import json
+import os
+import shutil
+import tempfile
 import time
 import warnings
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 warnings.filterwarnings('ignore')
 
 # PM4Py imports
@@ -21,26 +45,147 @@ import pm4py
 from pm4py.objects.conversion.log import converter as log_converter
 from pm4py.algo.discovery.dfg import algorithm as dfg_discovery
 from pm4py.algo.discovery.inductive import algorithm as inductive_miner
+from pm4py.algo.discovery.inductive.dtypes.im_ds import IMDataStructureUVCL
+from pm4py.algo.discovery.inductive.variants.im import IMUVCL
 from pm4py.algo.conformance.tokenreplay import algorithm as token_replay
+from pm4py.objects.log.obj import EventLog, Trace, Event
+from pm4py.objects.process_tree.utils import generic as pt_util
+from pm4py.objects.process_tree.utils.generic import tree_sort
 from pm4py.statistics.start_activities.log import get as start_act_get
 from pm4py.statistics.end_activities.log import get as end_act_get
 
+from activity_wip import save_wip
+from attribute_cube import save_attribute_cube
+from case_attributes import load_case_attributes
+from case_index import CaseIndex, load_case_index
+from event_store import NAT, open_event_store, to_epoch_ns
+from handover import save_handover
+from mining_aggregates import (CHUNK_ROWS, STATE_DIR, MiningAggregates, case_shards,
+                               iter_case_chunks, iter_shard_chunks, load_mining_state,
+                               save_mining_state)
+from mining_artifacts import (ARTIFACT_STATE_DIR, ChunkArtifacts, load_artifact_state,
+                              save_artifact_state)
+from native_mining import activity_arrays, dfg_arrays, dfg_report, rank_bottlenecks
+from process_timeseries import WINDOWS, save_series
+from quantile_sketch import quantile_accuracy
+from rework import save_rework
+from resource_workload import save_workload
+from time_cube import save_cube
+from variant_trie import VariantTrie, save_variants
+
 
 SAP_CSV = 'sap_event_log.csv'
 
+# Replay tasks per worker: more, smaller chunks keep the pool busy at the tail
+CHUNKS_PER_WORKER = 8
+
+# Adaptive sampled conformance: first batch of cases (doubles each round),
+# default CI half-width and the z-score of the 95% confidence level
+SAMPLE_BATCH = 200
+SAMPLE_TOLERANCE = 0.005
+Z_95 = 1.96
+
+# Stage instrumentation output and the environment switch that enables it
+PROFILE_FILE = 'process_mining_profile.json'
+PROFILE_ENV = 'PROCESS_MINING_PROFILE'
+
+# Petri net + markings of the current replay, set once per worker process
+_replay_model = None
+
+
+def _peak_rss_mb(reset=False):
+    """
+    Peak resident set size of this process in MB. On Linux the high-water
+    mark can be reset, which turns it into a per-stage peak; elsewhere it is
+    the peak since process start.
+    """
+    try:
+        if reset:
+            with open('/proc/self/clear_refs', 'w') as f:
+                f.write('5')
+            return None
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if reset:
+        return None
+    import resource
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+class StageProfiler:
+    """Wall time, CPU time (incl. worker processes), peak RSS and row counts per stage."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        """Profile a block; the block may set record['rows']. No-op when disabled."""
+        record = {"stage": name}
+        if not self.enabled:
+            yield record
+            return
+        _peak_rss_mb(reset=True)
+        wall = time.perf_counter()
+        cpu = os.times()
+        yield record
+        end = os.times()
+        record["wall_seconds"] = round(time.perf_counter() - wall, 3)
+        record["cpu_seconds"] = round(
+            (end.user + end.system + end.children_user + end.children_system)
+            - (cpu.user + cpu.system + cpu.children_user + cpu.children_system), 3)
+        record["peak_rss_mb"] = _peak_rss_mb()
+        record.setdefault("rows", None)
+        self.stages.append(record)
+
+    def save(self, path=PROFILE_FILE, **meta):
+        if not self.enabled:
+            return
+        profile = {
+            **meta,
+            "total_wall_seconds": round(sum(s["wall_seconds"] for s in self.stages), 3),
+            "total_cpu_seconds": round(sum(s["cpu_seconds"] for s in self.stages), 3),
+            "peak_rss_mb": max((s["peak_rss_mb"] or 0 for s in self.stages), default=0),
+            "stages": self.stages,
+        }
+        with open(path, 'w') as f:
+            json.dump(profile, f, indent=2)
+        print(f"[OK] Saved '{path}'")
+
+
+def to_pm4py_log(df):
+    """Convert the case-sorted DataFrame to a PM4Py EventLog (only PM4Py algorithms need it)."""
+    return log_converter.apply(df, variant=log_converter.Variants.TO_EVENT_LOG)
 
-def load_event_log(csv_path=SAP_CSV, sample_size=None):
-    """Load SAP CSV and convert to PM4Py event log."""
+
+def load_event_log(csv_path=SAP_CSV, sample_size=None, build_log=True):
+    """
+    Load SAP CSV and convert to PM4Py event log.
+    With build_log=False the EventLog conversion is skipped and log is None.
+    """
     print(f"[1/6] Loading {csv_path}...")
     start = time.time()
 
-    df = pd.read_csv(csv_path)
+    # String columns arrive dictionary-encoded (categorical codes + shared vocab),
+    # rows already in (case, timestamp) order; only events without a timestamp
+    # or case go (as in the streaming chunks)
+    store = open_event_store(csv_path)
+    df = store.to_frame()
+    valid = (np.asarray(store.array('Timestamp')) != NAT) & (np.asarray(store.array('Case_ID')) >= 0)
+    if not valid.all():
+        df = df[valid]
 
     if sample_size and len(df) > sample_size:
         # Sample by complete cases (not random rows)
-        cases = df['Case_ID'].unique()
+        case_codes = df['Case_ID'].cat.codes
+        cases = case_codes.unique()
         sampled_cases = np.random.choice(cases, size=min(sample_size, len(cases)), replace=False)
-        df = df[df['Case_ID'].isin(sampled_cases)]
+        df = df[case_codes.isin(sampled_cases)]
         print(f"   Sampled {len(sampled_cases)} cases ({len(df)} events)")
 
     # Rename for PM4Py standard naming
@@ -51,162 +196,321 @@ def load_event_log(csv_path=SAP_CSV, sample_size=None):
         'Resource': 'org:resource',
     })
 
-    df['time:timestamp'] = pd.to_datetime(df['time:timestamp'], errors='coerce', utc=True)
-    df = df.dropna(subset=['time:timestamp'])
-    df = df.sort_values(['case:concept:name', 'time:timestamp'])
-
     # Convert to PM4Py event log
-    log = log_converter.apply(df, variant=log_converter.Variants.TO_EVENT_LOG)
+    log = to_pm4py_log(df) if build_log else None
 
     elapsed = time.time() - start
     print(f"   Loaded {len(df)} events, {df['case:concept:name'].nunique()} cases ({elapsed:.1f}s)")
     return log, df
 
 
-def discover_dfg(log, df):
-    """Discover Directly-Follows Graph with frequencies and performance."""
+def _case_rows(df, cases):
+    """Row mask of the events whose case is selected in a case-code mask (None: all rows)."""
+    if cases is None:
+        return None
+    codes = df['case:concept:name'].cat.codes.to_numpy()
+    return (codes >= 0) & np.asarray(cases, dtype=bool)[np.maximum(codes, 0)]
+
+
+def discover_dfg_native(df, cases=None):
+    """
+    Frequency DFG, mean performance DFG and start/end activities in a single
+    shifted-array pass over the case-sorted DataFrame, without a PM4Py EventLog.
+    Keys come out in the same first-occurrence order PM4Py produces.
+    Also returns {edge: (p50, p90, p99) seconds}.
+    cases: optional boolean mask over case codes (CaseAttributeIndex.select()).
+    """
+    act = df['concept:name'].cat.codes.to_numpy()
+    case_codes = df['case:concept:name'].cat.codes.to_numpy()
+    ts = to_epoch_ns(df['time:timestamp'])
+    rows = _case_rows(df, cases)
+    if rows is not None:
+        act, case_codes, ts = act[rows], case_codes[rows], ts[rows]
+    return dfg_arrays(df['concept:name'].cat.categories, act, case_codes, ts)
+
+
+def mine_frame_artifacts(df, window='month', csv_path=SAP_CSV):
+    """
+    WIP, rework, workload, handover, series and cube accumulators folded from
+    the case-sorted DataFrame's code arrays in one pass (its categories are
+    the event store's vocabularies).
+    """
+    store = open_event_store(csv_path)
+    artifacts = ChunkArtifacts.for_store(store, load_case_attributes(csv_path), window)
+    return artifacts.update(df['case:concept:name'].cat.codes.to_numpy(),
+                            df['concept:name'].cat.codes.to_numpy(),
+                            to_epoch_ns(df['time:timestamp']),
+                            df['org:resource'].cat.codes.to_numpy())
+
+
+def discover_dfg(log, df, engine='native', cases=None):
+    """
+    Discover Directly-Follows Graph with frequencies and performance.
+    engine='native' runs on the DataFrame; engine='pm4py' uses the EventLog.
+    cases: optional boolean mask over case codes to mine a subset of cases.
+    """
     print("[2/6] Discovering Directly-Follows Graph...")
 
-    # Frequency DFG
-    dfg_freq = dfg_discovery.apply(log, variant=dfg_discovery.Variants.FREQUENCY)
-
-    # Performance DFG (durations between activities)
-    dfg_perf = dfg_discovery.apply(log, variant=dfg_discovery.Variants.PERFORMANCE)
+    if engine == 'pm4py':
+        if cases is not None:
+            # PM4Py needs its own EventLog of the subset
+            log = to_pm4py_log(df[_case_rows(df, cases)])
+        elif log is None:
+            log = to_pm4py_log(df)
 
-    # Start and end activities
-    start_activities = start_act_get.get_start_activities(log)
-    end_activities = end_act_get.get_end_activities(log)
-
-    # Build serialisable DFG data
-    dfg_data = {
-        "edges": [],
-        "start_activities": dict(start_activities),
-        "end_activities": dict(end_activities),
-    }
+        # Frequency DFG
+        dfg_freq = dfg_discovery.apply(log, variant=dfg_discovery.Variants.FREQUENCY)
 
-    for (src, tgt), freq in dfg_freq.items():
-        duration = dfg_perf.get((src, tgt), 0)
-        if isinstance(duration, (int, float)):
-            duration_hours = round(duration / 3600, 2)
-        else:
-            duration_hours = 0
-        dfg_data["edges"].append({
-            "source": src,
-            "target": tgt,
-            "frequency": int(freq),
-            "avg_duration_hours": duration_hours
-        })
+        # Performance DFG (durations between activities)
+        dfg_perf = dfg_discovery.apply(log, variant=dfg_discovery.Variants.PERFORMANCE)
 
-    # Sort by frequency descending
-    dfg_data["edges"].sort(key=lambda x: x["frequency"], reverse=True)
+        # Start and end activities
+        start_activities = start_act_get.get_start_activities(log)
+        end_activities = end_act_get.get_end_activities(log)
 
-    print(f"   Found {len(dfg_data['edges'])} edges in DFG")
-    print(f"   Top 5 transitions:")
-    for edge in dfg_data["edges"][:5]:
-        print(f"      {edge['source']} -> {edge['target']}: "
-              f"{edge['frequency']}x, avg {edge['avg_duration_hours']}h")
+        # PM4Py has no per-edge percentiles; take them from the native pass so
+        # dfg_data.json has the same edge fields with either engine
+        quantiles = discover_dfg_native(df, cases)[4]
+    else:
+        dfg_freq, dfg_perf, start_activities, end_activities, quantiles = discover_dfg_native(df, cases)
 
-    return dfg_data, dfg_freq
+    return dfg_report(dfg_freq, dfg_perf, start_activities, end_activities, quantiles), dfg_freq
 
 
-def detect_bottlenecks(log, df):
-    """Identify activities with the longest processing/wait times."""
+def detect_bottlenecks(log, df, cases=None):
+    """
+    Identify activities with the longest processing/wait times.
+    cases: optional boolean mask over case codes to mine a subset of cases.
+    """
     print("[3/6] Detecting bottlenecks...")
 
-    # Calculate activity durations manually from event timestamps
-    df_sorted = df.sort_values(['case:concept:name', 'time:timestamp'])
-    df_sorted['next_timestamp'] = df_sorted.groupby('case:concept:name')['time:timestamp'].shift(-1)
-    df_sorted['duration_seconds'] = (
-        df_sorted['next_timestamp'] - df_sorted['time:timestamp']
-    ).dt.total_seconds()
-
-    # Per-activity stats
-    activity_stats = df_sorted.groupby('concept:name').agg(
-        frequency=('concept:name', 'count'),
-        avg_duration_hours=('duration_seconds', lambda x: round(x.mean() / 3600, 2)),
-        median_duration_hours=('duration_seconds', lambda x: round(x.median() / 3600, 2)),
-        max_duration_hours=('duration_seconds', lambda x: round(x.max() / 3600, 2) if pd.notna(x.max()) else 0),
-        total_duration_hours=('duration_seconds', lambda x: round(x.sum() / 3600, 2)),
-    ).reset_index()
-    activity_stats = activity_stats.rename(columns={'concept:name': 'activity'})
-
-    # Add value info
-    if 'Value_EUR' in df.columns:
-        value_stats = df.groupby('concept:name')['Value_EUR'].agg(['mean', 'sum']).reset_index()
-        value_stats.columns = ['activity', 'avg_value_eur', 'total_value_eur']
-        value_stats['avg_value_eur'] = value_stats['avg_value_eur'].round(2)
-        value_stats['total_value_eur'] = value_stats['total_value_eur'].round(2)
-        activity_stats = activity_stats.merge(value_stats, on='activity', how='left')
-
-    # Bottleneck score: weighted combination of duration and frequency
-    max_dur = activity_stats['avg_duration_hours'].max()
-    max_freq = activity_stats['frequency'].max()
-
-    if max_dur > 0 and max_freq > 0:
-        activity_stats['bottleneck_score'] = (
-            0.6 * (activity_stats['avg_duration_hours'] / max_dur) +
-            0.4 * (activity_stats['frequency'] / max_freq)
-        ).round(3)
+    # Activity durations from event timestamps: rows are case-sorted, so the
+    # case index turns the shift into an array slice; a case filter selects
+    # array rows instead of copying the DataFrame
+    rows = _case_rows(df, cases)
+    if rows is None:
+        rows = slice(None)
+    ts = to_epoch_ns(df['time:timestamp'])[rows]
+    if len(ts) == 0:
+        print("   No events selected")
+        return []
+    value = df['Value_EUR'].to_numpy()[rows] if 'Value_EUR' in df.columns else None
+    activity_stats = activity_arrays(df['concept:name'].cat.categories,
+                                     df['concept:name'].cat.codes.to_numpy()[rows],
+                                     df['case:concept:name'].cat.codes.to_numpy()[rows], ts, value)
+    return rank_bottlenecks(activity_stats)
+
+
+def trace_variants(df, return_cases=False):
+    """
+    Activity-sequence variants of the case-sorted DataFrame, as a Counter
+    {(activity, ...): n_cases} in order of first occurrence (PM4Py's UVCL).
+    With return_cases=True also returns the variant number of every
+    non-empty case (position in the Counter).
+    """
+    names = df['concept:name'].cat.categories
+    index = CaseIndex.from_sorted_codes(df['case:concept:name'].cat.codes.to_numpy())
+    act = df['concept:name'].cat.codes.to_numpy()[index.event_rows()]
+    bounds = index.offsets[np.concatenate([index.nonempty_cases(), [index.n_cases]])]
+    # Events without an activity (code -1) are left out of the sequences
+    known = act >= 0
+    kept = np.concatenate([[0], np.cumsum(known)])[bounds - bounds[0]]
+    case_keys = [seq.tobytes() for seq in np.split(act[known], kept[1:-1])]
+    by_code = Counter(case_keys)
+    variants = Counter({
+        tuple(names[np.frombuffer(seq, dtype=act.dtype)]): n for seq, n in by_code.items()
+    })
+    if not return_cases:
+        return variants
+    number = {key: i for i, key in enumerate(by_code)}
+    return variants, np.fromiter((number[k] for k in case_keys), dtype=np.int64, count=len(case_keys))
+
+
+def discover_variants(df=None, agg=None):
+    """
+    Variant table and prefix trie of the case-sorted DataFrame, or of the
+    streaming aggregates when given.
+    """
+    if agg is not None:
+        activities = agg.activities
+        variants, case_variants = agg.variants(return_cases=True)
+        seen = agg.case_events > 0
+        case_ns = agg.case_last_ts[seen] - agg.case_first_ts[seen]
     else:
-        activity_stats['bottleneck_score'] = 0
-
-    activity_stats = activity_stats.sort_values('bottleneck_score', ascending=False)
-
-    # Build report
-    bottlenecks = activity_stats.to_dict(orient='records')
-
-    # Clean NaN values for JSON
-    for b in bottlenecks:
-        for k, v in b.items():
-            if isinstance(v, float) and (np.isnan(v) or np.isinf(v)):
-                b[k] = 0
-
-    print(f"   Top 5 bottlenecks:")
-    for b in bottlenecks[:5]:
-        score = b['bottleneck_score']
-        dur = b['avg_duration_hours']
-        freq = b['frequency']
-        print(f"      [{score:.3f}] {b['activity']}: "
-              f"avg {dur}h, {freq} occurrences")
-
-    return bottlenecks
-
-
-def check_conformance(log, df):
-    """Discover a process model and check conformance via token replay."""
+        activities = df['concept:name'].cat.categories
+        variants, case_variants = trace_variants(df, return_cases=True)
+        index = CaseIndex.from_sorted_codes(df['case:concept:name'].cat.codes.to_numpy())
+        ts = to_epoch_ns(df['time:timestamp'])
+        case_ns = index.last(ts) - index.first(ts)
+    return VariantTrie.from_variants(activities, variants, case_variants, case_ns / 1e9 / 3600)
+
+
+def discover_tree_from_variants(variants):
+    """Inductive Miner on a variant Counter (same steps as inductive_miner.apply)."""
+    process_tree = IMUVCL({}).apply(IMDataStructureUVCL(variants), {})
+    process_tree = pt_util.fold(process_tree)
+    tree_sort(process_tree)
+    return process_tree
+
+
+def variants_to_log(variants):
+    """One PM4Py trace per variant, carrying only the activity names."""
+    return EventLog([Trace([Event({'concept:name': a}) for a in seq]) for seq in variants])
+
+
+def _init_replay_worker(net, initial_marking, final_marking):
+    """Pool initializer: receive the model once instead of with every task."""
+    global _replay_model
+    _replay_model = (net, initial_marking, final_marking)
+
+
+def _replay_chunk(sequences):
+    """Worker: trace fitness of each activity sequence against the shared model."""
+    net, initial_marking, final_marking = _replay_model
+    replayed = token_replay.apply(variants_to_log(sequences), net, initial_marking, final_marking)
+    return [t['trace_fitness'] for t in replayed]
+
+
+def replay_fitness(sequences, net, initial_marking, final_marking, workers=1):
+    """
+    Token-replay fitness per activity sequence, in input order.
+    With workers > 1 the sequences are dealt round-robin into chunks (so long
+    and short variants mix) and replayed in a process pool.
+    """
+    sequences = list(sequences)
+    if workers <= 1 or len(sequences) < 2:
+        _init_replay_worker(net, initial_marking, final_marking)
+        return _replay_chunk(sequences)
+
+    n_chunks = min(len(sequences), workers * CHUNKS_PER_WORKER)
+    chunks = [sequences[i::n_chunks] for i in range(n_chunks)]
+    fit_values = [None] * len(sequences)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_replay_worker,
+                             initargs=(net, initial_marking, final_marking)) as pool:
+        for i, chunk_fitness in enumerate(pool.map(_replay_chunk, chunks)):
+            fit_values[i::n_chunks] = chunk_fitness
+    return fit_values
+
+
+def sampled_fitness(variants, case_variants, net, initial_marking, final_marking,
+                    tolerance=SAMPLE_TOLERANCE, workers=1, seed=None):
+    """
+    Replay random cases in growing batches until the 95% confidence interval
+    of mean fitness is at most +/- tolerance (or every case has been drawn).
+    Each variant is replayed at most once. Returns (per-case fitness of the
+    sample, CI half-width).
+    """
+    sequences = list(variants)
+    n_cases = len(case_variants)
+    order = np.random.default_rng(seed).permutation(n_cases)
+    variant_fitness = np.full(len(sequences), np.nan)
+
+    n = 0
+    batch = SAMPLE_BATCH
+    while True:
+        drawn = case_variants[order[n:n + batch]]
+        n += len(drawn)
+        new = np.unique(drawn[np.isnan(variant_fitness[drawn])])
+        if len(new):
+            variant_fitness[new] = replay_fitness(
+                [sequences[i] for i in new], net, initial_marking, final_marking, workers
+            )
+
+        sample = variant_fitness[case_variants[order[:n]]]
+        # Standard error with finite population correction (0 once all cases are drawn)
+        fpc = np.sqrt((n_cases - n) / (n_cases - 1)) if n_cases > 1 else 0.0
+        half_width = Z_95 * sample.std(ddof=1) / np.sqrt(n) * fpc if n > 1 else np.inf
+        print(f"   Sampled {n}/{n_cases} cases: fitness {sample.mean():.4f} +/- {half_width:.4f}")
+        if half_width <= tolerance or n >= n_cases:
+            return sample, float(min(half_width, 1.0))
+        batch *= 2
+
+
+def check_conformance(log, df, mode='variants', workers=1, tolerance=SAMPLE_TOLERANCE,
+                      variants=None):
+    """
+    Discover a process model and check conformance via token replay.
+    mode='variants' replays each distinct activity sequence once and weights
+    by its case count (token replay only depends on the sequence);
+    mode='traces' replays the full PM4Py EventLog;
+    mode='sampled' estimates fitness from random cases with a 95% confidence
+    interval no wider than +/- tolerance.
+    workers > 1 shards the replay over a process pool with identical results.
+    variants: precomputed trace_variants(df, return_cases=True) (streaming mode).
+    """
     print("[4/6] Checking conformance...")
 
     try:
-        # Discover process model using Inductive Miner
-        # PM4Py 2.7+ returns a ProcessTree, so we convert to Petri net
-        process_tree = inductive_miner.apply(log)
-        net, initial_marking, final_marking = pm4py.convert_to_petri_net(process_tree)
+        if mode == 'traces':
+            if log is None:
+                log = to_pm4py_log(df)
+
+            # Discover process model using Inductive Miner
+            # PM4Py 2.7+ returns a ProcessTree, so we convert to Petri net
+            process_tree = inductive_miner.apply(log)
+            net, initial_marking, final_marking = pm4py.convert_to_petri_net(process_tree)
+
+            # Token-based replay for conformance
+            if workers > 1:
+                sequences = [tuple(e['concept:name'] for e in trace) for trace in log]
+                fit_values = replay_fitness(sequences, net, initial_marking, final_marking, workers)
+            else:
+                replayed = token_replay.apply(
+                    log, net, initial_marking, final_marking
+                )
+                fit_values = [t['trace_fitness'] for t in replayed if 'trace_fitness' in t]
+            weights = np.ones(len(fit_values), dtype=np.int64)
+        elif mode == 'sampled':
+            variants, case_variants = variants or trace_variants(df, return_cases=True)
+            process_tree = discover_tree_from_variants(variants)
+            net, initial_marking, final_marking = pm4py.convert_to_petri_net(process_tree)
+
+            fit_values, error_bound = sampled_fitness(
+                variants, case_variants, net, initial_marking, final_marking, tolerance, workers
+            )
+            weights = np.ones(len(fit_values), dtype=np.int64)
+        else:
+            variants = variants[0] if variants else trace_variants(df)
+            process_tree = discover_tree_from_variants(variants)
+            net, initial_marking, final_marking = pm4py.convert_to_petri_net(process_tree)
 
-        # Token-based replay for conformance
-        replayed = token_replay.apply(
-            log, net, initial_marking, final_marking
-        )
+            fit_values = replay_fitness(variants, net, initial_marking, final_marking, workers)
+            print(f"   Replayed {len(variants)} variants for {sum(variants.values())} traces")
+            weights = np.fromiter(variants.values(), dtype=np.int64, count=len(variants))
 
         # Calculate fitness
-        fit_values = [t['trace_fitness'] for t in replayed if 'trace_fitness' in t]
-        fitness = round(np.mean(fit_values), 4) if fit_values else 0
+        fit_values = np.asarray(fit_values, dtype=float)
+        total_traces = int(weights.sum())
+        fitness = round(float(np.average(fit_values, weights=weights)), 4) if total_traces else 0
 
         # Detailed conformance
-        fully_fitting = sum(1 for v in fit_values if v >= 0.999)
-        partially_fitting = sum(1 for v in fit_values if 0.5 <= v < 0.999)
-        non_fitting = sum(1 for v in fit_values if v < 0.5)
+        fully_fitting = int(weights[fit_values >= 0.999].sum())
+        partially_fitting = int(weights[(fit_values >= 0.5) & (fit_values < 0.999)].sum())
+        non_fitting = int(weights[fit_values < 0.5].sum())
 
         conformance = {
             "fitness": fitness,
             "fully_fitting_traces": fully_fitting,
             "partially_fitting_traces": partially_fitting,
             "non_fitting_traces": non_fitting,
-            "total_traces": len(fit_values),
+            "total_traces": total_traces,
             "fitness_percentage": round(fitness * 100, 2)
         }
-
-        print(f"   Conformance fitness: {fitness:.4f} ({fitness*100:.1f}%)")
-        print(f"   Fully fitting: {fully_fitting}/{len(fit_values)} traces")
+        if mode == 'sampled':
+            # Trace counts above describe the sample; fitness is the estimate
+            conformance.update({
+                "sampled": True,
+                "sample_size": total_traces,
+                "population_traces": len(case_variants),
+                "confidence": 0.95,
+                "error_bound": round(error_bound, 4),
+                "error_bound_percentage": round(error_bound * 100, 2),
+            })
+            print(f"   Conformance fitness: ~{fitness*100:.1f}% +/- {error_bound*100:.1f}% "
+                  f"({total_traces} sampled traces)")
+        else:
+            print(f"   Conformance fitness: {fitness:.4f} ({fitness*100:.1f}%)")
+        print(f"   Fully fitting: {fully_fitting}/{total_traces} traces")
 
     except Exception as e:
         print(f"   [WARN] Conformance check failed: {e}")
@@ -219,20 +523,38 @@ def check_conformance(log, df):
     return conformance
 
 
-def analyze_resources(df):
-    """Analyze resource utilization and performance."""
+def analyze_resources(df, workload=None):
+    """
+    Analyze resource utilization and performance.
+    workload: optional ResourceWorkload.resource_frame() (busy/idle time columns).
+    """
     print("[5/6] Analyzing resource utilization...")
 
-    resource_stats = df.groupby('org:resource').agg(
+    resource_stats = df.groupby('org:resource', observed=True).agg(
         events_handled=('org:resource', 'count'),
         unique_activities=('concept:name', 'nunique'),
         unique_cases=('case:concept:name', 'nunique'),
     ).reset_index()
     resource_stats = resource_stats.rename(columns={'org:resource': 'resource'})
 
+    # Add value handled
+    if 'Value_EUR' in df.columns:
+        val = df.groupby('org:resource', observed=True)['Value_EUR'].sum().reset_index()
+        val.columns = ['resource', 'total_value_handled']
+        val['total_value_handled'] = val['total_value_handled'].round(2)
+        resource_stats = resource_stats.merge(val, on='resource', how='left')
+
+    return rank_resources(resource_stats, df['concept:name'].nunique(), workload)
+
+
+def rank_resources(resource_stats, n_activities, workload=None):
+    """
+    Derive utilization/diversity, rank and serialise per-resource statistics.
+    workload: optional per-resource busy/idle/peak-concurrency frame to add.
+    """
     # Activity diversity (how many different activities each resource does)
     resource_stats['activity_diversity'] = (
-        resource_stats['unique_activities'] / df['concept:name'].nunique()
+        resource_stats['unique_activities'] / n_activities
     ).round(3)
 
     # Utilization proxy: events relative to the busiest resource
@@ -241,12 +563,13 @@ def analyze_resources(df):
         resource_stats['events_handled'] / max_events
     ).round(3)
 
-    # Add value handled
-    if 'Value_EUR' in df.columns:
-        val = df.groupby('org:resource')['Value_EUR'].sum().reset_index()
-        val.columns = ['resource', 'total_value_handled']
-        val['total_value_handled'] = val['total_value_handled'].round(2)
-        resource_stats = resource_stats.merge(val, on='resource', how='left')
+    # Time-based workload: busy/idle hours, peak concurrency, busy ratio
+    if workload is not None:
+        resource_stats = resource_stats.merge(workload, on='resource', how='left')
+
+    # Value handled stays the last column
+    if 'total_value_handled' in resource_stats.columns:
+        resource_stats['total_value_handled'] = resource_stats.pop('total_value_handled')
 
     resource_stats = resource_stats.sort_values('events_handled', ascending=False)
 
@@ -268,19 +591,32 @@ def analyze_resources(df):
     return resources
 
 
-def build_process_stats(df, bottlenecks, conformance, resources, dfg_data):
-    """Compile overall process statistics."""
-    print("[6/6] Compiling process statistics...")
-
-    total_cases = df['case:concept:name'].nunique()
-    total_events = len(df)
-    total_activities = df['concept:name'].nunique()
-    total_resources = df['org:resource'].nunique()
-
+def summarize_log(df):
+    """Log-level numbers for build_process_stats(): totals, date range, case durations."""
     # Case duration stats
-    case_times = df.groupby('case:concept:name')['time:timestamp'].agg(['min', 'max'])
+    case_times = df.groupby('case:concept:name', observed=True)['time:timestamp'].agg(['min', 'max'])
     case_times['duration_hours'] = (case_times['max'] - case_times['min']).dt.total_seconds() / 3600
-    case_durations = case_times['duration_hours'].dropna()
+
+    return {
+        'total_cases': df['case:concept:name'].nunique(),
+        'total_events': len(df),
+        'total_activities': df['concept:name'].nunique(),
+        'total_resources': df['org:resource'].nunique(),
+        'start': df['time:timestamp'].min(),
+        'end': df['time:timestamp'].max(),
+        'case_duration_hours': case_times['duration_hours'],
+    }
+
+
+def build_process_stats(summary, bottlenecks, conformance, resources, dfg_data):
+    """Compile overall process statistics from summarize_log() (or MiningAggregates.summary())."""
+    print("[6/6] Compiling process statistics...")
+
+    total_cases = summary['total_cases']
+    total_events = summary['total_events']
+    total_activities = summary['total_activities']
+    total_resources = summary['total_resources']
+    case_durations = summary['case_duration_hours'].dropna()
 
     # Top bottleneck
     top_bottleneck = bottlenecks[0] if bottlenecks else {}
@@ -293,8 +629,13 @@ def build_process_stats(df, bottlenecks, conformance, resources, dfg_data):
     top_bn_score = top_bottleneck.get('bottleneck_score', 1)
     bottleneck_points = (1 - top_bn_score) * 30  # 0-30 points
 
-    # Resource balance (lower std dev of utilization is better)
-    utils = [r['utilization'] for r in resources if r['resource'] != 'NONE']
+    # Resource balance (lower std dev of utilization is better); busy ratio
+    # (time with open work items / active span) when the workload was mined
+    if resources and 'busy_ratio' in resources[0]:
+        utils = [r['busy_ratio'] for r in resources
+                 if r['resource'] != 'NONE' and r['active_span_hours'] > 0]
+    else:
+        utils = [r['utilization'] for r in resources if r['resource'] != 'NONE']
     if utils:
         util_std = np.std(utils)
         resource_points = max(0, (1 - util_std * 2)) * 30  # 0-30 points
@@ -311,8 +652,8 @@ def build_process_stats(df, bottlenecks, conformance, resources, dfg_data):
             "total_activities": int(total_activities),
             "total_resources": int(total_resources),
             "date_range": {
-                "start": str(df['time:timestamp'].min()),
-                "end": str(df['time:timestamp'].max())
+                "start": str(summary['start']),
+                "end": str(summary['end'])
             }
         },
         "case_duration": {
@@ -358,45 +699,332 @@ def build_process_stats(df, bottlenecks, conformance, resources, dfg_data):
     return stats
 
 
-def main():
+def mine_streaming(csv_path=SAP_CSV, chunk_rows=CHUNK_ROWS, window='month'):
+    """
+    Out-of-core pass: fold the case-sorted event store into MiningAggregates
+    and the chunk artifacts (WIP, rework, workload, handovers, series, cubes)
+    chunk by chunk (whole cases per chunk), reading the store once and never
+    building the full DataFrame. Returns (agg, artifacts).
+    """
+    print(f"[1/6] Streaming {csv_path} in chunks of ~{chunk_rows} events...")
+    start = time.time()
+
+    store = open_event_store(csv_path)
+    agg = MiningAggregates.for_store(store)
+    artifacts = ChunkArtifacts.for_store(store, load_case_attributes(csv_path), window)
+    for i, chunk in enumerate(iter_case_chunks(store, load_case_index(csv_path), chunk_rows)):
+        agg.update(**chunk)
+        artifacts.update(**chunk)
+        if (i + 1) % 10 == 0:
+            print(f"   Folded {agg.n_events} events ({time.time() - start:.0f}s)")
+
+    elapsed = time.time() - start
+    print(f"   Aggregated {agg.n_events} events, {int((agg.case_events > 0).sum())} cases ({elapsed:.1f}s)")
+    return agg, artifacts
+
+
+def _mine_shard(args):
+    """Worker (map): aggregates and chunk artifacts of the cases that hash to one shard."""
+    csv_path, shard, n_shards, chunk_rows, window, spill_dir = args
+    store = open_event_store(csv_path)
+    cases = np.flatnonzero(case_shards(store.vocab['Case_ID'], n_shards) == shard)
+    agg = MiningAggregates.for_store(store)
+    artifacts = ChunkArtifacts.for_store(store, load_case_attributes(csv_path), window, spill_dir)
+    for chunk in iter_shard_chunks(store, load_case_index(csv_path), cases, chunk_rows):
+        agg.update(**chunk)
+        artifacts.update(**chunk)
+    return agg, artifacts
+
+
+def mine_sharded(csv_path=SAP_CSV, n_shards=2, workers=None, chunk_rows=CHUNK_ROWS,
+                 window='month'):
+    """
+    Map-reduce mining: partition cases by hash into n_shards, aggregate each
+    shard in a process pool, then merge the partial states (reduce).
+    Returns (agg, artifacts).
+    """
+    workers = workers or min(n_shards, os.cpu_count() or 1)
+    print(f"[1/6] Mining {csv_path} as {n_shards} case-hash shards on {workers} workers...")
+    start = time.time()
+
+    # Build the store, case index and attribute index once, before the workers memory-map them
+    load_case_index(csv_path)
+    store = open_event_store(csv_path)
+    artifacts = ChunkArtifacts.for_store(store, load_case_attributes(csv_path), window)
+
+    # Workers spill their interval runs here; merging moves them into the artifacts
+    spill_root = tempfile.mkdtemp(prefix='shards_')
+    agg = None
+    tasks = [(csv_path, shard, n_shards, chunk_rows, window,
+              os.path.join(spill_root, f'shard{shard}')) for shard in range(n_shards)]
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for shard, (partial, partial_artifacts) in enumerate(pool.map(_mine_shard, tasks)):
+                print(f"   Shard {shard}: {partial.n_events} events, "
+                      f"{int((partial.case_events > 0).sum())} cases")
+                agg = partial if agg is None else agg.merge(partial)
+                artifacts.merge(partial_artifacts)
+    finally:
+        shutil.rmtree(spill_root, ignore_errors=True)
+
+    elapsed = time.time() - start
+    print(f"   Merged {agg.n_events} events, {int((agg.case_events > 0).sum())} cases ({elapsed:.1f}s)")
+    return agg, artifacts
+
+
+def mine_incremental(csv_path=SAP_CSV, state_dir=STATE_DIR, chunk_rows=CHUNK_ROWS,
+                     window='month', artifact_dir=ARTIFACT_STATE_DIR):
+    """
+    Re-mine from persisted aggregates and chunk artifacts: fold in only
+    events newer than the saved watermark. Cases that gain events are re-read
+    whole, with their old events as context, so their previously-last event
+    gets its duration and new directly-follows edge. Falls back to a full
+    streaming pass when there is no state or the log changed in other ways
+    (late or removed events). Returns (agg, artifacts).
+    """
+    store = open_event_store(csv_path)
+    index = load_case_index(csv_path)
+    attributes = load_case_attributes(csv_path)
+    offsets = np.asarray(index.offsets)
+    ts = np.asarray(store.array('Timestamp')[offsets[0]:offsets[-1]])
+    valid = ts != NAT
+
+    state = load_mining_state(state_dir)
+    agg = artifacts = None
+    if state is None:
+        print(f"[INFO] No mining state in {state_dir}/, running a full pass")
+    else:
+        old, watermark = state
+        try:
+            agg = old.remap(store.vocab['Activity'], store.vocab['Resource'], store.vocab['Case_ID'])
+        except ValueError as e:
+            print(f"[WARN] {e}; running a full pass")
+        new_rows = np.flatnonzero(ts > watermark) + offsets[0]
+        if agg is not None and agg.n_events + len(new_rows) != int(valid.sum()):
+            print("[WARN] Events at or before the watermark changed; running a full pass")
+            agg = None
+        if agg is not None:
+            artifacts = load_artifact_state(store, attributes, window, watermark, artifact_dir)
+            if artifacts is None:
+                print(f"[INFO] No {window} artifact state in {artifact_dir}/ at this watermark, "
+                      f"running a full pass")
+                agg = None
+
+    if agg is None:
+        agg, artifacts = mine_streaming(csv_path, chunk_rows, window)
+    else:
+        start = time.time()
+        touched = np.unique(np.asarray(store.array('Case_ID')[new_rows]))
+        touched = touched[touched >= 0]
+        extended = int((agg.case_events[touched] > 0).sum())
+        print(f"[1/6] Incremental re-mining: {len(new_rows)} new events in {len(touched)} cases "
+              f"({extended} open cases extended)")
+        for chunk in iter_shard_chunks(store, index, touched, chunk_rows):
+            new = chunk['ts'] > watermark
+            agg.update(**chunk, new=new)
+            artifacts.update(**chunk, new=new)
+        print(f"   Aggregated {agg.n_events} events ({time.time() - start:.1f}s)")
+
+    watermark = int(ts[valid].max()) if valid.any() else NAT
+    save_mining_state(agg, watermark, state_dir)
+    save_artifact_state(artifacts, watermark, artifact_dir)
+    print(f"[OK] Mining state saved to {state_dir}/ and {artifact_dir}/ "
+          f"(watermark {pd.Timestamp(watermark, tz='UTC')})")
+    return agg, artifacts
+
+
+def main(conformance=True, dfg_engine='native', conformance_mode='variants', workers=1,
+         tolerance=SAMPLE_TOLERANCE, streaming=False, chunk_rows=CHUNK_ROWS, shards=1,
+         incremental=False, profile=None, window='month'):
     print("="*55)
     print("  Phase 1: Object-Oriented Process Mining")
     print("="*55 + "\n")
 
-    # Load full dataset (12,868 cases, ~1.5M events)
-    log, df = load_event_log(SAP_CSV, sample_size=None)
-
-    # Discover DFG
-    dfg_data, dfg_freq = discover_dfg(log, df)
-
-    # Detect bottlenecks
-    bottlenecks = detect_bottlenecks(log, df)
+    if profile is None:
+        profile = os.environ.get(PROFILE_ENV, '') not in ('', '0')
+    profiler = StageProfiler(profile)
+
+    streaming = streaming or shards > 1 or incremental
+    if streaming:
+        # Bounded state only: artifacts come from the running aggregates
+        with profiler.stage('load') as p:
+            if incremental:
+                agg, artifacts = mine_incremental(SAP_CSV, STATE_DIR, chunk_rows, window)
+            elif shards > 1:
+                agg, artifacts = mine_sharded(SAP_CSV, shards, workers if workers > 1 else None,
+                                              chunk_rows, window)
+            else:
+                agg, artifacts = mine_streaming(SAP_CSV, chunk_rows, window)
+            p['rows'] = int(agg.n_events)
+        with profiler.stage('dfg') as p:
+            print("[2/6] Discovering Directly-Follows Graph...")
+            dfg_data = dfg_report(*agg.dfg(), agg.edge_quantiles())
+            p['rows'] = len(dfg_data['edges'])
+        with profiler.stage('bottlenecks') as p:
+            print("[3/6] Detecting bottlenecks...")
+            bottlenecks = rank_bottlenecks(agg.activity_frame())
+            p['rows'] = len(bottlenecks)
+        log = df = None
+        variants = agg.variants(return_cases=True)
+        if conformance_mode == 'traces':
+            print("   [WARN] Trace replay needs the full log; using variant replay")
+            conformance_mode = 'variants'
+    else:
+        # Load full dataset (12,868 cases, ~1.5M events)
+        # The PM4Py EventLog is only built when a PM4Py algorithm needs it
+        with profiler.stage('load') as p:
+            log, df = load_event_log(SAP_CSV, sample_size=None,
+                                     build_log=(conformance and conformance_mode == 'traces')
+                                     or dfg_engine == 'pm4py')
+            artifacts = mine_frame_artifacts(df, window)
+            p['rows'] = len(df)
+
+        # Discover DFG
+        with profiler.stage('dfg') as p:
+            dfg_data, dfg_freq = discover_dfg(log, df, engine=dfg_engine)
+            p['rows'] = len(dfg_data['edges'])
+
+        # Detect bottlenecks
+        with profiler.stage('bottlenecks') as p:
+            bottlenecks = detect_bottlenecks(log, df)
+            p['rows'] = len(bottlenecks)
+        variants = None
+
+    # Work-in-progress per activity (sweep line), added to the bottleneck report
+    with profiler.stage('wip') as p:
+        wip = artifacts.wip
+        bottlenecks = wip.annotate(bottlenecks)
+        p['rows'] = len(bottlenecks)
+        if bottlenecks:
+            top_wip = max(bottlenecks, key=lambda b: b['peak_wip'])
+            print(f"   Peak WIP: {top_wip['activity']} ({top_wip['peak_wip']} cases open, "
+                  f"avg {top_wip['avg_wip']})")
+
+    # Rework: repeated activities and self-loops within cases
+    with profiler.stage('rework') as p:
+        rework = artifacts.rework
+        p['rows'] = int(rework.repeats.sum())
+        print(f"   {int(rework.repeats.sum())} repeated events "
+              f"({int(rework.self_loops.sum())} self-loops) in "
+              f"{int((rework.case_repeats > 0).sum())} cases")
 
     # Conformance checking
-    conformance = check_conformance(log, df)
+    with profiler.stage('conformance') as p:
+        if conformance:
+            conformance = check_conformance(log, df, mode=conformance_mode, workers=workers,
+                                            tolerance=tolerance, variants=variants)
+        else:
+            print("[4/6] Conformance check skipped")
+            conformance = {"fitness": 0, "skipped": True, "total_traces": 0}
+        p['rows'] = conformance.get('total_traces', 0)
+
+    # Variant table and prefix trie
+    with profiler.stage('variants') as p:
+        variant_trie = discover_variants(df, agg if streaming else None)
+        p['rows'] = variant_trie.n_variants
+        happy = variant_trie.top_paths(1)
+        if happy:
+            print(f"   {variant_trie.n_variants} variants; happy path covers "
+                  f"{happy[0]['share']:.1%} of cases ({len(happy[0]['activities'])} steps)")
 
     # Resource analysis
-    resources = analyze_resources(df)
+    with profiler.stage('resources') as p:
+        workload = artifacts.workload
+        if streaming:
+            print("[5/6] Analyzing resource utilization...")
+            resources = rank_resources(agg.resource_frame(), agg.n_activities(),
+                                       workload.resource_frame())
+            summary = agg.summary()
+        else:
+            resources = analyze_resources(df, workload.resource_frame())
+            summary = summarize_log(df)
+        handovers = artifacts.handovers
+        print(f"   {len(handovers.count)} resource handover pairs, "
+              f"{int(handovers.count.sum())} handovers")
+        p['rows'] = len(resources)
 
     # Overall stats
-    stats = build_process_stats(df, bottlenecks, conformance, resources, dfg_data)
+    with profiler.stage('stats') as p:
+        stats = build_process_stats(summary, bottlenecks, conformance, resources, dfg_data)
+        p['rows'] = int(summary['total_cases'])
+
+    # Trends and date-range cube: the same statistics per week/month and per day
+    with profiler.stage('series') as p:
+        series, cube = artifacts.series, artifacts.cube
+        p['rows'] = series.n_windows if series else 0
+
+    # Breakdowns by Spend area / Company / Item Type
+    with profiler.stage('attribute_cube') as p:
+        attribute_cube = artifacts.attribute_cube
+        p['rows'] = int(attribute_cube.cases.sum())
 
     # Save outputs
     with open('bottleneck_report.json', 'w') as f:
-        json.dump({"bottlenecks": bottlenecks, "resources": resources}, f, indent=2)
+        json.dump({"bottlenecks": bottlenecks, "resources": resources,
+                   "duration_quantiles": quantile_accuracy()}, f, indent=2)
     print("\n[OK] Saved 'bottleneck_report.json'")
 
     with open('dfg_data.json', 'w') as f:
         json.dump(dfg_data, f, indent=2)
     print("[OK] Saved 'dfg_data.json'")
 
+    save_rework(rework)
+
     with open('process_stats.json', 'w') as f:
         json.dump(stats, f, indent=2)
     print("[OK] Saved 'process_stats.json'")
 
+    if series is not None:
+        save_series(series)
+        save_cube(cube)
+        save_wip(wip, series.bounds)
+    save_attribute_cube(attribute_cube)
+    save_handover(handovers)
+    save_variants(variant_trie)
+    save_workload(workload)
+
+    profiler.save(PROFILE_FILE,
+                  mode='incremental' if incremental else 'sharded' if shards > 1
+                  else 'streaming' if streaming else 'in-memory',
+                  events=int(summary['total_events']),
+                  created_at=time.strftime('%Y-%m-%dT%H:%M:%S'))
+
     print(f"\n[SUCCESS] Phase 1 complete. All outputs saved.")
     return stats
 
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--no-conformance', action='store_true',
+                        help='Skip token replay (and the PM4Py EventLog conversion)')
+    parser.add_argument('--dfg-engine', choices=['native', 'pm4py'], default='native',
+                        help='DFG discovery engine')
+    parser.add_argument('--conformance-mode', choices=['variants', 'traces', 'sampled'],
+                        default='variants',
+                        help='Token replay once per variant (weighted), once per trace, '
+                             'or on random cases until the confidence interval is narrow enough')
+    parser.add_argument('--tolerance', type=float, default=SAMPLE_TOLERANCE,
+                        help='Sampled mode: target 95%% CI half-width of fitness (0.005 = 0.5%%)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Processes for conformance replay and --shards (0 = all cores)')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Out-of-core mode: aggregate the case-sorted store chunk by chunk')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS,
+                        help='Streaming mode: events per chunk (rounded up to whole cases)')
+    parser.add_argument('--shards', type=int, default=1,
+                        help='Map-reduce mining over N case-hash shards (uses --workers processes, '
+                             'default one per shard up to the core count)')
+    parser.add_argument('--incremental', action='store_true',
+                        help=f'Fold only events newer than the watermark saved in {STATE_DIR}/')
+    parser.add_argument('--profile', action='store_true', default=None,
+                        help=f'Write per-stage timings/memory to {PROFILE_FILE} '
+                             f'(or set {PROFILE_ENV}=1)')
+    parser.add_argument('--window', choices=list(WINDOWS), default='month',
+                        help='Window length of the DFG/bottleneck trends in process_timeseries.npz')
+    args = parser.parse_args()
+    main(conformance=not args.no_conformance, dfg_engine=args.dfg_engine,
+         conformance_mode=args.conformance_mode,
+         workers=args.workers if args.workers > 0 else (os.cpu_count() or 1),
+         tolerance=args.tolerance, streaming=args.streaming, chunk_rows=args.chunk_rows,
+         shards=args.shards, incremental=args.incremental, profile=args.profile,
+         window=args.window)
@@ -0,0 +1,196 @@
+"""
+Mergeable Quantile Sketch for duration statistics.
+
+Keeps exact value counts while a summary has few distinct values, then
+collapses into logarithmic buckets (DDSketch-style) whose quantile estimates
+are within a relative error alpha of the true value. Count, sum, min and max
+stay exact in both modes. Sketches from chunks, shards or incremental runs
+merge by adding bucket counts, so partial results combine cheaply.
+
+The final state depends only on the values added, not on how they were
+chunked: a sketch is exact iff it holds at most max_exact distinct values,
+and a bucket count is the same whenever the collapse happened. The
+in-memory miner therefore computes its quantiles through the same sketches
+(group_quantiles), so every mining mode reports identical percentiles.
+
+Usage:
+  sketch = QuantileSketch()
+  sketch.add(durations_in_seconds)
+  sketch.merge(other_sketch)
+  p50, p90, p99 = sketch.quantiles([0.5, 0.9, 0.99])
+  group_quantiles(durations, activity_codes, n_activities)   # [activity x quantile]
+"""
+
+import math
+import numpy as np
+
+
+# Relative accuracy of the bucketed mode and the distinct-value budget of the exact mode
+ALPHA = 0.005
+MAX_EXACT = 1024
+
+# Percentiles reported for activities and edges
+REPORT_QUANTILES = (0.5, 0.9, 0.99)
+
+
+class QuantileSketch:
+    """Quantiles of non-negative values: exact up to max_exact distinct values, then relative-error buckets."""
+
+    def __init__(self, alpha=ALPHA, max_exact=MAX_EXACT):
+        self.alpha = alpha
+        self.max_exact = max_exact
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.exact = {}     # value -> count, while exact
+        self.buckets = None  # bucket index -> count, once collapsed
+        self.zeros = 0       # values <= 0 in bucketed mode
+
+    def __len__(self):
+        return self.count
+
+    def add(self, values, counts=None):
+        """Add an array of values (optionally with multiplicities)."""
+        values = np.asarray(values, dtype=float)
+        if counts is None:
+            values, counts = np.unique(values, return_counts=True)
+        if len(values) == 0:
+            return self
+        counts = np.asarray(counts, dtype=np.int64)
+        self.count += int(counts.sum())
+        self.sum += float(np.dot(values, counts))
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        if self.buckets is None:
+            for v, c in zip(values.tolist(), counts.tolist()):
+                self.exact[v] = self.exact.get(v, 0) + c
+            if len(self.exact) > self.max_exact:
+                self._collapse()
+        else:
+            self._add_buckets(values, counts)
+        return self
+
+    def _bucket(self, values):
+        return np.ceil(np.log(values) / math.log(self.gamma)).astype(np.int64)
+
+    def _add_buckets(self, values, counts):
+        positive = values > 0
+        self.zeros += int(counts[~positive].sum())
+        keys, inverse = np.unique(self._bucket(values[positive]), return_inverse=True)
+        sums = np.bincount(inverse, weights=counts[positive], minlength=len(keys))
+        for k, c in zip(keys.tolist(), sums.tolist()):
+            self.buckets[k] = self.buckets.get(k, 0) + int(c)
+
+    def _collapse(self):
+        """Switch from exact counts to log buckets."""
+        values = np.fromiter(self.exact.keys(), dtype=float, count=len(self.exact))
+        counts = np.fromiter(self.exact.values(), dtype=np.int64, count=len(self.exact))
+        self.exact = {}
+        self.buckets = {}
+        self._add_buckets(values, counts)
+
+    def merge(self, other):
+        """Fold another sketch (same alpha) into this one."""
+        if other.count == 0:
+            return self
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if other.buckets is not None and self.buckets is None:
+            self._collapse()
+        if self.buckets is None:
+            for v, c in other.exact.items():
+                self.exact[v] = self.exact.get(v, 0) + c
+            if len(self.exact) > self.max_exact:
+                self._collapse()
+        elif other.buckets is None:
+            values = np.fromiter(other.exact.keys(), dtype=float, count=len(other.exact))
+            counts = np.fromiter(other.exact.values(), dtype=np.int64, count=len(other.exact))
+            self._add_buckets(values, counts)
+        else:
+            self.zeros += other.zeros
+            for k, c in other.buckets.items():
+                self.buckets[k] = self.buckets.get(k, 0) + c
+        return self
+
+    def quantile(self, q):
+        """Value at quantile q (NaN when empty); linear interpolation like numpy while exact."""
+        if self.count == 0:
+            return np.nan
+        if self.buckets is None:
+            values = sorted(self.exact)
+            cum = np.cumsum([self.exact[v] for v in values])
+            rank = (self.count - 1) * q
+            lo = values[np.searchsorted(cum, math.floor(rank), side='right')]
+            hi = values[np.searchsorted(cum, math.ceil(rank), side='right')]
+            if q == 0.5:
+                # Same arithmetic as pandas/numpy median: mean of the middle values
+                return (lo + hi) / 2
+            return lo + (hi - lo) * (rank - math.floor(rank))
+        rank = q * (self.count - 1)
+        if rank < self.zeros:
+            return 0.0
+        keys = sorted(self.buckets)
+        cum = self.zeros + np.cumsum([self.buckets[k] for k in keys])
+        k = keys[int(np.searchsorted(cum, rank, side='right'))]
+        # Bucket midpoint in relative terms, clamped to the exact extremes
+        estimate = 2 * self.gamma ** k / (self.gamma + 1)
+        return min(max(estimate, self.min), self.max)
+
+    def quantiles(self, qs=REPORT_QUANTILES):
+        return [self.quantile(q) for q in qs]
+
+    def to_dict(self):
+        """JSON-serialisable state (see from_dict)."""
+        return {
+            "alpha": self.alpha, "max_exact": self.max_exact,
+            "count": self.count, "sum": self.sum, "min": self.min, "max": self.max,
+            "exact": [[v, c] for v, c in self.exact.items()],
+            "buckets": None if self.buckets is None else [[k, c] for k, c in self.buckets.items()],
+            "zeros": self.zeros,
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        sketch = cls(state["alpha"], state["max_exact"])
+        sketch.count = state["count"]
+        sketch.sum = state["sum"]
+        sketch.min = state["min"]
+        sketch.max = state["max"]
+        sketch.exact = {float(v): int(c) for v, c in state["exact"]}
+        if state["buckets"] is not None:
+            sketch.buckets = {int(k): int(c) for k, c in state["buckets"]}
+        sketch.zeros = state["zeros"]
+        return sketch
+
+
+def group_quantiles(values, groups, n_groups, qs=REPORT_QUANTILES):
+    """
+    [n_groups x len(qs)] quantiles of values per group code, each through a
+    QuantileSketch of the group's values (NaN values skipped, NaN rows for
+    groups without values).
+    """
+    values = np.asarray(values, dtype=float)
+    groups = np.asarray(groups)
+    keep = ~np.isnan(values)
+    values, groups = values[keep], groups[keep]
+    order = np.argsort(groups, kind='stable')
+    bounds = np.searchsorted(groups[order], np.arange(n_groups + 1))
+    out = np.full((n_groups, len(qs)), np.nan)
+    for g in np.flatnonzero(np.diff(bounds)):
+        out[g] = QuantileSketch().add(values[order[bounds[g]:bounds[g + 1]]]).quantiles(qs)
+    return out
+
+
+def quantile_accuracy(alpha=ALPHA, max_exact=MAX_EXACT):
+    """Error bound of the reported percentiles, for the JSON reports."""
+    return {
+        "exact_up_to_distinct_values": max_exact,
+        "relative_error": alpha,
+        "note": (f"Duration percentiles (median/p50, p90, p99) are exact while an activity "
+                 f"or edge has at most {max_exact} distinct durations, otherwise within "
+                 f"{alpha:.1%} of the order statistic at that rank (log-bucket midpoint, no interpolation)."),
+    }
@@ -0,0 +1,329 @@
+"""
+Resource Workload Timeline — busy time, concurrency and idle time per resource.
+
+SAP event timestamps are completion times, so the work behind an event
+happened before it: every event closes a work item of its own resource that
+opened at the previous event of the same case (the first event of a case is
+instantaneous). The time a case waits between two events is billed to the
+resource that completes the second one, not to the one that finished the
+first. From these intervals:
+
+  - workload matrix: item-seconds per (resource, time bucket), i.e. the
+    average number of open items in the bucket times its length. Intervals
+    are split at bucket boundaries with np.repeat, and only non-empty cells
+    are kept, so the matrix is sparse (resource, bucket, hours).
+  - sweep line: +1/-1 at interval starts/ends, sorted per resource
+    (O(n log n)); the running sum gives peak concurrency and the time with at
+    least one open item (busy time). Idle time is the rest of the resource's
+    active span, from its first interval start to its last event.
+
+Chunks arrive case by case, but the sweep needs every resource's items in
+time order. Each chunk's intervals are therefore spilled to disk as a
+start-sorted run (IntervalRuns); the sweep then reads the runs back in time
+blocks of ~SWEEP_BLOCK_ROWS intervals, carrying only the intervals still
+open at a block boundary into the next block. Memory is one block plus the
+open intervals, not the whole log.
+
+Output: resource_workload.npz   (sparse workload matrix + per-resource metrics)
+
+Usage:
+  workload = ResourceWorkload(resources)
+  workload.update(case, res, ts)         # case-sorted chunks of whole cases
+  frame = workload.resource_frame()      # busy/idle hours, peak concurrency, busy ratio
+  save_workload(workload)
+"""
+
+import glob
+import os
+import shutil
+import tempfile
+import weakref
+import numpy as np
+import pandas as pd
+
+
+WORKLOAD_FILE = 'resource_workload.npz'
+
+# Workload matrix bucket length
+BUCKET_NS = 24 * 3600 * 10**9
+
+
+def sweep_line(keys, start, end, mark_keys=None, mark_ts=None):
+    """
+    Concurrent open intervals per key: +1/-1 points at interval starts/ends,
+    sorted by (key, time), ends before starts at equal times so back-to-back
+    intervals do not overlap. Optional marks are 0-delta points (sorted
+    between the ends and starts of their time) that report the open count at
+    that instant. Returns (point keys, point times, open count after each point).
+    """
+    span = end > start
+    n = int(span.sum())
+    if mark_keys is None:
+        mark_keys = mark_ts = np.empty(0, dtype=np.int64)
+    point_key = np.concatenate([keys[span], keys[span], mark_keys])
+    point_ts = np.concatenate([start[span], end[span], mark_ts])
+    delta = np.concatenate([np.ones(n, dtype=np.int64), -np.ones(n, dtype=np.int64),
+                            np.zeros(len(mark_keys), dtype=np.int64)])
+    order = np.lexsort((delta, point_ts, point_key))
+    # Every key's deltas sum to 0, so one cumsum restarts at 0 per key
+    return point_key[order], point_ts[order], np.cumsum(delta[order])
+
+
+def covered_seconds(point_key, point_ts, open_count, n_keys):
+    """Seconds with at least one open interval per key, from sweep_line() output."""
+    covered = np.zeros(n_keys)
+    gap = np.flatnonzero((open_count[:-1] > 0) & (point_key[1:] == point_key[:-1]))
+    np.add.at(covered, point_key[gap], (point_ts[gap + 1] - point_ts[gap]) / 1e9)
+    return covered
+
+
+# Intervals per time block when sweeping spilled runs
+SWEEP_BLOCK_ROWS = 250_000
+
+# File name prefix of the spilled interval runs
+RUN_PREFIX = 'run_'
+
+
+class IntervalRuns:
+    """
+    (key, start, end) intervals spilled to disk as start-sorted runs, one
+    .npy file (3 x n int64) per appended chunk. Without a spill directory a
+    private temporary one is used and removed with the object; a given
+    directory is kept, and the runs already in it are picked up.
+    """
+
+    def __init__(self, spill_dir=None):
+        if spill_dir is None:
+            spill_dir = tempfile.mkdtemp(prefix='intervals_')
+            weakref.finalize(self, shutil.rmtree, spill_dir, True)
+        os.makedirs(spill_dir, exist_ok=True)
+        self.spill_dir = spill_dir
+        self.paths = sorted(glob.glob(os.path.join(spill_dir, f'{RUN_PREFIX}*.npy')))
+
+    def _new_path(self):
+        with tempfile.NamedTemporaryFile(dir=self.spill_dir, prefix=RUN_PREFIX, suffix='.npy',
+                                         delete=False) as f:
+            return f.name
+
+    def append(self, key, start, end):
+        """Spill the non-empty intervals of one chunk as a run sorted by start."""
+        span = end > start
+        order = np.argsort(start[span], kind='stable')
+        run = np.stack([key[span][order], start[span][order], end[span][order]]).astype(np.int64)
+        if run.shape[1]:
+            path = self._new_path()
+            np.save(path, run)
+            self.paths.append(path)
+        return self
+
+    def merge(self, other):
+        """Move the runs of another set of intervals (e.g. a shard's) into this one."""
+        for path in other.paths:
+            target = self._new_path()
+            shutil.move(path, target)
+            self.paths.append(target)
+        other.paths = []
+        return self
+
+    def remap_keys(self, mapping):
+        """Rewrite the keys of every run through mapping (old code -> new code)."""
+        for path in self.paths:
+            run = np.load(path)
+            run[0] = mapping[run[0]]
+            np.save(path, run)
+        return self
+
+    def clear(self):
+        for path in self.paths:
+            os.remove(path)
+        self.paths = []
+        return self
+
+    def __len__(self):
+        return sum(np.load(path, mmap_mode='r').shape[1] for path in self.paths)
+
+    def blocks(self, block_rows=SWEEP_BLOCK_ROWS):
+        """
+        Yield (lo, hi, key, start, end) per time block [lo, hi): the intervals
+        open in the block, clipped to it. Block bounds are every k-th start of
+        every run, so a block reads at most ~block_rows new intervals; the
+        intervals still open at hi are carried into the next block. The last
+        block has hi = None and is not clipped.
+        """
+        runs = [np.load(path, mmap_mode='r') for path in self.paths]
+        if not runs:
+            return
+        step = max(block_rows // len(runs), 1)
+        cuts = np.unique(np.concatenate([np.asarray(run[1, ::step]) for run in runs]))
+        pos = [0] * len(runs)
+        empty = np.empty(0, dtype=np.int64)
+        carried = (empty, empty, empty)
+        for b, lo in enumerate(cuts.tolist()):
+            hi = cuts[b + 1] if b + 1 < len(cuts) else None
+            parts = [carried]
+            for i, run in enumerate(runs):
+                stop = run.shape[1] if hi is None else int(np.searchsorted(run[1], hi))
+                parts.append(tuple(np.asarray(run[j, pos[i]:stop]) for j in range(3)))
+                pos[i] = stop
+            key, start, end = (np.concatenate([part[j] for part in parts]) for j in range(3))
+            start = np.maximum(start, lo)
+            if hi is not None:
+                still_open = end > hi
+                carried = (key[still_open], start[still_open], end[still_open])
+                end = np.minimum(end, hi)
+            yield lo, hi, key, start, end
+
+
+def _reduce_cells(res, bucket, seconds):
+    """Sum seconds per (resource, bucket) cell, sorted by resource then bucket."""
+    order = np.lexsort((bucket, res))
+    res, bucket, seconds = res[order], bucket[order], seconds[order]
+    first = np.flatnonzero(np.r_[True, (res[1:] != res[:-1]) | (bucket[1:] != bucket[:-1])]
+                           if len(res) else np.empty(0, dtype=bool))
+    return res[first], bucket[first], (np.add.reduceat(seconds, first) if len(first)
+                                       else np.empty(0))
+
+
+class ResourceWorkload:
+    """Work-item intervals per resource code (spilled runs), with sweep-line metrics."""
+
+    def __init__(self, resources, bucket_ns=BUCKET_NS, spill_dir=None):
+        self.resources = list(resources)
+        self.bucket_ns = bucket_ns
+        n_res = len(self.resources)
+        self.runs = IntervalRuns(spill_dir)
+        self.active_start = np.full(n_res, np.iinfo(np.int64).max)
+        self.active_end = np.full(n_res, np.iinfo(np.int64).min)
+        empty = np.empty(0, dtype=np.int64)
+        # Sparse workload matrix so far: (resource, bucket number, item-seconds)
+        self.cells = (empty, empty, np.empty(0))
+        self._metrics = None
+
+    def update(self, case, res, ts, new=None):
+        """
+        Fold a case-sorted chunk of whole cases (no NaT timestamps). new:
+        optional mask of events not folded in before; only their items are
+        added, the other events of those cases just open them.
+        """
+        res = np.asarray(res, dtype=np.int64)
+        ts = np.asarray(ts, dtype=np.int64)
+        case = np.asarray(case)
+        # Each event's item opens at the previous event of its case
+        start = ts.copy()
+        same_case = case[1:] == case[:-1]
+        start[1:][same_case] = ts[:-1][same_case]
+        keep = res >= 0
+        np.minimum.at(self.active_start, res[keep], start[keep])
+        np.maximum.at(self.active_end, res[keep], ts[keep])
+        if new is not None:
+            keep &= new
+        res, start, end = res[keep], start[keep], ts[keep]
+        self._fold_cells(*self._split_buckets(res, start, end))
+        self.runs.append(res, start, end)
+        self._metrics = None
+        return self
+
+    def _fold_cells(self, res, bucket, seconds):
+        self.cells = _reduce_cells(*(np.concatenate(pair) for pair in
+                                     zip(self.cells, (res, bucket, seconds))))
+
+    def merge(self, other):
+        """Fold in the items of a disjoint set of cases over the same resources."""
+        self.runs.merge(other.runs)
+        np.minimum(self.active_start, other.active_start, out=self.active_start)
+        np.maximum(self.active_end, other.active_end, out=self.active_end)
+        self._fold_cells(*other.cells)
+        self._metrics = None
+        return self
+
+    def remap(self, resources):
+        """The same workload keyed by the resource vocabulary of a rebuilt store."""
+        out = ResourceWorkload(resources, self.bucket_ns)
+        r = pd.Index(out.resources).get_indexer(self.resources)
+        if (r < 0).any():
+            raise ValueError("event store vocabularies lost names since the workload state was saved")
+        out.active_start[r] = self.active_start
+        out.active_end[r] = self.active_end
+        res, bucket, seconds = self.cells
+        out._fold_cells(r[res], bucket, seconds)
+        out.runs.merge(self.runs).remap_keys(r)
+        return out
+
+    def _split_buckets(self, res, start, end):
+        """Intervals split at bucket boundaries: (resource, bucket number, seconds) pieces."""
+        span = end > start
+        res, start, end = res[span], start[span], end[span]
+        first, last = start // self.bucket_ns, (end - 1) // self.bucket_ns
+        n_buckets = last - first + 1
+        item = np.repeat(np.arange(len(res)), n_buckets)
+        bucket = first[item] + np.arange(len(item)) - np.repeat(np.cumsum(n_buckets) - n_buckets,
+                                                                n_buckets)
+        seconds = (np.minimum(end[item], (bucket + 1) * self.bucket_ns)
+                   - np.maximum(start[item], bucket * self.bucket_ns)) / 1e9
+        return res[item], bucket, seconds
+
+    def workload_matrix(self):
+        """Sparse (resource, bucket start ns, busy item-seconds) cells, sorted by resource."""
+        res, bucket, seconds = self.cells
+        return res, bucket * self.bucket_ns, seconds
+
+    def metrics(self):
+        """Per resource code: busy/active seconds and peak concurrency (sweep line)."""
+        if self._metrics is not None:
+            return self._metrics
+        n_res = len(self.resources)
+        peak = np.zeros(n_res, dtype=np.int64)
+        busy = np.zeros(n_res)
+        for _, _, res, start, end in self.runs.blocks():
+            point_res, point_ts, open_items = sweep_line(res, start, end)
+            np.maximum.at(peak, point_res, open_items)
+            busy += covered_seconds(point_res, point_ts, open_items, n_res)
+
+        seen = self.active_end >= self.active_start
+        active = np.where(seen, (self.active_end - self.active_start) / 1e9, 0.0)
+        self._metrics = {'busy_seconds': busy, 'active_seconds': active,
+                         'peak_concurrency': peak, 'seen': seen}
+        return self._metrics
+
+    def resource_frame(self):
+        """Busy/idle hours, peak concurrency and busy ratio per resource with events."""
+        m = self.metrics()
+        active = np.flatnonzero(m['seen'])
+        busy_hours = m['busy_seconds'][active] / 3600
+        active_hours = m['active_seconds'][active] / 3600
+        with np.errstate(invalid='ignore', divide='ignore'):
+            busy_ratio = busy_hours / active_hours
+        return pd.DataFrame({
+            'resource': [self.resources[r] for r in active],
+            'busy_hours': busy_hours.round(2),
+            'idle_hours': (active_hours - busy_hours).round(2),
+            'active_span_hours': active_hours.round(2),
+            'peak_concurrency': m['peak_concurrency'][active],
+            'busy_ratio': np.round(busy_ratio, 3),
+        })
+
+
+def save_workload(workload, path=WORKLOAD_FILE):
+    res, bucket, seconds = workload.workload_matrix()
+    m = workload.metrics()
+    np.savez_compressed(
+        path,
+        resources=np.array(workload.resources, dtype=str),
+        bucket_ns=np.int64(workload.bucket_ns),
+        res=res.astype(np.int32), bucket_start=bucket,
+        busy_item_hours=(seconds / 3600).astype(np.float32),
+        busy_hours=(m['busy_seconds'] / 3600).astype(np.float32),
+        active_span_hours=(m['active_seconds'] / 3600).astype(np.float32),
+        peak_concurrency=m['peak_concurrency'].astype(np.int32),
+    )
+    print(f"[OK] Saved '{path}' ({len(seconds)} non-empty resource x bucket cells, "
+          f"{int(m['seen'].sum())} resources)")
+
+
+def load_workload(path=WORKLOAD_FILE):
+    """Arrays written by save_workload(), or None if there is no artifact."""
+    try:
+        with np.load(path) as data:
+            return {k: data[k] for k in data.files}
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,191 @@
+"""
+Rework and Self-Loop Analysis — repeated activities within a case.
+
+An event is rework when its activity already occurred earlier in the same
+case. Sorting the case-sorted arrays by (case, activity, position) puts
+every occurrence next to the previous occurrence of the same activity, so
+all rework pairs come out of one lexsort and a neighbour comparison:
+
+  - loop length: events from the previous occurrence to the repeat
+                 (1 = self-loop, A -> A)
+  - time lost:   time from the previous occurrence to the repeat, i.e. the
+                 time spent going around the loop
+
+Per activity the time lost is the sum over its repeats. Loops of different
+activities overlap (A B A B), so per case the time lost is the union of the
+case's loop intervals (sweep line), not their sum.
+
+Output: rework_report.json   (per-activity rework rows, case-level summary,
+                              cases losing the most time to rework)
+
+Usage:
+  rework = ReworkStats(activities, cases)
+  rework.update(case, act, ts)           # case-sorted chunks of whole cases
+  save_rework(rework)
+  report = load_rework()                 # dict, or None
+"""
+
+import json
+import numpy as np
+import pandas as pd
+
+from resource_workload import covered_seconds, sweep_line
+
+
+REWORK_FILE = 'rework_report.json'
+
+# Cases listed in the report, by time lost to rework
+TOP_CASES = 20
+
+# State arrays of ReworkStats, per activity and per case code
+ACTIVITY_ARRAYS = ('events', 'repeats', 'self_loops', 'reworked_cases', 'loop_len_sum',
+                   'loop_len_max', 'lost_seconds')
+CASE_ARRAYS = ('case_lost_seconds', 'case_repeats')
+
+
+class ReworkStats:
+    """Per-activity repeat counts, loop lengths and time lost, plus time lost per case code."""
+
+    def __init__(self, activities, cases):
+        self.activities = list(activities)
+        self.cases = list(cases)
+        n_act = len(self.activities)
+        self.events = np.zeros(n_act, dtype=np.int64)
+        self.repeats = np.zeros(n_act, dtype=np.int64)
+        self.self_loops = np.zeros(n_act, dtype=np.int64)
+        self.reworked_cases = np.zeros(n_act, dtype=np.int64)
+        self.loop_len_sum = np.zeros(n_act, dtype=np.int64)
+        self.loop_len_max = np.zeros(n_act, dtype=np.int64)
+        self.lost_seconds = np.zeros(n_act)
+        self.case_lost_seconds = np.zeros(len(self.cases))
+        self.case_repeats = np.zeros(len(self.cases), dtype=np.int64)
+
+    def update(self, case, act, ts, new=None):
+        """
+        Fold a case-sorted chunk of whole cases (no NaT timestamps).
+        new: optional mask of events not folded in before (incremental
+        re-mining); the other events of those cases are context, and the
+        per-case numbers are recomputed from the whole case.
+        """
+        n_act = len(self.activities)
+        act = np.asarray(act, dtype=np.int64)
+        ts = np.asarray(ts, dtype=np.int64)
+        case = np.asarray(case, dtype=np.int64)
+        if new is None:
+            new = np.ones(len(act), dtype=bool)
+        known = act >= 0
+        self.events += np.bincount(act[new & known], minlength=n_act)
+
+        # Previous occurrence of the same (known) activity in the same case
+        order = np.lexsort((np.arange(len(act)), act, case))
+        same = ((case[order][1:] == case[order][:-1]) & (act[order][1:] == act[order][:-1])
+                & known[order][1:])
+        prev, cur = order[:-1][same], order[1:][same]
+        a = act[cur]
+        loop_len = cur - prev
+        lost = (ts[cur] - ts[prev]) / 1e9
+        fresh = new[cur]
+
+        self.repeats += np.bincount(a[fresh], minlength=n_act)
+        self.self_loops += np.bincount(a[fresh & (loop_len == 1)], minlength=n_act)
+        self.loop_len_sum += np.bincount(a[fresh], weights=loop_len[fresh],
+                                         minlength=n_act).astype(np.int64)
+        np.maximum.at(self.loop_len_max, a, loop_len)
+        self.lost_seconds += np.bincount(a[fresh], weights=lost[fresh], minlength=n_act)
+        # (case, activity) pairs whose first repeat is new
+        keys = case[cur] * n_act + a
+        first_repeat = np.setdiff1d(np.unique(keys[fresh]), keys[~fresh])
+        self.reworked_cases += np.bincount(first_repeat % n_act, minlength=n_act)
+
+        # Per case: union of the loop intervals, set for every case of the chunk
+        n_cases = len(self.cases)
+        cases = np.unique(case)
+        self.case_repeats[cases] = np.bincount(case[cur], minlength=n_cases)[cases]
+        point_case, point_ts, open_loops = sweep_line(case[cur], ts[prev], ts[cur])
+        self.case_lost_seconds[cases] = covered_seconds(point_case, point_ts, open_loops,
+                                                        n_cases)[cases]
+        return self
+
+    def merge(self, other):
+        """Fold in the statistics of a disjoint set of cases (e.g. a case-hash shard)."""
+        for name in ACTIVITY_ARRAYS + CASE_ARRAYS:
+            if name == 'loop_len_max':
+                np.maximum(self.loop_len_max, other.loop_len_max, out=self.loop_len_max)
+            else:
+                setattr(self, name, getattr(self, name) + getattr(other, name))
+        return self
+
+    def remap(self, activities, cases):
+        """The same statistics keyed by the vocabularies of a rebuilt store."""
+        out = ReworkStats(activities, cases)
+        a = pd.Index(out.activities).get_indexer(self.activities)
+        c = pd.Index(out.cases).get_indexer(self.cases)
+        if (a < 0).any() or (c < 0).any():
+            raise ValueError("event store vocabularies lost names since the rework state was saved")
+        for name in ACTIVITY_ARRAYS:
+            getattr(out, name)[a] = getattr(self, name)
+        for name in CASE_ARRAYS:
+            getattr(out, name)[c] = getattr(self, name)
+        return out
+
+    def activity_rows(self):
+        """Rework rows per activity with events, by time lost."""
+        rows = []
+        for a in np.flatnonzero(self.events):
+            repeats = int(self.repeats[a])
+            rows.append({
+                "activity": self.activities[a],
+                "events": int(self.events[a]),
+                "repeat_events": repeats,
+                "repeat_rate": round(repeats / int(self.events[a]), 3),
+                "self_loops": int(self.self_loops[a]),
+                "self_loop_rate": round(int(self.self_loops[a]) / int(self.events[a]), 3),
+                "cases_with_rework": int(self.reworked_cases[a]),
+                "avg_loop_length": round(int(self.loop_len_sum[a]) / repeats, 2) if repeats else 0,
+                "max_loop_length": int(self.loop_len_max[a]),
+                "rework_hours": round(float(self.lost_seconds[a]) / 3600, 2),
+                "avg_rework_hours": (round(float(self.lost_seconds[a]) / repeats / 3600, 2)
+                                     if repeats else 0),
+            })
+        rows.sort(key=lambda r: r["rework_hours"], reverse=True)
+        return rows
+
+    def report(self, top_cases=TOP_CASES):
+        reworked = np.flatnonzero(self.case_repeats)
+        hours = self.case_lost_seconds[reworked] / 3600
+        top = reworked[np.argsort(-hours, kind='stable')[:top_cases]]
+        total_events = int(self.events.sum())
+        return {
+            "summary": {
+                "repeat_events": int(self.repeats.sum()),
+                "rework_share": round(int(self.repeats.sum()) / total_events, 3)
+                if total_events else 0,
+                "self_loops": int(self.self_loops.sum()),
+                "cases_with_rework": len(reworked),
+                "rework_hours": round(float(hours.sum()), 2),
+                "avg_rework_hours_per_case": round(float(hours.mean()), 2) if len(hours) else 0,
+                "p90_rework_hours_per_case": (round(float(np.percentile(hours, 90)), 2)
+                                              if len(hours) else 0),
+            },
+            "activities": self.activity_rows(),
+            "top_cases": [
+                {"case": str(self.cases[c]), "repeat_events": int(self.case_repeats[c]),
+                 "rework_hours": round(float(self.case_lost_seconds[c]) / 3600, 2)}
+                for c in top
+            ],
+        }
+
+
+def save_rework(rework, path=REWORK_FILE):
+    with open(path, 'w') as f:
+        json.dump(rework.report(), f, indent=2)
+    print(f"[OK] Saved '{path}'")
+
+
+def load_rework(path=REWORK_FILE):
+    """Report written by save_rework(), or None if there is no artifact."""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
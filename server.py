@@ -5,6 +5,7 @@ from fastapi.responses import FileResponse
 from pydantic import BaseModel
 import json
 import os
+import numpy as np
 import subprocess
 import asyncio
 import threading
@@ -14,6 +15,11 @@ from pathlib import Path
 # --- Chatbot & Context ---
 # --- Chatbot & Context ---
 from chatbot import ProcessChatbot
+from process_timeseries import load_series, window_labels
+from time_cube import load_cube, query_range
+from attribute_cube import load_attribute_cube, query_attribute_cube
+from case_attributes import load_case_attributes
+from native_mining import mine_cases
 
 # ==========================================
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY") # Load from environment variable for security
@@ -95,6 +101,35 @@ training_manager = TrainingWSManager()
 
 chatbot = None
 
+# --- Process trends (process_timeseries.npz from process_mining.py) ---
+# Windows shown in trend lists, and the baselines used before the series exists.
+# OpEx has no source in the event log, so it stays a modelled figure.
+TREND_WINDOWS = 12
+DEFAULT_CYCLE_DAYS, DEFAULT_THROUGHPUT, OPEX_BASELINE = 45, 120, 85
+NS_PER_MONTH = 30.4375 * 24 * 3600 * 1e9
+
+def _finite(values, digits):
+    return [round(float(v), digits) if np.isfinite(v) else None for v in values]
+
+def process_trends():
+    """Cycle time / throughput baselines and recent per-window series, or None."""
+    series = load_series()
+    if series is None or series['case_ends'].sum() == 0:
+        return None
+    bounds, ends = series['bounds'], series['case_ends'].astype(float)
+    cycle_days = series['cycle_time_hours'].astype(float) / 24
+    # Completed cases per month, scaled from each window's length
+    per_month = ends * NS_PER_MONTH / np.diff(bounds)
+    recent = slice(-TREND_WINDOWS, None)
+    return {
+        "series": series,
+        "windows": window_labels(bounds, series['window'])[recent],
+        "cycle_days": float(np.nansum(cycle_days * ends) / ends.sum()),
+        "throughput": float(ends.sum() * NS_PER_MONTH / (bounds[-1] - bounds[0])),
+        "cycle_trend": _finite(cycle_days[recent], 1),
+        "throughput_trend": _finite(per_month[recent], 1),
+    }
+
 @app.on_event("startup")
 async def startup_event():
     global chatbot
@@ -108,22 +143,79 @@ async def startup_event():
         except Exception as e:
             print(f"Chatbot init failed: {e}")
 
+def case_topology(filters):
+    """
+    Bottlenecks and DFG edges of the cases matching trace-attribute filters
+    (CaseAttributeIndex.select()). Only those cases' rows are read from the
+    memory-mapped event store, through the CSR case index.
+    """
+    cases = load_case_attributes().select(filters)
+    bottlenecks, dfg_data = mine_cases(cases)
+    return bottlenecks, dfg_data['edges'], int(cases.sum())
+
 # --- Endpoints ---
 
 @app.get("/api/topology")
-async def get_topology():
-    """Returns process topology built from real process mining data."""
+def get_topology(start: Optional[str] = None, end: Optional[str] = None,
+                 spend_area: Optional[str] = None, company: Optional[str] = None,
+                 item_type: Optional[str] = None, min_value: Optional[float] = None,
+                 max_value: Optional[float] = None):
+    """
+    Returns process topology built from real process mining data.
+    With start and/or end (ISO dates, end exclusive) the graph covers only
+    that date range, answered from the prefix-sum cube (process_cube.npz).
+    With spend_area / company / item_type / min_value / max_value (EUR,
+    max exclusive) it covers only the matching cases, mined from the event
+    store through the case attribute index. A plain def, so FastAPI runs the
+    mining in its threadpool instead of blocking the event loop.
+    """
     print("API: /api/topology called")
-    try:
-        with open('bottleneck_report.json', 'r') as f:
-            bottleneck_data = json.load(f)
-        with open('dfg_data.json', 'r') as f:
-            dfg_data = json.load(f)
-    except FileNotFoundError:
-        return {"nodes": [], "edges": []}
-    
-    activities = bottleneck_data.get('bottlenecks', [])
-    dfg_edges = dfg_data.get('edges', [])
+    date_range = None
+    filters = {attr: value for attr, value in (("Spend area text", spend_area), ("Company", company),
+                                               ("Item Type", item_type)) if value is not None}
+    if min_value is not None or max_value is not None:
+        filters["Value_EUR"] = (min_value, max_value)
+    if filters and (start is not None or end is not None):
+        raise HTTPException(status_code=400, detail="Case attribute filters cannot be combined with a date range")
+    if filters:
+        try:
+            activities, dfg_edges, n_cases = case_topology(filters)
+        except FileNotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    elif start is not None or end is not None:
+        cube = load_cube()
+        if cube is None:
+            raise HTTPException(status_code=404, detail="process_cube.npz not found; run process_mining.py")
+        try:
+            result = query_range(cube, start, end)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid date range: {e}")
+        activities, dfg_edges = result['bottlenecks'], result['edges']
+        date_range = {"start": result['start'], "end": result['end'], "activeDays": result['active_days']}
+    else:
+        try:
+            with open('bottleneck_report.json', 'r') as f:
+                bottleneck_data = json.load(f)
+            with open('dfg_data.json', 'r') as f:
+                dfg_data = json.load(f)
+        except FileNotFoundError:
+            return {"nodes": [], "edges": []}
+
+        activities = bottleneck_data.get('bottlenecks', [])
+        dfg_edges = dfg_data.get('edges', [])
+
+    # Per-window bottleneck scores and edge counts, when the series exists
+    trends = process_trends()
+    act_trend, edge_trend = {}, {}
+    if trends:
+        series, recent = trends["series"], slice(-TREND_WINDOWS, None)
+        names = [str(a) for a in series['activities']]
+        for i, name in enumerate(names):
+            act_trend[name] = _finite(series['bottleneck_score'][recent, i], 3)
+        for j, (s, t) in enumerate(series['edges']):
+            edge_trend[(names[s], names[t])] = series['edge_count'][recent, j].tolist()
     
     # Take top 8 activities by frequency for a clean graph
     top_activities = sorted(activities, key=lambda a: a['frequency'], reverse=True)[:8]
@@ -165,6 +257,7 @@ async def get_topology():
                 "avgDuration": avg_dur,
                 "frequency": act['frequency'],
                 "bottleneckScore": round(act.get('bottleneck_score', 0), 3),
+                "scoreTrend": act_trend.get(act['activity'], []),
             },
             "position": {"x": x, "y": y},
             "style": style,
@@ -204,6 +297,7 @@ async def get_topology():
             "source": edge['_src_id'], "target": edge['_tgt_id'],
             "animated": True,
             "label": f"{freq:,}" if is_heavy else "",
+            "data": {"frequencyTrend": edge_trend.get((edge['source'], edge['target']), [])},
             "style": {
                 "stroke": "#ef4444" if is_heavy else "#64748b",
                 "strokeWidth": 2 if is_heavy else 1,
@@ -211,17 +305,44 @@ async def get_topology():
         })
     
     print(f"API: Returning {len(nodes)} nodes, {len(edges)} edges")
-    return {"nodes": nodes, "edges": edges}
+    topology = {"nodes": nodes, "edges": edges, "windows": trends["windows"] if trends else []}
+    if date_range:
+        topology["range"] = date_range
+    if filters:
+        topology["filters"] = {"where": filters, "cases": n_cases}
+    return topology
+
+@app.get("/api/breakdown")
+async def get_breakdown(by: str = "Spend area text", spend_area: Optional[str] = None,
+                        company: Optional[str] = None, item_type: Optional[str] = None):
+    """Bottleneck scores per Spend area / Company / Item Type from attribute_cube.npz."""
+    cube = load_attribute_cube()
+    if cube is None:
+        raise HTTPException(status_code=404, detail="attribute_cube.npz not found; run process_mining.py")
+    where = {dim: value for dim, value in (("Spend area text", spend_area), ("Company", company),
+                                          ("Item Type", item_type)) if value is not None}
+    try:
+        return {"by": by, "where": where, "values": query_attribute_cube(cube, by, where)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/api/telemetry")
 async def get_telemetry():
     global optimization_state
-    b_cycle, b_thru, b_opex = 45, 120, 85
+    # Baselines are the mined all-time averages; Trend holds the recent windows
+    trends = process_trends()
+    if trends:
+        b_cycle, b_thru = round(trends["cycle_days"], 1), round(trends["throughput"], 1)
+        cycle_trend, thru_trend = trends["cycle_trend"], trends["throughput_trend"]
+    else:
+        b_cycle, b_thru = DEFAULT_CYCLE_DAYS, DEFAULT_THROUGHPUT
+        cycle_trend, thru_trend = [], []
+    b_opex = OPEX_BASELINE
     
     return [
-        {"name": "Cycle Time (Days)", "Baseline": b_cycle, "Optimized": round(b_cycle - optimization_state["cycle_time_red"], 1)},
-        {"name": "Throughput (/mo)", "Baseline": b_thru, "Optimized": round(b_thru + optimization_state["throughput_inc"], 1)},
-        {"name": "OpEx ($k/mo)", "Baseline": b_opex, "Optimized": round(b_opex - optimization_state["opex_red"], 1)}
+        {"name": "Cycle Time (Days)", "Baseline": b_cycle, "Optimized": round(b_cycle - optimization_state["cycle_time_red"], 1), "Trend": cycle_trend},
+        {"name": "Throughput (/mo)", "Baseline": b_thru, "Optimized": round(b_thru + optimization_state["throughput_inc"], 1), "Trend": thru_trend},
+        {"name": "OpEx ($k/mo)", "Baseline": b_opex, "Optimized": round(b_opex - optimization_state["opex_red"], 1), "Trend": []}
     ]
 
 class Employee(BaseModel):
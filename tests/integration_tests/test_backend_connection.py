@@ -42,3 +42,91 @@ def test_websocket_chat():
         data = websocket.receive_text()
         assert isinstance(data, str)
         assert len(data) > 0
+
+def _tiny_cube():
+    import numpy as np
+    from time_cube import DayCube
+    day = 24 * 3600 * 10**9
+    # Two cases: A -> B in January, A -> C in March (timestamps in ns)
+    t0 = np.datetime64('2018-01-10', 'ns').astype(np.int64)
+    t1 = np.datetime64('2018-03-10', 'ns').astype(np.int64)
+    cube = DayCube(['A', 'B', 'C']).update(
+        case=np.array([0, 0, 1, 1]), act=np.array([0, 1, 0, 2]),
+        ts=np.array([t0, t0 + day, t1, t1 + 2 * day]),
+    )
+    return cube.to_arrays()
+
+def test_topology_date_range(monkeypatch):
+    import server
+    cube = _tiny_cube()
+    monkeypatch.setattr(server, "load_cube", lambda: cube)
+
+    data = client.get("/api/topology", params={"start": "2018-03-01", "end": "2018-04-01"}).json()
+    assert data["range"]["start"].startswith("2018-03-01")
+    assert sorted(n["data"]["label"] for n in data["nodes"]) == ["A", "C"]
+    assert len(data["edges"]) == 1
+
+    full = client.get("/api/topology", params={"start": "2018-01-01"}).json()
+    assert sorted(n["data"]["label"] for n in full["nodes"]) == ["A", "B", "C"]
+
+    response = client.get("/api/topology", params={"start": "2018-04-01", "end": "2018-01-01"})
+    assert response.status_code == 400
+
+def test_breakdown(monkeypatch):
+    import numpy as np
+    import server
+    from attribute_cube import AttributeCube
+
+    # Two cases of company X (IT) and one of company Y (Sales)
+    cube = AttributeCube(['A', 'B'], ['Spend area text', 'Company'],
+                         [['IT', 'Sales'], ['X', 'Y']], case_cells=[0 * 3 + 0, 0 * 3 + 0, 1 * 3 + 1])
+    cube.update(case=np.array([0, 0, 1, 2, 2]), act=np.array([0, 1, 0, 0, 1]),
+                ts=np.array([0, 3600, 0, 0, 7200]) * 10**9)
+    arrays = cube.to_arrays()
+    monkeypatch.setattr(server, "load_attribute_cube", lambda: arrays)
+
+    data = client.get("/api/breakdown", params={"by": "Company"}).json()
+    assert data["values"]["X"]["cases"] == 2
+    assert data["values"]["Y"]["bottlenecks"][0]["activity"] == "A"
+
+    data = client.get("/api/breakdown", params={"by": "Company", "spend_area": "Sales"}).json()
+    assert list(data["values"]) == ["Y"]
+
+    assert client.get("/api/breakdown", params={"by": "Vendor"}).status_code == 400
+
+def _write_attribute_log(path):
+    import pandas as pd
+    # Case 1: IT, 100 EUR, A -> B; case 2: Sales, 5000 EUR, A -> C; case 3: IT, 20000 EUR, A -> B -> C
+    rows = [("c1", "A", "2018-01-01 08:00", "IT", 100.0), ("c1", "B", "2018-01-01 10:00", "IT", 100.0),
+            ("c2", "A", "2018-01-02 08:00", "Sales", 5000.0), ("c2", "C", "2018-01-03 08:00", "Sales", 5000.0),
+            ("c3", "A", "2018-01-04 08:00", "IT", 20000.0), ("c3", "B", "2018-01-04 09:00", "IT", 20000.0),
+            ("c3", "C", "2018-01-05 09:00", "IT", 20000.0)]
+    frame = pd.DataFrame(rows, columns=["Case_ID", "Activity", "Timestamp", "Spend area text", "Value_EUR"])
+    frame.assign(Resource="user_1", Company="X").to_csv(path, index=False)
+
+def test_topology_case_attribute_filters(tmp_path, monkeypatch):
+    _write_attribute_log(tmp_path / "sap_event_log.csv")
+    monkeypatch.chdir(tmp_path)
+
+    def frequencies(data):
+        return {n["data"]["label"]: n["data"]["frequency"] for n in data["nodes"]}
+
+    data = client.get("/api/topology", params={"spend_area": "IT"}).json()
+    assert data["filters"] == {"where": {"Spend area text": "IT"}, "cases": 2}
+    assert frequencies(data) == {"A": 2, "B": 2, "C": 1}
+    assert len(data["edges"]) == 2
+
+    data = client.get("/api/topology", params={"company": "X", "min_value": 1000}).json()
+    assert data["filters"]["cases"] == 2
+    assert frequencies(data) == {"A": 2, "B": 1, "C": 2}
+
+    data = client.get("/api/topology", params={"spend_area": "IT", "max_value": 1000}).json()
+    assert frequencies(data) == {"A": 1, "B": 1} and len(data["edges"]) == 1
+
+    data = client.get("/api/topology", params={"spend_area": "Logistics"}).json()
+    assert data["filters"]["cases"] == 0 and data["nodes"] == []
+
+    # Item Type is not a column of this log; dates and attributes don't combine
+    assert client.get("/api/topology", params={"item_type": "Material"}).status_code == 400
+    response = client.get("/api/topology", params={"spend_area": "IT", "start": "2018-01-01"})
+    assert response.status_code == 400
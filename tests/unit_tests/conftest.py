@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def random_log(seed=0, n_cases=60, n_act=5, n_res=4, max_len=9):
+    """
+    Case-sorted event log as store codes: case, act, res (-1 = missing),
+    ts (epoch ns, whole seconds, ties within cases) and value. Some case
+    codes have no events, activities repeat within cases.
+    """
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(0, max_len + 1, n_cases)
+    case = np.repeat(np.arange(n_cases), lengths)
+    n = len(case)
+    start = np.repeat(rng.integers(0, 400, n_cases) * 86400, lengths)
+    step = rng.choice([0, 60, 3600, 86400, 5 * 86400], n, p=[0.1, 0.2, 0.3, 0.3, 0.1])
+    offset = pd.Series(step).groupby(case).cumsum().to_numpy()
+    ts = (np.datetime64('2018-01-01', 's').astype(np.int64) + start + offset) * 10**9
+    res = rng.integers(0, n_res, n)
+    res[rng.random(n) < 0.05] = -1
+    value = np.repeat(rng.integers(100, 10**5, n_cases).astype(float), lengths)
+    value[rng.random(n) < 0.05] = np.nan
+    return pd.DataFrame({
+        'case': case, 'act': rng.integers(0, n_act, n), 'res': res, 'ts': ts, 'value': value,
+    })
+
+
+def chunks(log, n_chunks):
+    """Case-sorted chunks of whole cases as update() keyword arguments."""
+    cases = np.array_split(np.unique(log['case']), n_chunks)
+    for part in cases:
+        rows = log[log['case'].isin(part)]
+        yield {col: rows[col].to_numpy() for col in ('case', 'act', 'ts', 'res', 'value')}
+
+
+@pytest.fixture
+def make_log():
+    return random_log
+
+
+@pytest.fixture
+def chunk_log():
+    return chunks
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+from activity_wip import ActivityWIP
+from resource_workload import IntervalRuns
+
+ACTIVITIES = ['Approve', 'Create', 'Invoice', 'Pay', 'Receive']
+
+def _intervals(log):
+    """A case is in an activity from its event until the next event of the case."""
+    end = log.groupby('case')['ts'].shift(-1).fillna(log['ts']).astype(np.int64)
+    items = pd.DataFrame({'act': log['act'], 'start': log['ts'], 'end': end})
+    return items[items['end'] > items['start']]
+
+def _open_at(items, t, strict=False):
+    """Cases open at instant t (ends leave before starts join); strict: without those starting at t."""
+    joined = items['start'] < t if strict else items['start'] <= t
+    return int((joined & (items['end'] > t)).sum())
+
+def _mine(chunks, **kwargs):
+    wip = ActivityWIP(ACTIVITIES, **kwargs)
+    for chunk in chunks:
+        wip.update(chunk['case'], chunk['act'], chunk['ts'])
+    return wip
+
+def test_wip_matches_per_timestamp_count(make_log, chunk_log, monkeypatch):
+    log = make_log(seed=30)
+    items = _intervals(log)
+    monkeypatch.setattr(IntervalRuns.blocks, '__defaults__', (7,))
+    wip = _mine(chunk_log(log, 5))
+
+    m = wip.metrics()
+    span = (log['ts'].max() - log['ts'].min()) / 1e9
+    for a in range(len(ACTIVITIES)):
+        of_act = items[items['act'] == a]
+        assert m['peak_wip'][a] == max((_open_at(of_act, t) for t in of_act['start']), default=0)
+        assert np.isclose(m['avg_wip'][a], ((of_act['end'] - of_act['start']) / 1e9).sum() / span)
+
+    # Windows inside the log span: intervals are clipped to the series range
+    bounds = np.unique(np.quantile(log['ts'], np.linspace(0.05, 0.95, 7)).astype(np.int64))
+    series = wip.series(bounds)
+    clipped = items.assign(start=items['start'].clip(bounds[0], bounds[-1]),
+                           end=items['end'].clip(bounds[0], bounds[-1]))
+    clipped = clipped[clipped['end'] > clipped['start']]
+    for w, (lo, hi) in enumerate(zip(bounds[:-1], bounds[1:])):
+        for a in range(len(ACTIVITIES)):
+            of_act = clipped[clipped['act'] == a]
+            starts = of_act['start'][(of_act['start'] >= lo) & (of_act['start'] < hi)]
+            peak = max([_open_at(of_act, lo, strict=True)] + [_open_at(of_act, t) for t in starts])
+            overlap = (of_act['end'].clip(upper=hi) - of_act['start'].clip(lower=lo)).clip(lower=0)
+            assert series['peak_wip'][w, a] == peak, (w, a)
+            assert np.isclose(series['avg_wip'][w, a], overlap.sum() / (hi - lo)), (w, a)
+
+def test_spilled_shards_merge_and_reload(make_log, chunk_log, tmp_path):
+    log = make_log(seed=31)
+    whole = _mine(chunk_log(log, 1))
+    shard = log['case'] % 3
+    parts = [_mine(chunk_log(log[shard == s], 2), spill_dir=str(tmp_path / f'shard_{s}'))
+             for s in range(3)]
+    merged = parts[2].merge(parts[1]).merge(parts[0])
+    assert not parts[1].runs.paths and len(merged.runs) == len(whole.runs)
+
+    # The runs stay in the spill directory and are picked up by a new WIP state
+    reloaded = ActivityWIP(ACTIVITIES, spill_dir=str(tmp_path / 'shard_2'))
+    reloaded.open_seconds = merged.open_seconds
+    reloaded.first_ts, reloaded.last_ts = merged.first_ts, merged.last_ts
+    bounds = np.linspace(log['ts'].min(), log['ts'].max(), 6).astype(np.int64)
+    for wip in (merged, reloaded):
+        for got, expected in ((wip.metrics(), whole.metrics()),
+                              (wip.series(bounds), whole.series(bounds))):
+            assert np.array_equal(got['peak_wip'], expected['peak_wip'])
+            assert np.allclose(got['avg_wip'], expected['avg_wip'])
+
+def test_events_without_activity_open_no_interval(make_log, chunk_log):
+    log = make_log(seed=32)
+    act = log['act'].to_numpy().copy()
+    act[np.random.default_rng(32).random(len(act)) < 0.1] = -1
+    log = log.assign(act=act)
+    wip = _mine(chunk_log(log, 3))
+
+    items = _intervals(log)
+    items = items[items['act'] >= 0]
+    m = wip.metrics()
+    span = (log['ts'].max() - log['ts'].min()) / 1e9
+    for a in range(len(ACTIVITIES)):
+        of_act = items[items['act'] == a]
+        assert m['peak_wip'][a] == max((_open_at(of_act, t) for t in of_act['start']), default=0)
+        assert np.isclose(m['avg_wip'][a], ((of_act['end'] - of_act['start']) / 1e9).sum() / span)
@@ -0,0 +1,40 @@
+import numpy as np
+
+from attribute_cube import AttributeCube
+
+ACTIVITIES = ['Approve', 'Create', 'Invoice', 'Pay', 'Receive']
+SPEND_AREAS = ['IT', 'Sales']
+COMPANIES = ['companyID_0000', 'companyID_0001', 'companyID_0002']
+
+def _cube(log, chunk_log, coords, n_chunks=3):
+    cube = AttributeCube(ACTIVITIES, ['Spend area text', 'Company'], [SPEND_AREAS, COMPANIES],
+                         np.ravel_multi_index(coords, (3, 4)))
+    for chunk in chunk_log(log, n_chunks):
+        cube.update(chunk['case'], chunk['act'], chunk['ts'])
+    return cube
+
+def test_update_matches_groupby_with_missing_activities(make_log, chunk_log):
+    log = make_log(seed=70)
+    rng = np.random.default_rng(70)
+    n_cases = log['case'].max() + 1
+    # Per case attribute codes, the last slot of each axis = missing
+    coords = (rng.integers(0, 3, n_cases), rng.integers(0, 4, n_cases))
+    act = log['act'].to_numpy().copy()
+    act[rng.random(len(act)) < 0.1] = -1
+    log = log.assign(act=act, cell=np.ravel_multi_index(coords, (3, 4))[log['case']])
+    cube = _cube(log, chunk_log, coords)
+
+    known = log[log['act'] >= 0]
+    events = known.groupby(['cell', 'act']).size()
+    assert cube.events.sum() == len(known)
+    assert np.array_equal(cube.events[events.index.get_level_values(0), events.index.get_level_values(1)],
+                          events.to_numpy())
+    nxt = log.groupby('case')['ts'].shift(-1)
+    durations = log.assign(sec=(nxt - log['ts']) / 1e9)
+    durations = durations[(durations['act'] >= 0) & nxt.notna()].groupby(['cell', 'act'])['sec']
+    for (c, a), n in durations.size().items():
+        assert cube.dur_n[c, a] == n
+    assert cube.dur_n.sum() == durations.size().sum()
+    assert np.allclose(cube.dur_sum.sum(), durations.sum().sum())
+    cases = log.drop_duplicates('case')['cell'].value_counts()
+    assert np.array_equal(cube.cases[cases.index], cases.to_numpy())
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from case_attributes import load_case_attributes
+
+SPEND_AREAS = ['IT', 'Logistics', 'Sales']
+COMPANIES = ['companyID_0000', 'companyID_0001']
+
+def _write_log(path, n_cases=120, seed=10):
+    """Event log CSV with random per-case trace attributes (some missing)."""
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(1, 5, n_cases)
+    case = np.repeat(np.arange(n_cases), lengths)
+    spend = np.array(SPEND_AREAS + [None], dtype=object)[rng.integers(0, 4, n_cases)]
+    company = np.array(COMPANIES, dtype=object)[rng.integers(0, 2, n_cases)]
+    value = rng.integers(100, 10**5, n_cases).astype(float)
+    value[rng.random(n_cases) < 0.05] = np.nan
+    frame = pd.DataFrame({
+        'Case_ID': [f'case_{c:03d}' for c in case],
+        'Activity': [f'act_{a}' for a in rng.integers(0, 5, len(case))],
+        'Timestamp': pd.Timestamp('2018-01-01', tz='UTC') + pd.to_timedelta(
+            np.arange(len(case)), unit='h'),
+        'Resource': [f'user_{r}' for r in rng.integers(0, 4, len(case))],
+        'Value_EUR': value[case],
+        'Spend area text': spend[case],
+        'Company': company[case],
+    })
+    frame.to_csv(path, index=False)
+    return frame.drop_duplicates('Case_ID').set_index('Case_ID').sort_index()
+
+def _cases(cases, mask):
+    return sorted(np.array(cases)[mask])
+
+def test_select_matches_pandas(tmp_path):
+    source = str(tmp_path / 'sap_event_log.csv')
+    traces = _write_log(source)
+    attrs = load_case_attributes(source)
+    cases = list(traces.index)
+    assert attrs.n_cases == len(cases)
+    assert {'Spend area text', 'Company', 'Value_EUR'} <= set(attrs.attributes)
+
+    queries = [
+        ({'Spend area text': 'IT'}, traces['Spend area text'] == 'IT'),
+        ({'Spend area text': ['IT', 'Sales']}, traces['Spend area text'].isin(['IT', 'Sales'])),
+        ({'Spend area text': 'Unknown'}, traces['Spend area text'] == 'Unknown'),
+        ({'Value_EUR': (20_000, None)}, traces['Value_EUR'] >= 20_000),
+        ({'Value_EUR': (None, 50_000)}, traces['Value_EUR'] < 50_000),
+        ({'Value_EUR': traces['Value_EUR'].iloc[3]}, traces['Value_EUR'] == traces['Value_EUR'].iloc[3]),
+        ({'Value_EUR': int(traces['Value_EUR'].iloc[3])}, traces['Value_EUR'] == traces['Value_EUR'].iloc[3]),
+        ({'Value_EUR': 1000}, traces['Value_EUR'] == 1000),
+        ({'Spend area text': 'Logistics', 'Company': COMPANIES[1], 'Value_EUR': (10_000, 80_000)},
+         (traces['Spend area text'] == 'Logistics') & (traces['Company'] == COMPANIES[1])
+         & traces['Value_EUR'].between(10_000, 80_000, inclusive='left')),
+        ({}, pd.Series(True, index=traces.index)),
+    ]
+    for filters, expected in queries:
+        assert _cases(cases, attrs.select(filters)) == sorted(traces.index[expected.to_numpy()]), filters
+
+    # Posting lists: every value's cases are one contiguous slice
+    for value in SPEND_AREAS:
+        assert _cases(cases, attrs.cases_with('Spend area text', value)) == \
+            sorted(traces.index[traces['Spend area text'] == value])
+    for filters in ({'Vendor': 'vendorID_0001'}, {'Value_EUR': '1000'}, {'Value_EUR': [1000, 2000]}):
+        with pytest.raises(ValueError):
+            attrs.select(filters)
+
+    # Persisted next to the store and reloaded as-is
+    again = load_case_attributes(source)
+    for key, values in attrs.arrays.items():
+        assert np.array_equal(again.arrays[key], values, equal_nan=values.dtype.kind == 'f'), key
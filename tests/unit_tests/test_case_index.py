@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+from case_index import CaseIndex, load_case_index
+
+def _codes(seed=13, n_cases=12, n_missing=4):
+    """Case-sorted codes: leading -1 rows, some cases without events, trailing empty codes."""
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(0, 5, n_cases)
+    lengths[[0, 5]] = 0
+    codes = np.concatenate([np.full(n_missing, -1), np.repeat(np.arange(n_cases), lengths)])
+    return codes, n_cases + 3
+
+def _rows(codes, case, mask=None):
+    keep = codes == case if mask is None else (codes == case) & mask
+    return np.flatnonzero(keep)
+
+def test_offsets_skip_missing_cases_and_keep_empty_ones():
+    codes, n_cases = _codes()
+    index = CaseIndex.from_sorted_codes(codes, n_cases=n_cases)
+
+    assert index.n_cases == n_cases
+    assert index.offsets[0] == 4 and index.offsets[-1] == len(codes)
+    assert index.lengths().tolist() == [int((codes == c).sum()) for c in range(n_cases)]
+    assert index.nonempty_cases().tolist() == sorted(set(codes[codes >= 0]))
+    for case in range(n_cases):
+        assert np.arange(len(codes))[index.rows(case)].tolist() == _rows(codes, case).tolist()
+        assert index.take(codes, case).tolist() == [case] * int((codes == case).sum())
+    # Without n_cases the index ends at the largest code
+    assert CaseIndex.from_sorted_codes(codes).n_cases == codes.max() + 1
+    assert CaseIndex.from_sorted_codes(np.full(3, -1)).n_cases == 0
+
+def test_vectorized_views_match_per_case_rows():
+    codes, n_cases = _codes()
+    values = np.arange(len(codes)) * 10
+    index = CaseIndex.from_sorted_codes(codes, n_cases=n_cases)
+    cases = index.nonempty_cases()
+
+    assert values[index.event_rows()].tolist() == values[codes >= 0].tolist()
+    assert index.event_cases().tolist() == codes[codes >= 0].tolist()
+    assert index.first(values).tolist() == [values[_rows(codes, c)[0]] for c in cases]
+    assert index.last(values).tolist() == [values[_rows(codes, c)[-1]] for c in cases]
+    assert [index.endpoints(c) for c in cases] == [(_rows(codes, c)[0], _rows(codes, c)[-1])
+                                                   for c in cases]
+    picked = np.array([1, 2, 7, 11, 13])
+    assert index.rows_of(picked).tolist() == np.flatnonzero(np.isin(codes, picked)).tolist()
+    assert index.rows_of(np.array([], dtype=np.int64)).tolist() == []
+
+    known = pd.Series(values[codes >= 0])
+    shifted = known.groupby(codes[codes >= 0]).shift(-1).fillna(-1).astype(int)
+    assert index.next_within_case(values, -1).tolist() == shifted.tolist()
+    assert index.is_last().tolist() == shifted.eq(-1).tolist()
+    for case in cases:
+        assert index.event_cases()[index.positions(case)].tolist() == [case] * len(_rows(codes, case))
+
+def test_filter_keeps_case_codes_and_drops_events():
+    codes, n_cases = _codes()
+    values = np.arange(len(codes)) * 10
+    index = CaseIndex.from_sorted_codes(codes, n_cases=n_cases)
+    mask = np.random.default_rng(14).random(len(codes)) < 0.6
+
+    assert index.filter(np.ones(len(codes), dtype=bool)) is index
+    sub = index.filter(mask)
+    assert sub.n_cases == n_cases
+    assert sub.lengths().tolist() == [len(_rows(codes, c, mask)) for c in range(n_cases)]
+    for case in range(n_cases):
+        assert sub.rows(case).tolist() == _rows(codes, case, mask).tolist()
+    assert sub.event_rows().tolist() == np.flatnonzero((codes >= 0) & mask).tolist()
+    cases = sub.nonempty_cases()
+    assert sub.last(values).tolist() == [values[_rows(codes, c, mask)[-1]] for c in cases]
+    assert [sub.endpoints(c) for c in cases] == [(_rows(codes, c, mask)[0], _rows(codes, c, mask)[-1])
+                                                 for c in cases]
+    assert sub.rows_of(cases[:3]).tolist() == np.flatnonzero(np.isin(codes, cases[:3]) & mask).tolist()
+    shifted = pd.Series(values[sub.event_rows()]).groupby(sub.event_cases()).shift(-1)
+    assert sub.next_within_case(values, -1).tolist() == shifted.fillna(-1).astype(int).tolist()
+
+    # Filtering again composes the masks; an all-False mask leaves every case empty
+    other = np.random.default_rng(15).random(len(codes)) < 0.5
+    assert sub.filter(other).event_rows().tolist() == np.flatnonzero((codes >= 0) & mask & other).tolist()
+    empty = index.filter(np.zeros(len(codes), dtype=bool))
+    assert empty.lengths().sum() == 0 and len(empty.last(values)) == 0
+
+def test_persisted_index_matches_store(tmp_path):
+    source = str(tmp_path / 'sap_event_log.csv')
+    pd.DataFrame({
+        'Case_ID': ['b', None, 'a', 'b', None, 'a', 'c'],
+        'Activity': ['x', 'y', 'x', 'z', 'x', 'y', 'x'],
+        'Timestamp': pd.date_range('2018-01-01', periods=7, freq='D', tz='UTC'),
+    }).to_csv(source, index=False)
+    index = load_case_index(source)
+
+    # Two events without a case come first; a, b and c follow in name order
+    assert index.offsets.tolist() == [2, 4, 6, 7]
+    assert isinstance(load_case_index(source).offsets, np.memmap)
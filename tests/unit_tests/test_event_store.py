@@ -0,0 +1,110 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import event_store
+from event_store import NAT, decode, open_event_store, read_event_log
+
+def _write_log(path, n_events=200, seed=12):
+    """Unsorted event log CSV with missing activities, resources and timestamps."""
+    rng = np.random.default_rng(seed)
+    activity = np.array(['Record Invoice', 'Create PO', 'Pay', None], dtype=object)
+    frame = pd.DataFrame({
+        'Case_ID': [f'case_{c:02d}' for c in rng.integers(0, 30, n_events)],
+        'Activity': activity[rng.choice(4, n_events, p=[0.3, 0.3, 0.3, 0.1])],
+        'Timestamp': pd.Timestamp('2018-01-01', tz='UTC') + pd.to_timedelta(
+            rng.integers(0, 50, n_events), unit='D'),
+        'Resource': np.array(['user_2', 'batch', None], dtype=object)[rng.integers(0, 3, n_events)],
+        'Value_EUR': rng.integers(100, 10**5, n_events).astype(float),
+        'Item': rng.integers(1, 5, n_events),
+    })
+    frame.loc[rng.random(n_events) < 0.05, 'Timestamp'] = pd.NaT
+    frame.to_csv(path, index=False)
+    return frame
+
+def test_string_columns_are_encoded_with_sorted_vocabularies(tmp_path):
+    source = str(tmp_path / 'sap_event_log.csv')
+    frame = _write_log(source)
+    store = open_event_store(source)
+
+    for col in ('Case_ID', 'Activity', 'Resource'):
+        assert store.kind(col) == 'code'
+        assert store.vocab[col] == sorted(frame[col].dropna().unique())
+    assert store.kind('Timestamp') == 'time'
+    assert store.kind('Value_EUR') == 'float'
+    assert store.kind('Item') == 'int'
+
+    # Rows are sorted by (Case_ID, Timestamp) with ties in source order
+    expected = frame.sort_values(['Case_ID', 'Timestamp'], kind='stable', na_position='first')
+    for col in ('Case_ID', 'Activity', 'Resource'):
+        codes = store.array(col)
+        assert codes.dtype == np.int32
+        assert decode(store.vocab, col, codes) == [v if isinstance(v, str) else None
+                                                   for v in expected[col]]
+    ts = store.array('Timestamp')
+    assert np.array_equal(ts == NAT, expected['Timestamp'].isna().to_numpy())
+    assert np.array_equal(ts[ts != NAT], expected['Timestamp'].dropna().astype('datetime64[ns, UTC]')
+                          .dt.tz_convert(None).to_numpy().view(np.int64))
+    assert np.array_equal(store.array('Item'), expected['Item'].to_numpy())
+
+def test_read_event_log_returns_categoricals(tmp_path):
+    source = str(tmp_path / 'sap_event_log.csv')
+    frame = _write_log(source)
+    df = read_event_log(source, columns=['Case_ID', 'Activity', 'Timestamp'])
+
+    assert list(df.columns) == ['Case_ID', 'Activity', 'Timestamp']
+    assert isinstance(df['Activity'].dtype, pd.CategoricalDtype)
+    assert list(df['Activity'].cat.categories) == sorted(frame['Activity'].dropna().unique())
+    assert df['Activity'].isna().sum() == frame['Activity'].isna().sum()
+    assert str(df['Timestamp'].dt.tz) == 'UTC'
+    # Code order is name order, so grouping on codes gives the by-name counts
+    counts = df.groupby('Activity', observed=True).size()
+    assert counts.to_dict() == frame.groupby('Activity').size().to_dict()
+
+def test_store_is_reused_until_the_source_changes(tmp_path, monkeypatch):
+    source = str(tmp_path / 'sap_event_log.csv')
+    _write_log(source)
+    first = open_event_store(source)
+    assert first.store_dir == source + '.store'
+
+    def no_rebuild(*args, **kwargs):
+        raise AssertionError('store rebuilt for an unchanged source')
+
+    build = event_store.build_event_store
+    monkeypatch.setattr(event_store, 'build_event_store', no_rebuild)
+    again = open_event_store(source)
+    assert again.meta == first.meta
+    assert np.array_equal(again.array('Activity'), first.array('Activity'))
+
+    # Rewriting the source (different size) makes the store stale
+    monkeypatch.setattr(event_store, 'build_event_store', build)
+    _write_log(source, n_events=150)
+    assert open_event_store(source).n_events == 150
+
+def test_store_outlives_its_source(tmp_path):
+    source = str(tmp_path / 'sap_event_log.csv')
+    _write_log(source)
+    open_event_store(source)
+    (tmp_path / 'sap_event_log.csv').unlink()
+    assert open_event_store(source).n_events == 200
+
+    with pytest.raises(FileNotFoundError):
+        open_event_store(str(tmp_path / 'other.csv'))
+
+def test_newer_of_csv_and_parquet_is_read(tmp_path):
+    csv = str(tmp_path / 'sap_event_log.csv')
+    parquet = str(tmp_path / 'sap_event_log.parquet')
+    _write_log(csv, n_events=200)
+    _write_log(csv.replace('.csv', '_tmp.csv'), n_events=120)
+    pd.read_csv(csv.replace('.csv', '_tmp.csv')).to_parquet(parquet)
+    os.utime(csv, (1, 1))
+
+    store = open_event_store(csv)
+    assert store.store_dir == parquet + '.store'
+    assert store.n_events == 120
+    # Each source keeps its own store
+    os.utime(parquet, (0, 0))
+    assert open_event_store(csv).n_events == 200
+    assert os.path.isdir(csv + '.store') and os.path.isdir(parquet + '.store')
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from handover import HandoverMatrix, load_handover, save_handover
+
+RESOURCES = ['ann', 'bob', 'cid', 'dee', 'eve']
+
+def _fold(chunks, **kwargs):
+    matrix = HandoverMatrix(RESOURCES)
+    for chunk in chunks:
+        matrix.update(chunk['case'], chunk['res'], chunk['ts'], **kwargs)
+    return matrix
+
+def _expected(log):
+    """Handovers counted with pandas: next event of the case by another (known) resource."""
+    nxt = log.groupby('case')[['res', 'ts']].shift(-1)
+    pairs = log.assign(dst=nxt['res'], sec=(nxt['ts'] - log['ts']) / 1e9)
+    pairs = pairs[pairs['dst'].notna() & (pairs['res'] >= 0) & (pairs['dst'] >= 0)
+                  & (pairs['res'] != pairs['dst'])]
+    return pairs.astype({'dst': int}).groupby(['res', 'dst'])['sec'].agg(['size', 'sum'])
+
+def _frame(matrix):
+    arrays = matrix.to_arrays()
+    return pd.DataFrame({'size': arrays['count'], 'sum': arrays['dur_sum']},
+                        index=pd.MultiIndex.from_arrays(
+                            [arrays['src'].astype(np.int64), arrays['dst'].astype(np.int64)],
+                            names=['res', 'dst']))
+
+def test_matches_pandas(make_log, chunk_log):
+    log = make_log(seed=8, n_cases=100, n_res=5)
+    expected = _expected(log)
+    matrix = _fold(chunk_log(log, 4))
+    assert np.all(np.diff(matrix.keys) > 0)  # sorted by (source, target), no duplicates
+    pd.testing.assert_frame_equal(_frame(matrix), expected, check_dtype=False)
+
+def test_shards_new_events_and_remap(make_log, chunk_log, tmp_path):
+    log = make_log(seed=9, n_cases=100, n_res=5)
+    whole = _frame(_fold(chunk_log(log, 1)))
+
+    shard = log['case'] % 3
+    merged = _fold(chunk_log(log[shard == 0], 1))
+    for s in (2, 1):
+        merged.merge(_fold(chunk_log(log[shard == s], 2)))
+    pd.testing.assert_frame_equal(_frame(merged), whole)
+
+    watermark = np.quantile(log['ts'], 0.5)
+    matrix = _fold(chunk_log(log[log['ts'] <= watermark], 2))
+    touched = log[log['case'].isin(log.loc[log['ts'] > watermark, 'case'])]
+    for chunk in chunk_log(touched, 3):
+        matrix.update(chunk['case'], chunk['res'], chunk['ts'], new=chunk['ts'] > watermark)
+    pd.testing.assert_frame_equal(_frame(matrix), whole)
+
+    remapped = matrix.remap(['abe'] + RESOURCES + ['zoe'])
+    frame = _frame(remapped)
+    frame.index = frame.index.map(lambda k: (k[0] - 1, k[1] - 1))
+    pd.testing.assert_frame_equal(frame, whole, check_names=False)
+    with pytest.raises(ValueError):
+        matrix.remap(RESOURCES[:-1])
+
+    path = str(tmp_path / 'handover.npz')
+    save_handover(matrix, path)
+    loaded = load_handover(path)
+    assert list(loaded['resources']) == RESOURCES
+    assert np.array_equal(loaded['count'], matrix.count)
+    assert load_handover(str(tmp_path / 'missing.npz')) is None
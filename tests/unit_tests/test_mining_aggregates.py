@@ -0,0 +1,156 @@
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from mining_aggregates import MiningAggregates
+
+ACTIVITIES = ['Approve', 'Create', 'Invoice', 'Pay', 'Receive']
+RESOURCES = ['ann', 'bob', 'cid', 'dee']
+CASES = [f'case_{c:03d}' for c in range(60)]
+
+def _mine(chunks):
+    agg = MiningAggregates(ACTIVITIES, RESOURCES, CASES)
+    for chunk in chunks:
+        agg.update(**chunk)
+    return agg
+
+def _records(frame):
+    return frame.astype(object).where(frame.notna(), None).to_dict('records')
+
+def _report(agg):
+    """Everything the artifacts read from the state, keyed by names."""
+    dfg_freq, dfg_perf, starts, ends = agg.dfg()
+    return {
+        'dfg': list(dfg_freq.items()), 'perf': dfg_perf, 'starts': starts, 'ends': ends,
+        'activities': _records(agg.activity_frame()),
+        'resources': _records(agg.resource_frame()),
+        'quantiles': agg.edge_quantiles(),
+        'variants': list(agg.variants().items()),
+        'summary': {k: v for k, v in agg.summary().items() if k != 'case_duration_hours'},
+        'case_hours': sorted(agg.summary()['case_duration_hours']),
+    }
+
+def test_update_matches_pandas(make_log, chunk_log):
+    log = make_log()
+    agg = _mine(chunk_log(log, 4))
+    nxt = log.groupby('case').shift(-1)
+    pairs = log[nxt['act'].notna()].assign(dst=nxt['act'].dropna().astype(int),
+                                           sec=(nxt['ts'] - log['ts']).dropna() / 1e9)
+
+    assert agg.n_events == len(log)
+    assert np.array_equal(agg.act_events, np.bincount(log['act'], minlength=5))
+    assert np.array_equal(agg.act_dur_n, np.bincount(pairs['act'], minlength=5))
+    assert np.allclose(agg.act_dur_sum, pairs.groupby('act')['sec'].sum().reindex(range(5), fill_value=0))
+    edges = pairs.groupby(['act', 'dst'])['sec'].agg(['size', 'sum'])
+    for (s, d), row in edges.iterrows():
+        assert agg.edge_count[s, d] == row['size'] and np.isclose(agg.edge_dur_sum[s, d], row['sum'])
+    assert agg.edge_count.sum() == len(pairs)
+
+    # Edge quantiles: exact sketches, so the same as pandas
+    for (s, d), q in agg.edge_quantiles().items():
+        sec = pairs[(pairs['act'] == ACTIVITIES.index(s)) & (pairs['dst'] == ACTIVITIES.index(d))]['sec']
+        assert np.allclose(q, sec.quantile([0.5, 0.9, 0.99]).to_numpy(), rtol=1e-12)
+
+    # DFG keys in order of first occurrence in the case-sorted log
+    first = pairs.drop_duplicates(['act', 'dst'])
+    assert list(agg.dfg()[0]) == [(ACTIVITIES[s], ACTIVITIES[d])
+                                  for s, d in zip(first['act'], first['dst'])]
+
+    with_res = log[log['res'] >= 0]
+    by_res = with_res.groupby('res').agg(events=('act', 'size'), cases=('case', 'nunique'),
+                                         acts=('act', 'nunique'), value=('value', 'sum'))
+    frame = agg.resource_frame().set_index('resource')
+    for r, row in by_res.iterrows():
+        got = frame.loc[RESOURCES[r]]
+        assert (got['events_handled'], got['unique_cases'], got['unique_activities']) == (
+            row['events'], row['cases'], row['acts'])
+        assert np.isclose(got['total_value_handled'], round(row['value'], 2))
+
+    traces = log.groupby('case')['act'].apply(lambda a: tuple(ACTIVITIES[x] for x in a))
+    assert agg.variants() == Counter(traces.tolist())
+    assert list(agg.variants()) == list(dict.fromkeys(traces.tolist()))
+    span = log.groupby('case')['ts'].agg(['min', 'max'])
+    assert sorted(agg.summary()['case_duration_hours']) == sorted((span['max'] - span['min']) / 1e9 / 3600)
+    assert agg.summary()['total_cases'] == len(span)
+
+def test_chunking_and_shard_merge_match_one_pass(make_log, chunk_log):
+    log = make_log(seed=1)
+    whole = _report(_mine(chunk_log(log, 1)))
+    assert _report(_mine(chunk_log(log, 7))) == whole
+
+    # Case-hash style shards: disjoint case sets, merged in either order
+    shard = log['case'] % 3
+    parts = [_mine(chunk_log(log[shard == s], 2)) for s in range(3)]
+    merged = parts[2].merge(parts[0]).merge(parts[1])
+    assert _report(merged) == whole
+
+def test_remap_to_grown_vocabulary(make_log, chunk_log):
+    log = make_log(seed=2)
+    agg = _mine(chunk_log(log, 3))
+    grown = MiningAggregates(sorted(ACTIVITIES + ['Audit', 'Reject']), sorted(RESOURCES + ['abe', 'zed']),
+                             sorted(CASES + ['case_000a', 'case_999']))
+    remapped = agg.remap(grown.activities, grown.resources, grown.cases)
+    assert _report(remapped) == _report(agg)
+
+    # Same as mining the log recoded to the grown vocabularies
+    a = pd.Index(grown.activities).get_indexer(ACTIVITIES)
+    r = pd.Index(grown.resources).get_indexer(RESOURCES)
+    c = pd.Index(grown.cases).get_indexer(CASES)
+    recoded = log.assign(act=a[log['act']], res=np.where(log['res'] >= 0, r[log['res']], -1),
+                         case=c[log['case']]).sort_values('case', kind='stable')
+    fresh = MiningAggregates(grown.activities, grown.resources, grown.cases)
+    for chunk in chunk_log(recoded, 3):
+        fresh.update(**chunk)
+    assert _report(fresh) == _report(remapped)
+
+    with pytest.raises(ValueError):
+        agg.remap(ACTIVITIES[1:], RESOURCES, CASES)
+
+def test_new_events_fold_into_open_cases(make_log, chunk_log):
+    log = make_log(seed=3)
+    watermark = np.quantile(log['ts'], 0.7)
+    agg = _mine(chunk_log(log[log['ts'] <= watermark], 2))
+    # Cases that gained events, re-read whole with their old events as context
+    touched = log[log['case'].isin(log.loc[log['ts'] > watermark, 'case'])]
+    for chunk in chunk_log(touched, 2):
+        agg.update(**chunk, new=chunk['ts'] > watermark)
+    assert _report(agg) == _report(_mine(chunk_log(log, 1)))
+
+def test_events_without_activity_match_native_dfg(make_log, chunk_log):
+    from native_mining import activity_arrays, dfg_arrays
+
+    log = make_log(seed=4)
+    act = log['act'].to_numpy().copy()
+    act[np.random.default_rng(4).random(len(act)) < 0.1] = -1
+    log = log.assign(act=act)
+    agg = _mine(chunk_log(log, 3))
+
+    dfg_freq, dfg_perf, starts, ends, _ = dfg_arrays(ACTIVITIES, log['act'], log['case'], log['ts'])
+    assert list(agg.dfg()[0].items()) == list(dfg_freq.items())
+    assert agg.dfg()[1] == pytest.approx(dfg_perf)
+    assert agg.dfg()[2:] == (starts, ends)
+    traces = log.groupby('case')['act'].apply(lambda a: tuple(ACTIVITIES[x] for x in a if x >= 0))
+    assert agg.variants() == Counter(traces.tolist())
+    assert list(agg.variants()) == list(dict.fromkeys(traces.tolist()))
+    native = activity_arrays(ACTIVITIES, log['act'], log['case'], log['ts'], log['value'])
+    cols = ['activity', 'frequency', 'avg_duration_hours', 'max_duration_hours',
+            'total_duration_hours', 'total_value_eur']
+    pd.testing.assert_frame_equal(agg.activity_frame()[cols], native[cols], check_dtype=False)
+
+def test_remap_keeps_missing_activity_codes(make_log, chunk_log):
+    log = make_log(seed=5)
+    log = log.assign(act=log['act'].where(log.index % 7 != 0, -1))
+    agg = _mine(chunk_log(log, 2))
+    # Variant keys of states saved before missing activities were left out
+    agg.variant_seqs.append(np.array([2, -1, 0], dtype=np.int32).tobytes())
+    grown = sorted(ACTIVITIES + ['Audit'])
+    remapped = agg.remap(grown, RESOURCES, CASES)
+
+    a = pd.Index(grown).get_indexer(ACTIVITIES)
+    for name in ('case_first_act', 'case_last_act'):
+        codes = getattr(agg, name)
+        assert np.array_equal(getattr(remapped, name), np.where(codes >= 0, a[codes], -1))
+    assert np.frombuffer(remapped.variant_seqs[-1], dtype=np.int32).tolist() == [a[2], -1, a[0]]
+    assert (agg.case_first_act[agg.case_events > 0] < 0).any()
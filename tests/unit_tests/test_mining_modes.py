@@ -0,0 +1,150 @@
+import glob
+import json
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('pm4py')
+import process_mining
+
+def _frame(seed, cases, first_day=0, n_act=5):
+    """Events of the given case numbers, 1-6 per case, from first_day on."""
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(1, 7, len(cases))
+    case = np.repeat(cases, lengths)
+    start = np.repeat(first_day + rng.integers(0, 120, len(cases)), lengths) * 86400
+    step = rng.choice([0, 60, 3600, 86400, 4 * 86400], len(case))
+    offset = pd.Series(step).groupby(case).cumsum().to_numpy()
+    return pd.DataFrame({
+        'Case_ID': [f'case_{c:03d}' for c in case],
+        'Activity': [f'act_{a}' for a in rng.integers(0, n_act, len(case))],
+        'Timestamp': pd.to_datetime(np.datetime64('2018-01-01', 's').astype(np.int64)
+                                    + start + offset, unit='s', utc=True),
+        'Resource': [f'user_{r}' for r in rng.integers(0, 4, len(case))],
+        'Value_EUR': np.repeat(rng.integers(100, 10**5, len(cases)).astype(float), lengths),
+        'Spend area text': np.repeat(np.array(['IT', 'Sales', 'Logistics'])[
+            rng.integers(0, 3, len(cases))], lengths),
+    })
+
+def _write(frames):
+    pd.concat(frames, ignore_index=True).to_csv(process_mining.SAP_CSV, index=False)
+
+def _outputs():
+    """Every report and artifact a run writes to the working directory."""
+    out = {}
+    for path in sorted(glob.glob('*.json')):
+        with open(path) as f:
+            out[path] = json.load(f)
+    for path in sorted(glob.glob('*.npz')):
+        with np.load(path) as data:
+            out[path] = {k: data[k] for k in data.files}
+    return out
+
+def _assert_same(got, expected):
+    assert got.keys() == expected.keys()
+    for name in expected:
+        if name.endswith('.json'):
+            assert got[name] == expected[name], name
+        else:
+            assert got[name].keys() == expected[name].keys(), name
+            for key, values in expected[name].items():
+                np.testing.assert_array_equal(got[name][key], values, err_msg=f'{name}:{key}')
+
+def _run(**mode):
+    process_mining.main(conformance=False, chunk_rows=40, **mode)
+    return _outputs()
+
+def test_modes_write_the_same_artifacts(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _write([_frame(40, np.arange(80))])
+    streaming = _run(streaming=True)
+    assert {'dfg_data.json', 'bottleneck_report.json', 'activity_wip.npz',
+            'resource_workload.npz'} <= streaming.keys()
+    _assert_same(_run(shards=3, workers=2), streaming)
+    _assert_same(_run(incremental=True), streaming)
+
+def test_incremental_after_appended_events_equals_full_pass(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    old = _frame(41, np.arange(60))
+    _write([old])
+    _run(incremental=True)
+
+    # New cases, a new activity, and later events of existing cases, all after the watermark
+    later = (old['Timestamp'].max() - pd.Timestamp('2018-01-01', tz='UTC')).days + 2
+    extra = _frame(42, np.arange(40, 90), first_day=later, n_act=6)
+    _write([old, extra])
+    capsys.readouterr()
+    incremental = _run(incremental=True)
+    assert 'Incremental re-mining' in capsys.readouterr().out
+    _assert_same(incremental, _run(streaming=True))
+
+def test_changed_watermark_or_window_forces_a_full_pass(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    old = _frame(43, np.arange(60))
+    _write([old])
+    _run(incremental=True)
+    shutil.copytree(process_mining.ARTIFACT_STATE_DIR, f'before_{process_mining.ARTIFACT_STATE_DIR}')
+    later = (old['Timestamp'].max() - pd.Timestamp('2018-01-01', tz='UTC')).days + 2
+    extra = _frame(44, np.arange(50, 70), first_day=later)
+    _write([old, extra])
+    _run(incremental=True)
+    full = _run(streaming=True)
+
+    # Artifact state saved at an older watermark than the aggregates
+    shutil.rmtree(process_mining.ARTIFACT_STATE_DIR)
+    shutil.copytree(f'before_{process_mining.ARTIFACT_STATE_DIR}', process_mining.ARTIFACT_STATE_DIR)
+    capsys.readouterr()
+    _assert_same(_run(incremental=True), full)
+    out = capsys.readouterr().out
+    assert 'running a full pass' in out and 'Incremental re-mining' not in out
+
+    # Another series window than the saved state
+    capsys.readouterr()
+    weekly = _run(incremental=True, window='week')
+    out = capsys.readouterr().out
+    assert 'No week artifact state' in out and 'Incremental re-mining' not in out
+    _assert_same(weekly, _run(streaming=True, window='week'))
+
+    # A late event, at or before the watermark
+    late = extra.iloc[:1].assign(Timestamp=old['Timestamp'].min())
+    _write([old, extra, late])
+    capsys.readouterr()
+    _assert_same(_run(incremental=True), _run(streaming=True))
+    assert 'Events at or before the watermark changed' in capsys.readouterr().out
+
+def test_in_memory_matches_streaming_with_missing_values(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    frame = _frame(45, np.arange(80))
+    blank = np.random.default_rng(45).random((2, len(frame))) < 0.05
+    frame.loc[blank[0], 'Activity'] = None
+    frame.loc[blank[1], 'Case_ID'] = None
+    _write([frame])
+    _assert_same(_run(), _run(streaming=True))
+
+def test_profile_records_every_stage_without_changing_outputs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv(process_mining.PROFILE_ENV, raising=False)
+    _write([_frame(46, np.arange(50))])
+    plain = _run()
+    assert process_mining.PROFILE_FILE not in plain
+
+    for mode, kwargs in (('in-memory', {}), ('streaming', {'streaming': True})):
+        monkeypatch.setenv(process_mining.PROFILE_ENV, '1')
+        profiled = _run(**kwargs)
+        with open(process_mining.PROFILE_FILE) as f:
+            profile = json.load(f)
+        del profiled[process_mining.PROFILE_FILE]
+        _assert_same(profiled, plain)
+
+        assert profile['mode'] == mode
+        assert profile['events'] == plain['process_stats.json']['overview']['total_events']
+        stages = {s['stage']: s for s in profile['stages']}
+        assert {'load', 'dfg', 'bottlenecks', 'conformance', 'resources', 'stats'} <= stages.keys()
+        for record in profile['stages']:
+            assert record['wall_seconds'] >= 0 and record['cpu_seconds'] >= 0
+            assert record['peak_rss_mb'] > 0
+        assert profile['total_wall_seconds'] == pytest.approx(
+            sum(s['wall_seconds'] for s in profile['stages']), abs=1e-3)
+        assert stages['load']['rows'] == profile['events']
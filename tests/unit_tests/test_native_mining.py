@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from native_mining import activity_arrays, dfg_arrays
+
+ACTIVITIES = ['Approve', 'Create', 'Invoice', 'Pay', 'Receive']
+
+def _with_missing_activities(log, seed=5):
+    """The log with ~10% of activity codes set to -1 (no activity name)."""
+    act = log['act'].to_numpy().copy()
+    act[np.random.default_rng(seed).random(len(act)) < 0.1] = -1
+    return log.assign(act=act)
+
+def test_dfg_skips_missing_activities(make_log):
+    log = _with_missing_activities(make_log(seed=6))
+    assert (log['act'] < 0).any()
+    dfg_freq, dfg_perf, starts, ends, _ = dfg_arrays(ACTIVITIES, log['act'], log['case'], log['ts'])
+
+    nxt = log.groupby('case').shift(-1)
+    pairs = log.assign(dst=nxt['act'], sec=(nxt['ts'] - log['ts']).clip(lower=0) / 1e9)
+    pairs = pairs[(pairs['act'] >= 0) & (pairs['dst'] >= 0)].astype({'dst': int})
+    edges = pairs.groupby(['act', 'dst'], sort=False)['sec'].agg(['size', 'mean'])
+    assert list(dfg_freq) == [(ACTIVITIES[s], ACTIVITIES[d]) for s, d in edges.index]
+    assert list(dfg_freq.values()) == edges['size'].tolist()
+    assert np.allclose(list(dfg_perf.values()), edges['mean'])
+
+    by_case = log.groupby('case')['act']
+    for got, acts in ((starts, by_case.first()), (ends, by_case.last())):
+        counts = acts[acts >= 0].value_counts(sort=False)
+        assert got == {ACTIVITIES[a]: n for a, n in counts.items()}
+
+def test_activity_stats_skip_missing_activities(make_log):
+    log = _with_missing_activities(make_log(seed=7))
+    stats = activity_arrays(ACTIVITIES, log['act'], log['case'], log['ts'], log['value'])
+    known = log[log['act'] >= 0]
+    counts = known['act'].value_counts().sort_index()
+    assert stats['activity'].tolist() == [ACTIVITIES[a] for a in counts.index]
+    assert stats['frequency'].tolist() == counts.tolist()
+    assert np.allclose(stats['total_value_eur'], known.groupby('act')['value'].sum().round(2))
+
+def test_in_memory_mining_skips_events_without_case(make_log, tmp_path):
+    process_mining = pytest.importorskip('process_mining')
+    log = _with_missing_activities(make_log(seed=8))
+    frame = pd.DataFrame({
+        'Case_ID': [f'case_{c:03d}' for c in log['case']],
+        'Activity': [ACTIVITIES[a] if a >= 0 else None for a in log['act']],
+        'Timestamp': pd.to_datetime(log['ts'], utc=True),
+        'Resource': [f'user_{r}' for r in log['res']],
+        'Value_EUR': log['value'],
+    })
+    # Events of no case sort first in the store, ahead of every case range
+    frame.loc[frame.sample(frac=0.05, random_state=8).index, 'Case_ID'] = None
+    path = str(tmp_path / 'sap_event_log.csv')
+    frame.to_csv(path, index=False)
+
+    _, df = process_mining.load_event_log(path, build_log=False)
+    kept = log[frame['Case_ID'].notna().to_numpy()]
+    assert len(df) == len(kept) and df['case:concept:name'].notna().all()
+    dfg_freq = process_mining.discover_dfg_native(df)[0]
+    assert dfg_freq == dfg_arrays(ACTIVITIES, kept['act'], kept['case'], kept['ts'])[0]
+    bottlenecks = process_mining.detect_bottlenecks(None, df)
+    stats = activity_arrays(ACTIVITIES, kept['act'], kept['case'], kept['ts'])
+    assert {b['activity']: b['frequency'] for b in bottlenecks} == \
+        dict(zip(stats['activity'], stats['frequency']))
+
+def test_median_is_exact_beyond_the_sketch_limit():
+    # One case of 3001 events: 3000 distinct durations, more than a sketch keeps exactly
+    rng = np.random.default_rng(9)
+    seconds = rng.choice(np.arange(3600, 1000 * 3600), 3000, replace=False)
+    ts = np.concatenate([[0], np.cumsum(seconds)]) * 10**9
+    act = np.zeros(len(ts), dtype=np.int64)
+    stats = activity_arrays(ACTIVITIES, act, np.zeros(len(ts), dtype=np.int64), ts)
+    assert stats['median_duration_hours'].tolist() == [round(np.median(seconds) / 3600, 2)]
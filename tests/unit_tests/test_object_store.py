@@ -0,0 +1,121 @@
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from object_store import OBJECT_TYPES, open_object_store
+
+def _write_sources(tmp_path, seed=11):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2018-03-01', tz='UTC')
+
+    def times(n):
+        return start + pd.to_timedelta(rng.integers(0, 30 * 24, n), unit='h')
+
+    pos = [f'45000{p:02d}_00010' for p in range(12)]
+    sap = pd.DataFrame({'Case_ID': rng.choice(pos, 80),
+                        'Activity': rng.choice(['Create PO', 'Receive', 'Pay'], 80),
+                        'Timestamp': times(80), 'Resource': rng.choice(['ann', 'bob'], 80)})
+    # Jira tickets and Teams threads point at known and unknown PO items
+    jira = pd.DataFrame({'Case_ID': rng.choice([f'JIRA-{t}' for t in range(8)], 30),
+                         'SAP_PO_ID': rng.choice(pos[:10] + ['4599999_00010'], 30),
+                         'Status': rng.choice(['Open', 'Done'], 30),
+                         'Assignee': rng.choice(['bob', 'cid'], 30), 'Timestamp': times(30)})
+    teams = pd.DataFrame({'Case_ID': rng.choice([f'thread_{t}' for t in range(6)], 25),
+                          'SAP_PO_ID': rng.choice(pos, 25),
+                          'Activity': rng.choice(['Teams: Message', 'Teams: Call'], 25),
+                          'Resource': rng.choice(['ann', 'dee'], 25), 'Timestamp': times(25)})
+    paths = [str(tmp_path / name) for name in ('sap.csv', 'jira.csv', 'teams.csv')]
+    for frame, path in zip((sap, jira, teams), paths):
+        frame.to_csv(path, index=False)
+    return paths, sap, jira, teams
+
+def _brute_force(sap, jira, teams):
+    """All events, time-sorted like the store, with their (object type, name) links."""
+    sap = sap.sort_values(['Case_ID', 'Timestamp'], kind='stable')  # event store order
+    frames = [
+        pd.DataFrame({'ts': sap['Timestamp'], 'act': sap['Activity'], 'res': sap['Resource'],
+                      'links': [[('po_item', c)] for c in sap['Case_ID']]}),
+        pd.DataFrame({'ts': jira['Timestamp'], 'act': 'Jira: ' + jira['Status'], 'res': jira['Assignee'],
+                      'links': [[('jira_ticket', t), ('po_item', p)]
+                                for t, p in zip(jira['Case_ID'], jira['SAP_PO_ID'])]}),
+        pd.DataFrame({'ts': teams['Timestamp'], 'act': teams['Activity'], 'res': teams['Resource'],
+                      'links': [[('teams_thread', t), ('po_item', p)]
+                                for t, p in zip(teams['Case_ID'], teams['SAP_PO_ID'])]}),
+    ]
+    events = pd.concat([f.assign(source=i) for i, f in enumerate(frames)], ignore_index=True)
+    return events.sort_values('ts', kind='stable').reset_index(drop=True)
+
+def test_csr_matches_brute_force(tmp_path):
+    paths, sap, jira, teams = _write_sources(tmp_path)
+    ocel = open_object_store(*paths, store_dir=str(tmp_path / 'ocel.store'))
+    events = _brute_force(sap, jira, teams)
+
+    assert ocel.n_events == len(events)
+    acts, res = ocel.vocab['activities'], ocel.vocab['resources']
+    assert np.array_equal(ocel.array('ts'), events['ts'].dt.tz_convert(None).astype('datetime64[ns]')
+                          .to_numpy().view(np.int64))
+    assert [acts[a] for a in ocel.array('act')] == events['act'].tolist()
+    assert [res[r] for r in ocel.array('res')] == events['res'].tolist()
+    assert ocel.array('source').tolist() == events['source'].tolist()
+
+    # Object ids: one contiguous range per type, names sorted within it
+    objects = {t: sorted({name for links in events['links'] for typ, name in links if typ == t})
+               for t in OBJECT_TYPES}
+    assert ocel.n_objects == sum(len(names) for names in objects.values())
+    for t in OBJECT_TYPES:
+        lo, hi = ocel.object_range(t)
+        assert hi - lo == len(objects[t])
+        for name in objects[t]:
+            obj = ocel.object_id(t, name)
+            assert lo <= obj < hi and ocel.object_name(obj) == (t, name)
+    assert ocel.object_id('po_item', 'no such PO') is None
+
+    # event -> objects and object -> events (time order) as in the brute-force links
+    by_object = {}
+    for e, links in enumerate(events['links']):
+        ids = sorted(ocel.object_id(t, name) for t, name in links)
+        assert ocel.objects_of(e).tolist() == ids
+        for obj in ids:
+            by_object.setdefault(obj, []).append(e)
+    for obj in range(ocel.n_objects):
+        assert ocel.events_of(obj).tolist() == by_object.get(obj, [])
+
+    # Flattening onto PO items pulls in the Jira and Teams events of each PO
+    flat = ocel.flatten('po_item')
+    lo, _ = ocel.object_range('po_item')
+    expected_case = [obj - lo for obj in sorted(by_object) if ocel.object_name(obj)[0] == 'po_item'
+                     for _ in by_object[obj]]
+    assert flat['case'].tolist() == expected_case
+    frame = ocel.flatten_frame('po_item')
+    assert len(frame) == len(expected_case) and frame['Case_ID'].notna().all()
+
+def _assert_oc_dfg(ocel, events):
+    dfg = ocel.oc_dfg()
+    for t in OBJECT_TYPES:
+        sequences = {}
+        for e, links in enumerate(events['links']):
+            for typ, name in links:
+                if typ == t:
+                    sequences.setdefault(name, []).append(events['act'][e])
+        # Events without an activity (NaN) break no sequence but form no edge
+        pairs = Counter((a, b) for seq in sequences.values() for a, b in zip(seq, seq[1:])
+                        if pd.notna(a) and pd.notna(b))
+        assert dfg[t]['objects'] == len(sequences)
+        assert {(e['source'], e['target']): e['frequency'] for e in dfg[t]['edges']} == dict(pairs)
+        assert dfg[t]['start_activities'] == dict(Counter(
+            seq[0] for seq in sequences.values() if pd.notna(seq[0])))
+        assert dfg[t]['end_activities'] == dict(Counter(
+            seq[-1] for seq in sequences.values() if pd.notna(seq[-1])))
+
+def test_oc_dfg_matches_brute_force(tmp_path):
+    paths, sap, jira, teams = _write_sources(tmp_path, seed=12)
+    ocel = open_object_store(*paths, store_dir=str(tmp_path / 'ocel.store'))
+    _assert_oc_dfg(ocel, _brute_force(sap, jira, teams))
+
+def test_oc_dfg_skips_events_without_activity(tmp_path):
+    paths, sap, jira, teams = _write_sources(tmp_path, seed=13)
+    teams.loc[::4, 'Activity'] = np.nan
+    teams.to_csv(paths[2], index=False)
+    ocel = open_object_store(*paths, store_dir=str(tmp_path / 'ocel.store'))
+    _assert_oc_dfg(ocel, _brute_force(sap, jira, teams))
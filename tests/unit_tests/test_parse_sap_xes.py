@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+
+import parse_sap_xes
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+def _write_xes(path, n_traces=40, rare_from=30):
+    """XES log with globals; traces from rare_from on carry an extra trace attribute."""
+    lines = ['<?xml version="1.0" encoding="UTF-8" ?>',
+             '<log xes.version="1849.2016" xmlns="http://www.xes-standard.org/">',
+             '<global scope="trace"><string key="concept:name" value="__INVALID__"/></global>',
+             '<global scope="event"><string key="org:resource" value="NONE"/></global>']
+    for t in range(n_traces):
+        lines.append(f'<trace><string key="concept:name" value="PO{t}"/>'
+                     f'<string key="Purchasing Document" value="{4500 + t}"/>'
+                     f'<string key="Item" value="{t % 3}"/>')
+        if t >= rare_from:
+            lines.append('<string key="Late &amp; Rare" value="yes"/>')
+        for e in range(1 + t % 4):
+            lines.append(f'<event><string key="concept:name" value="act_{(t + e) % 5}"/>'
+                         f'<string key="org:resource" value="user_{e}"/>'
+                         f'<date key="time:timestamp" value="2018-01-{1 + t % 28:02d}T{e:02d}:00:00.000+01:00"/>'
+                         f'<float key="Cumulative net worth (EUR)" value="{100.5 * t}"/></event>')
+        lines.append('</trace>')
+    lines.append('</log>')
+    path.write_text('\n'.join(lines))
+    return str(path)
+
+def _serial_frame(xes):
+    return parse_sap_xes.normalize_events(pd.DataFrame(list(parse_sap_xes.parse_xes(xes))))
+
+def test_scan_attribute_keys(tmp_path):
+    xes = _write_xes(tmp_path / 'log.xes')
+    assert parse_sap_xes.scan_attribute_keys(xes) == [
+        'concept:name', 'org:resource', 'Purchasing Document', 'Item', 'time:timestamp',
+        'Cumulative net worth (EUR)', 'Late & Rare']
+
+def test_stream_keeps_attributes_first_seen_in_later_batches(tmp_path, capsys):
+    xes = _write_xes(tmp_path / 'log.xes')
+    out = str(tmp_path / 'log.parquet')
+    batches = parse_sap_xes.iter_xes_batches(parse_sap_xes.parse_xes(xes), 16)
+    parse_sap_xes.write_event_log_stream(batches, out, 16, keys=parse_sap_xes.scan_attribute_keys(xes))
+
+    expected = _serial_frame(xes)
+    assert pq.ParquetFile(out).num_row_groups == -(-len(expected) // 16)
+    got = pq.read_table(out).to_pandas()
+    assert list(got.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(got, expected.astype(got.dtypes.to_dict()))
+    assert f"Unique cases: {expected['Case_ID'].nunique()}" in capsys.readouterr().out
+
+def test_parallel_matches_serial_across_shard_boundaries(tmp_path, monkeypatch):
+    xes = _write_xes(tmp_path / 'log.xes')
+    size = (tmp_path / 'log.xes').stat().st_size
+    monkeypatch.setattr(parse_sap_xes, 'SHARD_BYTES', 700)
+    n_shards = -(-size // 700)
+
+    header, shards = parse_sap_xes.find_trace_shards(xes, n_shards)
+    assert b'<global' in header and len(shards) > 1
+    # The even byte cuts land inside traces, so the shards had to move to the next <trace
+    assert any(size * i // n_shards not in [s for s, _ in shards] for i in range(1, n_shards))
+
+    batches = list(parse_sap_xes.parse_xes_parallel(xes, workers=2, batch_size=16))
+    got = parse_sap_xes.normalize_events(pd.concat(map(pd.DataFrame, batches), ignore_index=True))
+    pd.testing.assert_frame_equal(got, _serial_frame(xes))
@@ -0,0 +1,111 @@
+import ast
+import os
+
+import pytest
+
+import pipeline
+
+REPO = os.path.dirname(os.path.abspath(pipeline.__file__))
+
+def _local_imports(module, seen):
+    """Repository modules a module imports, at any depth (lazy imports included)."""
+    with open(os.path.join(REPO, module)) as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            path = name.split('.')[0] + '.py'
+            if path not in seen and os.path.exists(os.path.join(REPO, path)):
+                seen.add(path)
+                _local_imports(path, seen)
+    return seen
+
+@pytest.mark.parametrize('stage', pipeline.STAGES, ids=lambda s: s['name'])
+def test_stage_code_covers_its_imports(stage):
+    script = f"{stage['name']}.py"
+    assert stage['code'][0] == script
+    assert _local_imports(script, {script}) <= set(stage['code'])
+
+def _write(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+
+@pytest.fixture
+def stages(tmp_path, monkeypatch):
+    """Two chained stages in tmp_path: first upper-cases line 1 of in.txt, second copies it."""
+    monkeypatch.chdir(tmp_path)
+    _write('first.py', "import sys\nline = open('in.txt').readline().upper()\n"
+                       "open('mid.txt', 'w').write(line + ''.join(sys.argv[1:]))\n")
+    _write('second.py', "open('out.txt', 'w').write(open('mid.txt').read())\n")
+    _write('in.txt', "a\nb\n")
+    monkeypatch.setattr(pipeline, 'STAGES', [
+        {"name": "first", "inputs": ["in.txt"], "code": ["first.py"], "outputs": ["mid.txt"]},
+        {"name": "second", "inputs": ["mid.txt"], "code": ["second.py"], "outputs": ["out.txt"]},
+    ])
+
+def _touch_later(path):
+    """Bump a file's mtime so a rewrite of the same size is not taken from the hash cache."""
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+def test_stages_are_skipped_until_something_changes(stages):
+    assert pipeline.run_pipeline() == {"first": "built", "second": "built"}
+    assert pipeline.run_pipeline() == {"first": "skipped", "second": "skipped"}
+
+    # A changed input reruns its stage; an identical output does not invalidate the next one
+    _write('in.txt', "a\nc\n")
+    _touch_later('in.txt')
+    assert pipeline.run_pipeline(dry_run=True) == {"first": "input changed: in.txt",
+                                                   "second": "skipped"}
+    assert pipeline.run_pipeline() == {"first": "built", "second": "skipped"}
+    _write('in.txt', "x\n")
+    assert pipeline.run_pipeline() == {"first": "built", "second": "built"}
+    assert open('out.txt').read() == "X\n"
+
+    _write('second.py', open('second.py').read() + "# comment\n")
+    assert pipeline.run_pipeline(dry_run=True)["second"] == "code changed: second.py"
+    assert pipeline.run_pipeline({"first": ["!"]}, dry_run=True)["first"] == \
+        "parameters changed: [] -> ['!']"
+    assert pipeline.run_pipeline(force={"first"}, dry_run=True)["first"] == "forced"
+
+def test_outputs_touched_outside_the_pipeline_are_rebuilt(stages):
+    pipeline.run_pipeline()
+    os.remove('out.txt')
+    assert pipeline.run_pipeline(dry_run=True)["second"] == "output missing: out.txt"
+    pipeline.run_pipeline()
+    _write('mid.txt', "edited\n")
+    assert pipeline.run_pipeline(dry_run=True) == {
+        "first": "output modified outside the pipeline: mid.txt",
+        "second": "input changed: mid.txt",
+    }
+
+def test_failed_stage_stops_the_run(stages):
+    _write('first.py', "raise SystemExit(3)\n")
+    assert pipeline.run_pipeline() == {"first": "failed: exit code 3"}
+    assert not os.path.exists('out.txt')
+    assert "first" not in pipeline.load_manifest()["stages"]
+
+def test_file_hash_is_cached_by_size_and_mtime(tmp_path):
+    path = str(tmp_path / 'data.bin')
+    _write(path, "abcd")
+    cache = {}
+    digest = pipeline.file_hash(path, cache)
+    st = os.stat(path)
+    # Same size and mtime: the cached digest is trusted without re-reading
+    _write(path, "wxyz")
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert pipeline.file_hash(path, cache) == digest
+    _touch_later(path)
+    assert pipeline.file_hash(path, cache) != digest
+    assert pipeline.file_hash(str(tmp_path / 'missing'), cache) is None
+
+def test_event_log_follows_the_parser_parameters():
+    stage = pipeline.resolve_stage(pipeline.STAGES[1], pipeline.event_log_path({}))
+    assert stage["inputs"] == ["sap_event_log.csv"]
+    stream = pipeline.event_log_path({"parse_sap_xes": ["--stream"]})
+    assert pipeline.resolve_stage(pipeline.STAGES[0], stream)["outputs"] == ["sap_event_log.parquet"]
@@ -0,0 +1,128 @@
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytest
+
+process_mining = pytest.importorskip('process_mining')
+
+ACTIVITIES = ['Approve', 'Create', 'Invoice', 'Pay', 'Receive']
+
+def _frame(log):
+    """The case-sorted DataFrame load_event_log() returns, from store codes."""
+    cases = [f'case_{c:03d}' for c in range(log['case'].max() + 1)]
+    return pd.DataFrame({
+        'case:concept:name': pd.Categorical.from_codes(log['case'], categories=cases),
+        'concept:name': pd.Categorical.from_codes(log['act'], categories=ACTIVITIES),
+        'time:timestamp': pd.to_datetime(log['ts'], utc=True),
+        'Value_EUR': log['value'],
+    })
+
+def test_trace_variants_leave_out_missing_activities(make_log):
+    log = make_log(seed=80)
+    act = log['act'].to_numpy().copy()
+    act[np.random.default_rng(80).random(len(act)) < 0.15] = -1
+    log = log.assign(act=act)
+    variants, numbers = process_mining.trace_variants(_frame(log), return_cases=True)
+
+    traces = log.groupby('case')['act'].apply(lambda a: tuple(ACTIVITIES[x] for x in a if x >= 0))
+    assert variants == Counter(traces.tolist())
+    assert list(variants) == list(dict.fromkeys(traces.tolist()))
+    assert [list(variants)[n] for n in numbers] == traces.tolist()
+
+def test_native_dfg_matches_pm4py(make_log):
+    df = _frame(make_log(seed=81))
+    native = process_mining.discover_dfg(None, df, engine='native')
+    pm4py = process_mining.discover_dfg(None, df, engine='pm4py')
+    assert native[1] == pm4py[1] and list(native[1]) == list(pm4py[1])
+    assert native[0]['start_activities'] == pm4py[0]['start_activities']
+    assert native[0]['end_activities'] == pm4py[0]['end_activities']
+    assert native[0]['edges'] == pm4py[0]['edges']
+
+def test_native_dfg_of_a_case_subset(make_log):
+    log = make_log(seed=82)
+    df = _frame(log)
+    cases = np.random.default_rng(82).random(log['case'].max() + 1) < 0.4
+    subset = log[cases[log['case']]]
+    got = process_mining.discover_dfg_native(df, cases)
+    assert got == process_mining.discover_dfg_native(_frame(subset))
+    assert sum(got[0].values()) == (subset['case'].to_numpy()[1:] == subset['case'].to_numpy()[:-1]).sum()
+
+def test_bottlenecks_match_pandas(make_log):
+    log = make_log(seed=83)
+    df = _frame(log)
+    cases = np.random.default_rng(83).random(log['case'].max() + 1) < 0.5
+    for mask in (None, cases):
+        rows = log if mask is None else log[mask[log['case']]]
+        hours = (rows.groupby('case')['ts'].shift(-1) - rows['ts']) / 1e9 / 3600
+        grouped = rows.assign(hours=hours).groupby('act')
+        expected = pd.DataFrame({
+            'frequency': grouped.size(),
+            'avg_duration_hours': grouped['hours'].mean().round(2),
+            'median_duration_hours': grouped['hours'].median().round(2),
+            'max_duration_hours': grouped['hours'].max().round(2),
+            'total_duration_hours': grouped['hours'].sum().round(2),
+            'total_value_eur': grouped['value'].sum().round(2),
+        }).fillna(0)
+        expected.index = [ACTIVITIES[a] for a in expected.index]
+
+        bottlenecks = process_mining.detect_bottlenecks(None, df, cases=mask)
+        got = pd.DataFrame(bottlenecks).set_index('activity')
+        assert np.allclose(got.loc[expected.index, expected.columns], expected)
+        scores = [b['bottleneck_score'] for b in bottlenecks]
+        assert scores == sorted(scores, reverse=True)
+        top = expected['avg_duration_hours'].max(), expected['frequency'].max()
+        assert np.allclose(got.loc[expected.index, 'bottleneck_score'],
+                           (0.6 * expected['avg_duration_hours'] / top[0]
+                            + 0.4 * expected['frequency'] / top[1]).round(3))
+
+def _model(log):
+    """Petri net discovered from the variants of a log."""
+    tree = process_mining.discover_tree_from_variants(process_mining.trace_variants(_frame(log)))
+    return process_mining.pm4py.convert_to_petri_net(tree)
+
+def test_sharded_replay_matches_serial(make_log):
+    # A model of a few cases, so replaying the others gives a spread of fitness values
+    net = _model(make_log(seed=84, n_cases=6))
+    sequences = list(process_mining.trace_variants(_frame(make_log(seed=85))))
+    serial = process_mining.replay_fitness(sequences, *net)
+    assert len(set(serial)) > 1
+    assert process_mining.replay_fitness(sequences, *net, workers=2) == serial
+
+    df = _frame(make_log(seed=86))
+    for mode in ('variants', 'traces'):
+        conformance = process_mining.check_conformance(None, df, mode=mode)
+        assert 'error' not in conformance and conformance['total_traces'] == df['case:concept:name'].nunique()
+        assert process_mining.check_conformance(None, df, mode=mode, workers=2) == conformance
+
+def test_sampled_fitness_stops_at_the_tolerance(make_log, monkeypatch):
+    net = _model(make_log(seed=87, n_cases=6))
+    variants, case_variants = process_mining.trace_variants(_frame(make_log(seed=88, n_cases=400)),
+                                                            return_cases=True)
+    sequences = list(variants)
+    exact = np.array(process_mining.replay_fitness(sequences, *net))[case_variants]
+
+    replayed = []
+    replay = process_mining.replay_fitness
+    monkeypatch.setattr(process_mining, 'replay_fitness',
+                        lambda seqs, *args: replayed.extend(seqs) or replay(seqs, *args))
+    monkeypatch.setattr(process_mining, 'SAMPLE_BATCH', 20)
+    sample, half_width = process_mining.sampled_fitness(variants, case_variants, *net,
+                                                        tolerance=0.05, seed=0)
+    assert 20 <= len(sample) < len(case_variants)
+    assert half_width <= 0.05
+    assert len(replayed) == len(set(replayed))
+    # The sample is the exact fitness of the drawn cases
+    order = np.random.default_rng(0).permutation(len(case_variants))
+    assert np.array_equal(sample, exact[order[:len(sample)]])
+    assert abs(sample.mean() - exact.mean()) <= 2 * half_width
+
+def test_sampled_conformance_of_a_small_log_is_exact(make_log):
+    df = _frame(make_log(seed=89))
+    exact = process_mining.check_conformance(None, df, mode='variants')
+    sampled = process_mining.check_conformance(None, df, mode='sampled')
+    assert sampled['sampled'] and sampled['confidence'] == 0.95
+    assert sampled['sample_size'] == sampled['population_traces'] == exact['total_traces']
+    assert sampled['error_bound'] == 0
+    for key in ('fitness', 'fully_fitting_traces', 'partially_fitting_traces', 'non_fitting_traces'):
+        assert sampled[key] == exact[key]
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from process_timeseries import WindowedSeries, series_time_range, window_bounds
+
+ACTIVITIES = ['Approve', 'Create', 'Invoice', 'Pay', 'Receive']
+
+def _window_starts(ts, window):
+    """Calendar window start of each epoch-ns timestamp, the pandas way."""
+    stamps = pd.Series(pd.to_datetime(ts))
+    if window == 'day':
+        return stamps.dt.floor('D')
+    return stamps.dt.to_period('W-SUN' if window == 'week' else 'M').dt.start_time
+
+def _mine(chunks, bounds, window):
+    series = WindowedSeries(ACTIVITIES, bounds, window)
+    for chunk in chunks:
+        series.update(chunk['case'], chunk['act'], chunk['ts'])
+    return series
+
+@pytest.mark.parametrize('window', ['day', 'week', 'month'])
+def test_window_bounds_match_resample(make_log, window):
+    ts = make_log(seed=50)['ts'].to_numpy()
+    bounds = window_bounds(ts.min(), ts.max(), window)
+    resampled = pd.Series(1, index=pd.to_datetime(ts)).resample(
+        'W-MON' if window == 'week' else 'MS' if window == 'month' else 'D',
+        label='left', closed='left').size()
+    assert np.array_equal(pd.to_datetime(bounds[:-1]), resampled.index)
+    assert bounds[0] <= ts.min() and ts.max() < bounds[-1]
+    inner = pd.Series(pd.to_datetime(bounds[1:-1]))
+    assert (_window_starts(bounds[1:-1], window) == inner).all()
+
+@pytest.mark.parametrize('window', ['week', 'month'])
+def test_series_matches_groupby(make_log, chunk_log, window):
+    log = make_log(seed=51)
+    series = _mine(chunk_log(log, 4), window_bounds(log['ts'].min(), log['ts'].max(), window), window)
+    starts = pd.to_datetime(series.bounds[:-1])
+    log = log.assign(win=pd.Index(starts).get_indexer(_window_starts(log['ts'], window)))
+    assert (log['win'] >= 0).all()
+
+    events = log.groupby(['win', 'act']).size()
+    assert np.array_equal(series.act_events[events.index.get_level_values(0), events.index.get_level_values(1)],
+                          events.to_numpy())
+    assert series.act_events.sum() == len(log)
+
+    nxt = log.groupby('case').shift(-1)
+    pairs = log[nxt['act'].notna()].assign(dst=nxt['act'].dropna().astype(int),
+                                           sec=(nxt['ts'] - log['ts']).dropna() / 1e9)
+    durations = pairs.groupby(['win', 'act'])['sec'].agg(['size', 'sum'])
+    for (w, a), row in durations.iterrows():
+        assert series.act_dur_n[w, a] == row['size'] and np.isclose(series.act_dur_sum[w, a], row['sum'])
+    edges = pairs.groupby(['win', 'act', 'dst']).size()
+    for (w, s, d), n in edges.items():
+        assert series.edge_count[w, s * len(ACTIVITIES) + d] == n
+    assert series.edge_count.sum() == len(pairs)
+
+    # A case completes in the window of its last event
+    cases = log.groupby('case').agg(win=('win', 'last'), first=('ts', 'first'), last=('ts', 'last'))
+    ends = cases.groupby('win').size()
+    assert np.array_equal(series.case_ends[ends.index], ends.to_numpy())
+    assert np.allclose(series.case_dur_sum[ends.index],
+                       ((cases['last'] - cases['first']) / 1e9).groupby(cases['win']).sum())
+
+def test_outliers_clamp_into_edge_windows(make_log, chunk_log):
+    log = make_log(seed=52, n_cases=300)
+    # A mistyped year at the start of one case and the end of another
+    first = log.groupby('case').head(1).index
+    last = log.groupby('case').tail(1).index
+    ts = log['ts'].to_numpy().copy()
+    ts[first[0]] = pd.Timestamp('1948-02-03').value
+    ts[last[-1]] = pd.Timestamp('2031-05-06').value
+    log = log.assign(ts=ts)
+
+    start, end = series_time_range(log['ts'], trim=0.01)
+    assert (start, end) == (int(np.quantile(ts, 0.01, method='lower')),
+                            int(np.quantile(ts, 0.99, method='higher')))
+    assert series_time_range(log['ts'].iloc[:50], trim=0.01) == (ts[:50].min(), ts[:50].max())
+    series = _mine(chunk_log(log, 3), window_bounds(start, end, 'month'), 'month')
+    assert series.bounds[0] <= start and end < series.bounds[-1]
+    assert pd.Timestamp(int(series.bounds[0])).year == 2018 and series.n_windows < 24
+
+    # Clamped: every event counts, the outliers in the first and last window
+    starts = pd.to_datetime(series.bounds[:-1])
+    win = np.clip(np.searchsorted(starts, _window_starts(log['ts'], 'month'), side='right') - 1,
+                  0, series.n_windows - 1)
+    events = pd.Series(1, index=[win, log['act']]).groupby(level=[0, 1]).size()
+    assert series.act_events.sum() == len(log)
+    assert np.array_equal(series.act_events[events.index.get_level_values(0),
+                                            events.index.get_level_values(1)], events.to_numpy())
+    assert series.window_of(ts[[first[0], last[-1]]]).tolist() == [0, series.n_windows - 1]
+
+def test_events_without_activity_match_all_time_report(make_log, chunk_log):
+    from native_mining import activity_arrays, dfg_arrays
+
+    log = make_log(seed=53)
+    act = log['act'].to_numpy().copy()
+    act[np.random.default_rng(53).random(len(act)) < 0.1] = -1
+    log = log.assign(act=act)
+    series = _mine(chunk_log(log, 3), window_bounds(log['ts'].min(), log['ts'].max(), 'month'), 'month')
+
+    # Summed over the windows: the all-time DFG and activity statistics
+    dfg_freq = dfg_arrays(ACTIVITIES, log['act'], log['case'], log['ts'])[0]
+    n_act = len(ACTIVITIES)
+    edges = series.edge_count.sum(axis=0)
+    assert {(ACTIVITIES[k // n_act], ACTIVITIES[k % n_act]): int(edges[k])
+            for k in np.flatnonzero(edges)} == dfg_freq
+    stats = activity_arrays(ACTIVITIES, log['act'], log['case'], log['ts'])
+    events = series.act_events.sum(axis=0)
+    assert [ACTIVITIES[a] for a in np.flatnonzero(events)] == stats['activity'].tolist()
+    assert events[events > 0].tolist() == stats['frequency'].tolist()
+    assert np.allclose(series.act_dur_sum.sum(axis=0)[events > 0] / 3600,
+                       stats['total_duration_hours'], atol=0.01)
+    assert series.case_ends.sum() == log['case'].nunique()
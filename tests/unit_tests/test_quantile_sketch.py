@@ -0,0 +1,93 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from quantile_sketch import ALPHA, QuantileSketch, group_quantiles
+
+QS = [0.0, 0.1, 0.5, 0.9, 0.99, 1.0]
+
+def _durations(n, distinct, seed=0):
+    # Whole seconds, like the SAP log, so sums are exact in any merge order
+    rng = np.random.default_rng(seed)
+    return rng.choice(rng.integers(0, 10**7, distinct), n).astype(float)
+
+def _state(sketch):
+    state = sketch.to_dict()
+    state["exact"] = sorted(state["exact"])
+    state["buckets"] = sorted(state["buckets"]) if state["buckets"] is not None else None
+    return state
+
+def test_exact_mode_matches_numpy():
+    values = _durations(5000, 300)
+    sketch = QuantileSketch(max_exact=300).add(values)
+    assert sketch.buckets is None
+    assert np.allclose(sketch.quantiles(QS), np.quantile(values, QS), rtol=1e-12)
+    assert sketch.quantile(0.5) == np.median(values)
+    assert (sketch.count, sketch.sum, sketch.min, sketch.max) == (
+        len(values), values.sum(), values.min(), values.max())
+
+def test_collapses_past_max_exact():
+    values = _durations(5000, 301)
+    distinct = np.unique(values)
+    assert len(distinct) == 301
+    first = values[values != distinct[-1]]
+    sketch = QuantileSketch(max_exact=300).add(first)
+    assert sketch.buckets is None
+    sketch.add(values[values == distinct[-1]])
+    assert sketch.buckets is not None and not sketch.exact
+    # Same state however the values were chunked
+    assert _state(sketch) == _state(QuantileSketch(max_exact=300).add(values))
+
+def test_bucket_mode_relative_error():
+    values = np.concatenate([_durations(20000, 5000, seed=1), np.zeros(50)])
+    sketch = QuantileSketch().add(values)
+    assert sketch.buckets is not None
+    for q in QS:
+        # Order statistic at rank floor(q * (n - 1))
+        truth = np.quantile(values, q, method='lower')
+        assert abs(sketch.quantile(q) - truth) <= ALPHA * truth + 1e-9, q
+
+def test_merge_is_associative_and_matches_one_sketch():
+    parts = [_durations(3000, d, seed=s) for s, d in enumerate((200, 900, 40))]
+
+    def sketch(values):
+        return QuantileSketch().add(values)
+
+    left = sketch(parts[0]).merge(sketch(parts[1])).merge(sketch(parts[2]))
+    right = sketch(parts[0]).merge(sketch(parts[1]).merge(sketch(parts[2])))
+    whole = sketch(np.concatenate(parts))
+    assert _state(left) == _state(right) == _state(whole)
+    assert left.quantiles(QS) == whole.quantiles(QS)
+
+def test_merge_keeps_exact_while_small():
+    a, b = _durations(100, 20, seed=3), _durations(100, 20, seed=4)
+    merged = QuantileSketch().add(a).merge(QuantileSketch().add(b))
+    assert merged.buckets is None
+    assert np.allclose(merged.quantiles(QS), np.quantile(np.concatenate([a, b]), QS), rtol=1e-12)
+    assert np.isnan(QuantileSketch().merge(QuantileSketch()).quantile(0.5))
+
+def test_dict_round_trip():
+    for distinct in (50, 5000):
+        sketch = QuantileSketch().add(_durations(8000, distinct, seed=distinct))
+        restored = QuantileSketch.from_dict(json.loads(json.dumps(sketch.to_dict())))
+        assert _state(restored) == _state(sketch)
+        assert restored.quantiles(QS) == sketch.quantiles(QS)
+        # A restored sketch keeps folding like the original
+        more = _durations(1000, 100, seed=7)
+        assert _state(restored.add(more)) == _state(sketch.add(more))
+
+def test_group_quantiles_match_pandas():
+    rng = np.random.default_rng(5)
+    groups = rng.integers(0, 6, 4000)
+    values = rng.integers(0, 500, 4000).astype(float)
+    values[rng.random(4000) < 0.05] = np.nan
+    groups[groups == 4] = 5  # group 4 has no values
+
+    out = group_quantiles(values, groups, 7, qs=(0.5, 0.9))
+    expected = pd.Series(values).groupby(groups).quantile([0.5, 0.9]).unstack()
+    for g in range(7):
+        if g in expected.index:
+            assert np.allclose(out[g], expected.loc[g].to_numpy(), rtol=1e-12)
+        else:
+            assert np.isnan(out[g]).all()
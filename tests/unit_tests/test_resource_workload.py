@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+from resource_workload import IntervalRuns, ResourceWorkload
+
+RESOURCES = ['ann', 'bob', 'cid', 'dee']
+DAY_NS = 86400 * 10**9
+
+def _intervals(log):
+    """Work items of a case-sorted log: each event opens at its case's previous event."""
+    start = log.groupby('case')['ts'].shift(1).fillna(log['ts']).astype(np.int64)
+    items = pd.DataFrame({'res': log['res'], 'start': start, 'end': log['ts']})
+    return items[items['res'] >= 0]
+
+def _brute_force(items):
+    """Busy seconds and peak concurrency per resource, segment by segment between interval endpoints."""
+    busy, peak = np.zeros(len(RESOURCES)), np.zeros(len(RESOURCES), dtype=np.int64)
+    for r, group in items[items['end'] > items['start']].groupby('res'):
+        points = np.unique(np.concatenate([group['start'], group['end']]))
+        lo, hi = points[:-1], points[1:]
+        covering = ((group['start'].to_numpy()[:, None] <= lo)
+                    & (group['end'].to_numpy()[:, None] >= hi)).sum(axis=0)
+        busy[r] = ((hi - lo) / 1e9)[covering > 0].sum()
+        peak[r] = covering.max()
+    return busy, peak
+
+def _mine(chunks, **kwargs):
+    workload = ResourceWorkload(RESOURCES, bucket_ns=DAY_NS, **kwargs)
+    for chunk in chunks:
+        workload.update(chunk['case'], chunk['res'], chunk['ts'])
+    return workload
+
+def test_metrics_match_brute_force(make_log, chunk_log, monkeypatch):
+    log = make_log(seed=20)
+    items = _intervals(log)
+    # Small sweep blocks, so open items are carried across block boundaries
+    monkeypatch.setattr(IntervalRuns.blocks, '__defaults__', (7,))
+    workload = _mine(chunk_log(log, 5))
+    assert len(list(workload.runs.blocks())) > 10
+    m = workload.metrics()
+
+    busy, peak = _brute_force(items)
+    assert np.allclose(m['busy_seconds'], busy)
+    assert np.array_equal(m['peak_concurrency'], peak)
+    span = items.groupby('res').agg(first=('start', 'min'), last=('end', 'max'))
+    active = np.zeros(len(RESOURCES))
+    active[span.index] = (span['last'] - span['first']) / 1e9
+    assert np.allclose(m['active_seconds'], active)
+
+    # Workload matrix: item-seconds per (resource, day), by splitting every item into days
+    cells = {}
+    for r, start, end in items.itertuples(index=False):
+        for day in range(start // DAY_NS, -(-end // DAY_NS)):
+            seconds = (min(end, (day + 1) * DAY_NS) - max(start, day * DAY_NS)) / 1e9
+            if seconds > 0:
+                cells[r, day * DAY_NS] = cells.get((r, day * DAY_NS), 0) + seconds
+    res, bucket, seconds = workload.workload_matrix()
+    assert sorted(cells) == list(zip(res.tolist(), bucket.tolist()))
+    assert np.allclose(seconds, [cells[key] for key in zip(res.tolist(), bucket.tolist())])
+
+def test_spilled_shards_merge_and_reload(make_log, chunk_log, tmp_path):
+    log = make_log(seed=21)
+    whole = _mine(chunk_log(log, 1))
+    shard = log['case'] % 3
+    parts = [_mine(chunk_log(log[shard == s], 2), spill_dir=str(tmp_path / f'shard_{s}'))
+             for s in range(3)]
+    merged = parts[1].merge(parts[0]).merge(parts[2])
+    assert not parts[0].runs.paths and len(merged.runs) == len(whole.runs)
+
+    # The runs stay in the spill directory and are picked up by a new workload
+    reloaded = ResourceWorkload(RESOURCES, bucket_ns=DAY_NS, spill_dir=str(tmp_path / 'shard_1'))
+    reloaded.active_start, reloaded.active_end = merged.active_start, merged.active_end
+    reloaded.cells = merged.cells
+    for workload in (merged, reloaded):
+        pd.testing.assert_frame_equal(workload.resource_frame(), whole.resource_frame())
+        for got, expected in zip(workload.workload_matrix(), whole.workload_matrix()):
+            assert np.allclose(got, expected)
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rework import ACTIVITY_ARRAYS, CASE_ARRAYS, ReworkStats
+
+ACTIVITIES = ['Approve', 'Change Price', 'Create', 'Receive']
+CASES = [f'case_{c:03d}' for c in range(80)]
+
+def _fold(chunks, **kwargs):
+    rework = ReworkStats(ACTIVITIES, CASES)
+    for chunk in chunks:
+        rework.update(chunk['case'], chunk['act'], chunk['ts'], **kwargs)
+    return rework
+
+def _union_seconds(intervals):
+    covered, end = 0, None
+    for lo, hi in sorted(intervals):
+        if end is None or lo > end:
+            covered += hi - lo
+            end = hi
+        elif hi > end:
+            covered += hi - end
+            end = hi
+    return covered / 1e9
+
+def _brute_force(log):
+    """Per-activity and per-case rework by walking every case."""
+    n_act = len(ACTIVITIES)
+    out = {name: np.zeros(n_act) for name in ACTIVITY_ARRAYS}
+    out['case_lost_seconds'] = np.zeros(len(CASES))
+    out['case_repeats'] = np.zeros(len(CASES))
+    for c, events in log.groupby('case'):
+        acts, ts = events['act'].tolist(), events['ts'].tolist()
+        last_seen, reworked, loops = {}, set(), []
+        for i, a in enumerate(acts):
+            if a < 0:
+                continue
+            out['events'][a] += 1
+            if a in last_seen:
+                j = last_seen[a]
+                out['repeats'][a] += 1
+                out['self_loops'][a] += i - j == 1
+                out['loop_len_sum'][a] += i - j
+                out['loop_len_max'][a] = max(out['loop_len_max'][a], i - j)
+                out['lost_seconds'][a] += (ts[i] - ts[j]) / 1e9
+                reworked.add(a)
+                loops.append((ts[j], ts[i]))
+            last_seen[a] = i
+        for a in reworked:
+            out['reworked_cases'][a] += 1
+        out['case_repeats'][c] = len(loops)
+        out['case_lost_seconds'][c] = _union_seconds(loops)
+    return out
+
+def _assert_state(rework, expected):
+    for name in ACTIVITY_ARRAYS + CASE_ARRAYS:
+        assert np.allclose(getattr(rework, name), expected[name]), name
+
+def test_matches_brute_force(make_log, chunk_log):
+    log = make_log(seed=5, n_cases=80, n_act=4, max_len=12)
+    expected = _brute_force(log)
+    rework = _fold(chunk_log(log, 3))
+    _assert_state(rework, expected)
+
+    report = rework.report(top_cases=5)
+    assert report['summary']['repeat_events'] == expected['repeats'].sum()
+    assert report['summary']['cases_with_rework'] == (expected['case_repeats'] > 0).sum()
+    hours = expected['case_lost_seconds'] / 3600
+    assert [row['case'] for row in report['top_cases']] == \
+        [CASES[c] for c in pd.Series(hours[expected['case_repeats'] > 0],
+                                     index=np.flatnonzero(expected['case_repeats'])
+                                     ).sort_values(ascending=False, kind='stable').index[:5]]
+    assert [row['activity'] for row in report['activities']] == \
+        [ACTIVITIES[a] for a in pd.Series(np.round(expected['lost_seconds'] / 3600, 2))
+         .sort_values(ascending=False, kind='stable').index if expected['events'][a]]
+
+def test_events_without_activity_are_not_rework(make_log, chunk_log):
+    log = make_log(seed=8, n_cases=80, n_act=4, max_len=12)
+    act = log['act'].to_numpy().copy()
+    act[np.random.default_rng(8).random(len(act)) < 0.15] = -1
+    log = log.assign(act=act)
+    _assert_state(_fold(chunk_log(log, 3)), _brute_force(log))
+
+def test_shards_and_new_events(make_log, chunk_log):
+    log = make_log(seed=6, n_cases=80, n_act=4, max_len=12)
+    expected = _brute_force(log)
+
+    shard = log['case'] % 2
+    merged = _fold(chunk_log(log[shard == 0], 2)).merge(_fold(chunk_log(log[shard == 1], 3)))
+    _assert_state(merged, expected)
+
+    # Incremental: whole cases re-read, only events after the watermark are new
+    watermark = np.quantile(log['ts'], 0.6)
+    rework = _fold(chunk_log(log[log['ts'] <= watermark], 2))
+    touched = log[log['case'].isin(log.loc[log['ts'] > watermark, 'case'])]
+    for chunk in chunk_log(touched, 2):
+        rework.update(chunk['case'], chunk['act'], chunk['ts'], new=chunk['ts'] > watermark)
+    _assert_state(rework, expected)
+
+def test_remap(make_log, chunk_log):
+    log = make_log(seed=7, n_cases=80, n_act=4, max_len=12)
+    rework = _fold(chunk_log(log, 2))
+    remapped = rework.remap(sorted(ACTIVITIES + ['Block']), sorted(CASES + ['case_0005']))
+    assert remapped.report() == rework.report()
+    with pytest.raises(ValueError):
+        rework.remap(ACTIVITIES, CASES[1:])
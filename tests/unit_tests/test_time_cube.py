@@ -0,0 +1,89 @@
+import pandas as pd
+import pytest
+
+from time_cube import DayCube, query_range
+
+ACTIVITIES = ['Approve', 'Create', 'Invoice', 'Pay', 'Receive']
+
+def _cube(log, chunk_log, n_chunks=4):
+    cube = DayCube(ACTIVITIES)
+    for chunk in chunk_log(log, n_chunks):
+        cube.update(chunk['case'], chunk['act'], chunk['ts'])
+    return cube.to_arrays()
+
+def _utc_day(value, default):
+    """First UTC day starting at or after a date bound (naive = UTC)."""
+    if value is None:
+        return default
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert('UTC').tz_localize(None)
+    return ts.ceil('D')
+
+def _expected(log, start, end):
+    """Edges and per-activity stats of the events whose UTC day lies in [start, end)."""
+    day = pd.to_datetime(log['ts']).dt.floor('D')
+    nxt = log.groupby('case').shift(-1)
+    pairs = log.assign(dst=nxt['act'], sec=(nxt['ts'] - log['ts']) / 1e9)
+    pairs = pairs[(day >= start) & (day < end)]
+    edges = pairs.dropna(subset=['dst']).astype({'dst': int}).groupby(['act', 'dst'])['sec'].agg(['size', 'mean'])
+    stats = pairs.groupby('act').agg(frequency=('ts', 'size'), avg=('sec', 'mean'))
+    return ({(ACTIVITIES[s], ACTIVITIES[d]): (n, round(mean / 3600, 2))
+             for (s, d), (n, mean) in edges.iterrows()},
+            {ACTIVITIES[a]: (row['frequency'], round(row['avg'] / 3600, 2) if pd.notna(row['avg']) else 0)
+             for a, row in stats.iterrows()})
+
+def _got(result):
+    return ({(e['source'], e['target']): (e['frequency'], e['avg_duration_hours']) for e in result['edges']},
+            {b['activity']: (b['frequency'], b['avg_duration_hours']) for b in result['bottlenecks']})
+
+def test_ranges_match_groupby(make_log, chunk_log):
+    log = make_log(seed=60)
+    cube = _cube(log, chunk_log)
+    days = pd.to_datetime(log['ts']).dt.floor('D')
+    first, last = days.min(), days.max()
+    ranges = [(None, None), ('2018-03-01', '2018-07-15'), ('2018-05-10', None), (None, '2018-02-01'),
+              (first, last), (first, last + pd.Timedelta(days=1)),
+              (pd.Timestamp('2018-04-01 02:00', tz='Europe/Berlin'), '2018-06-01')]
+    for start, end in ranges:
+        lo = _utc_day(start, first)
+        hi = _utc_day(end, last + pd.Timedelta(days=1))
+        assert _got(query_range(cube, start, end)) == _expected(log, lo, hi), (start, end)
+
+    # The full range reproduces the all-time numbers
+    result = query_range(cube)
+    assert result['active_days'] == days.nunique()
+    assert sum(b['frequency'] for b in result['bottlenecks']) == len(log)
+
+def test_end_is_exclusive(make_log, chunk_log):
+    log = make_log(seed=61)
+    cube = _cube(log, chunk_log)
+    days = pd.to_datetime(log['ts']).dt.floor('D')
+    busiest = days.value_counts().idxmax()
+    one_day = query_range(cube, busiest, busiest + pd.Timedelta(days=1))
+    assert one_day['active_days'] == 1
+    assert sum(b['frequency'] for b in one_day['bottlenecks']) == (days == busiest).sum()
+    before = query_range(cube, None, busiest)
+    assert sum(b['frequency'] for b in before['bottlenecks']) == (days < busiest).sum()
+    empty = query_range(cube, busiest, busiest)
+    assert empty['active_days'] == 0 and empty['edges'] == [] and empty['bottlenecks'] == []
+
+def test_invalid_dates_raise_value_error(make_log, chunk_log):
+    cube = _cube(make_log(seed=62), chunk_log, 1)
+    for start, end in (('not a date', None), (None, '2018-13-45'), ('2018-06-01', '2018-05-01')):
+        with pytest.raises(ValueError):
+            query_range(cube, start, end)
+
+def test_full_range_matches_all_time_report_with_missing_activities(make_log, chunk_log):
+    from native_mining import activity_arrays, dfg_arrays, dfg_report
+
+    log = make_log(seed=63)
+    log = log.assign(act=log['act'].where(log.index % 9 != 4, -1))
+    result = query_range(_cube(log, chunk_log))
+
+    dfg_data = dfg_report(*dfg_arrays(ACTIVITIES, log['act'], log['case'], log['ts']))
+    assert sorted(_got(result)[0].items()) == sorted(
+        ((e['source'], e['target']), (e['frequency'], e['avg_duration_hours'])) for e in dfg_data['edges'])
+    stats = activity_arrays(ACTIVITIES, log['act'], log['case'], log['ts'])
+    assert _got(result)[1] == {row.activity: (row.frequency, row.avg_duration_hours)
+                               for row in stats.itertuples()}
@@ -0,0 +1,101 @@
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from variant_trie import VariantTrie, load_variants, save_variants
+
+ACTIVITIES = ['Create', 'Approve', 'Pay']
+
+def _traces(seed=4, n_cases=300):
+    """Random traces of 1-5 steps over three activities (many repeated variants) and case hours."""
+    rng = np.random.default_rng(seed)
+    traces = pd.Series([tuple(ACTIVITIES[a] for a in rng.integers(0, 3, rng.integers(1, 6)))
+                        for _ in range(n_cases)])
+    hours = pd.Series(rng.integers(0, 2000, n_cases) / 4)
+    return traces, hours
+
+def _trie(traces, hours):
+    # Variant numbers in order of first occurrence, like MiningAggregates.variants()
+    numbers = {seq: v for v, seq in enumerate(dict.fromkeys(traces))}
+    variants = Counter({seq: 0 for seq in numbers})
+    variants.update(traces.tolist())
+    return VariantTrie.from_variants(ACTIVITIES, variants, traces.map(numbers).to_numpy(),
+                                     hours.to_numpy())
+
+def _expected_rows(traces, hours, prefix=()):
+    """Variant rows starting with prefix, by descending count, ties by first occurrence."""
+    frame = pd.DataFrame({'seq': traces, 'hours': hours})
+    frame = frame[frame['seq'].map(lambda s: s[:len(prefix)] == tuple(prefix))]
+    stats = frame.groupby('seq', sort=False)['hours']
+    rows = pd.DataFrame({'count': stats.size(), 'mean': stats.mean(), 'p50': stats.quantile(0.5),
+                         'p90': stats.quantile(0.9), 'min': stats.min(), 'max': stats.max()})
+    return rows.sort_values('count', ascending=False, kind='stable')
+
+def test_variant_table_matches_pandas():
+    traces, hours = _traces()
+    trie = _trie(traces, hours)
+    expected = _expected_rows(traces, hours)
+    assert trie.n_variants == len(expected)
+
+    rows = trie.top_paths(k=len(expected))
+    assert [tuple(r['activities']) for r in rows] == list(expected.index)
+    for row, (_, want) in zip(rows, expected.iterrows()):
+        assert row['count'] == want['count']
+        assert row['share'] == round(want['count'] / len(traces), 4)
+        for key, col in (('duration_mean_hours', 'mean'), ('duration_p50_hours', 'p50'),
+                         ('duration_p90_hours', 'p90'), ('duration_min_hours', 'min'),
+                         ('duration_max_hours', 'max')):
+            assert abs(row[key] - want[col]) <= 0.005 + 1e-9, key  # rounded to 2 places
+    assert trie.top_paths(1)[0]['activities'] == list(expected.index[0])
+
+def test_prefix_queries_match_brute_force():
+    traces, hours = _traces()
+    trie = _trie(traces, hours)
+    prefixes = {seq[:n] for seq in traces for n in range(len(seq) + 1)}
+    for prefix in prefixes:
+        # Subtree range of the prefix node = exactly the variants with that prefix
+        expected = _expected_rows(traces, hours, prefix)
+        assert [tuple(r['activities']) for r in trie.top_paths(len(expected) + 5, prefix)] == \
+            list(expected.index)
+        assert [tuple(r['activities']) for r in trie.top_paths(2, prefix)] == list(expected.index[:2])
+
+        passing = [s for s in traces if s[:len(prefix)] == prefix]
+        follows = Counter(s[len(prefix)] for s in passing if len(s) > len(prefix))
+        result = trie.next_activities(list(prefix))
+        assert result['cases'] == len(passing)
+        assert result['end']['count'] == sum(len(s) == len(prefix) for s in passing)
+        assert {n['activity']: n['count'] for n in result['next']} == dict(follows)
+        counts = [n['count'] for n in result['next']]
+        assert counts == sorted(counts, reverse=True)
+        assert all(n['probability'] == round(n['count'] / len(passing), 4) for n in result['next'])
+
+    unseen = ['Pay', 'Pay', 'Pay', 'Pay', 'Pay', 'Pay']
+    assert trie.find(unseen) is None and trie.next_activities(unseen) is None
+    assert trie.top_paths(3, unseen) == [] and trie.find(['Unknown']) is None
+
+def test_preorder_layout():
+    traces, hours = _traces()
+    a = _trie(traces, hours).arrays
+    n_nodes = len(a['node_act'])
+    assert a['node_count'][0] == len(traces)
+    for node in range(1, n_nodes):
+        parent = a['node_parent'][node]
+        # Parents come first and their subtree range holds the child's
+        assert parent < node < parent + a['node_size'][parent]
+        assert node + a['node_size'][node] <= parent + a['node_size'][parent]
+    # A node's cases either end there or pass on to a child
+    for node in range(n_nodes):
+        kids = a['child_nodes'][a['child_offsets'][node]:a['child_offsets'][node + 1]]
+        assert a['node_count'][node] == a['node_end'][node] + a['node_count'][kids].sum()
+        assert np.all(np.diff(a['node_count'][kids]) <= 0)
+
+def test_save_and_load(tmp_path):
+    traces, hours = _traces()
+    trie = _trie(traces, hours)
+    path = str(tmp_path / 'variants.npz')
+    save_variants(trie, path)
+    loaded = load_variants(path)
+    assert loaded.top_paths(5) == trie.top_paths(5)
+    assert loaded.next_activities(['Create']) == trie.next_activities(['Create'])
+    assert load_variants(str(tmp_path / 'missing.npz')) is None
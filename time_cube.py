@@ -0,0 +1,221 @@
+"""
+Prefix-Sum Time Cube — DFG and bottleneck statistics for any date range.
+
+Per UTC day the cube holds per-edge directly-follows counts and duration
+sums and per-activity event counts and duration counts/sums, stored as
+running totals over the days that have events. The statistics of any
+[start, end) range are then two row lookups and a subtraction, instead of
+re-mining the log:
+
+    counts(start, end) = cum[day_index(end)] - cum[day_index(start)]
+
+Days are whole UTC days: an event belongs to the range when its day starts
+in [start, end). As in process_timeseries, an event's duration and outgoing
+edge count on the day of the event itself. Durations are whole seconds in
+the SAP log, so the float64 running sums stay exact and a full-range query
+reproduces the all-time frequencies and mean durations.
+
+Output: process_cube.npz   (days, activities, edges, cumulative [day x column] arrays)
+
+Usage:
+  cube = DayCube(activities)
+  cube.update(case, act, ts)             # case-sorted chunks of whole cases
+  save_cube(cube)
+  result = query_range(load_cube(), '2018-07-01', '2018-10-01')
+  result['edges'], result['bottlenecks']
+"""
+
+import numpy as np
+import pandas as pd
+
+from process_timeseries import bottleneck_rows
+
+
+CUBE_FILE = 'process_cube.npz'
+
+NS_PER_DAY = 24 * 3600 * 10**9
+
+# Sums kept per day: activity events, activity durations, directly-follows edges
+CUBE_KINDS = ('act', 'dur', 'edge')
+
+
+def _sum_by_key(keys, weights):
+    """(unique keys, count per key, weight sum per key)."""
+    uniq, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    return uniq, counts, np.bincount(inverse, weights=weights, minlength=len(uniq))
+
+
+class DayCube:
+    """Per-day sums in sparse (day, cell) form while folding; cumulative arrays once built."""
+
+    def __init__(self, activities):
+        self.activities = list(activities)
+        # Partial sums per chunk: kind -> [(keys, counts, sums), ...]
+        self._parts = {kind: [] for kind in CUBE_KINDS}
+
+    @classmethod
+    def from_parts(cls, activities, parts):
+        """Cube holding reduced sums {kind: (keys, counts, sums)}, e.g. from parts()."""
+        cube = cls(activities)
+        for kind, part in parts.items():
+            cube._parts[kind].append(part)
+        return cube
+
+    def update(self, case, act, ts, new=None):
+        """
+        Fold a case-sorted chunk of whole cases (no NaT timestamps). new:
+        optional mask of events not folded in before; only they and the
+        edges into them are added.
+        """
+        n_act = len(self.activities)
+        act = np.asarray(act, dtype=np.int64)
+        ts = np.asarray(ts, dtype=np.int64)
+        case = np.asarray(case)
+        if new is None:
+            new = np.ones(len(act), dtype=bool)
+        day = ts // NS_PER_DAY
+        # Events without an activity (code -1) have no cell; durations need
+        # a known source activity, edges a known activity at both ends
+        known = act >= 0
+        counted = new & known
+
+        self._parts['act'].append(_sum_by_key(day[counted] * n_act + act[counted],
+                                              np.zeros(int(counted.sum()))))
+
+        pair = np.flatnonzero((case[1:] == case[:-1]) & new[1:] & known[:-1])
+        seconds = (ts[pair + 1] - ts[pair]) / 1e9
+        self._parts['dur'].append(_sum_by_key(day[pair] * n_act + act[pair], seconds))
+        linked = known[pair + 1]
+        pair, seconds = pair[linked], seconds[linked]
+        edge = (day[pair] * n_act + act[pair]) * n_act + act[pair + 1]
+        self._parts['edge'].append(_sum_by_key(edge, np.maximum(seconds, 0)))
+        return self
+
+    def merge(self, other):
+        """Fold in the sums of another set of cases over the same activities."""
+        for kind in self._parts:
+            self._parts[kind].extend(other._parts[kind])
+        return self
+
+    def remap(self, activities):
+        """The same sums keyed by the activity vocabulary of a rebuilt store."""
+        a = pd.Index(list(activities)).get_indexer(self.activities)
+        if (a < 0).any():
+            raise ValueError("event store vocabularies lost names since the cube state was saved")
+        n_old, n_new = len(self.activities), len(activities)
+        parts = {}
+        for kind, (keys, counts, sums) in self.parts().items():
+            if kind == 'edge':
+                day, src, dst = keys // (n_old * n_old), keys // n_old % n_old, keys % n_old
+                keys = (day * n_new + a[src]) * n_new + a[dst]
+            else:
+                keys = keys // n_old * n_new + a[keys % n_old]
+            parts[kind] = (keys, counts, sums)
+        return DayCube.from_parts(activities, parts)
+
+    def parts(self):
+        """Reduced sums per kind: {kind: (keys, counts, sums)}."""
+        return {kind: self._reduce(kind) for kind in self._parts}
+
+    def _reduce(self, kind):
+        parts = self._parts[kind]
+        if not parts:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty(0)
+        keys = np.concatenate([p[0] for p in parts])
+        uniq, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse, weights=np.concatenate([p[1] for p in parts]),
+                             minlength=len(uniq)).astype(np.int64)
+        sums = np.bincount(inverse, weights=np.concatenate([p[2] for p in parts]),
+                           minlength=len(uniq))
+        return uniq, counts, sums
+
+    def to_arrays(self):
+        """Days with events plus running totals (one leading zero row) per column."""
+        n_act = len(self.activities)
+        act_keys, act_n, _ = self._reduce('act')
+        dur_keys, dur_n, dur_sum = self._reduce('dur')
+        edge_keys, edge_n, edge_sum = self._reduce('edge')
+
+        days = np.unique(np.concatenate([act_keys // n_act, dur_keys // n_act,
+                                         edge_keys // (n_act * n_act)]))
+        edges, edge_col = np.unique(edge_keys % (n_act * n_act), return_inverse=True)
+
+        def cumulative(keys, values, n_cols, cols, per_day):
+            table = np.zeros((len(days) + 1, n_cols), dtype=values.dtype)
+            table[np.searchsorted(days, keys // per_day) + 1, cols] = values
+            return np.cumsum(table, axis=0)
+
+        return {
+            'days': days * NS_PER_DAY,
+            'activities': np.array(self.activities, dtype=str),
+            'edges': np.stack([edges // n_act, edges % n_act], axis=1).astype(np.int32),
+            'act_events': cumulative(act_keys, act_n, n_act, act_keys % n_act, n_act),
+            'act_dur_n': cumulative(dur_keys, dur_n, n_act, dur_keys % n_act, n_act),
+            'act_dur_sum': cumulative(dur_keys, dur_sum, n_act, dur_keys % n_act, n_act),
+            'edge_count': cumulative(edge_keys, edge_n, len(edges), edge_col, n_act * n_act),
+            'edge_dur_sum': cumulative(edge_keys, edge_sum, len(edges), edge_col, n_act * n_act),
+        }
+
+
+def save_cube(cube, path=CUBE_FILE):
+    arrays = cube.to_arrays()
+    np.savez_compressed(path, **arrays)
+    print(f"[OK] Saved '{path}' ({len(arrays['days'])} days x "
+          f"{len(arrays['activities'])} activities, {len(arrays['edges'])} edges)")
+
+
+def load_cube(path=CUBE_FILE):
+    """Arrays written by save_cube(), or None if there is no artifact."""
+    try:
+        with np.load(path) as data:
+            return {k: data[k] for k in data.files}
+    except FileNotFoundError:
+        return None
+
+
+def _to_ns(value, default):
+    if value is None:
+        return default
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert('UTC').tz_localize(None)
+    return ts.value
+
+
+def query_range(cube, start=None, end=None):
+    """
+    DFG edges and activity bottlenecks of events in [start, end) (dates,
+    timestamps or None for open ends), in the dfg_data.json / bottleneck
+    report shapes: edges sorted by frequency, activities by bottleneck score.
+    Raises ValueError for unparseable dates or end before start.
+    """
+    days = cube['days']
+    start_ns = _to_ns(start, days[0] if len(days) else 0)
+    end_ns = _to_ns(end, days[-1] + NS_PER_DAY if len(days) else 0)
+    if end_ns < start_ns:
+        raise ValueError(f"end {end} is before start {start}")
+    i, j = np.searchsorted(days, [start_ns, end_ns], side='left')
+
+    def window(name):
+        return cube[name][j] - cube[name][i]
+
+    names = [str(a) for a in cube['activities']]
+    edge_n, edge_sum = window('edge_count'), window('edge_dur_sum')
+    edges = [
+        {"source": names[s], "target": names[t], "frequency": int(edge_n[k]),
+         "avg_duration_hours": round(float(edge_sum[k] / edge_n[k]) / 3600, 2)}
+        for k, (s, t) in enumerate(cube['edges']) if edge_n[k] > 0
+    ]
+    edges.sort(key=lambda e: e["frequency"], reverse=True)
+
+    bottlenecks = bottleneck_rows(names, window('act_events'), window('act_dur_n'),
+                                  window('act_dur_sum'))
+
+    return {
+        "start": str(pd.Timestamp(int(start_ns))),
+        "end": str(pd.Timestamp(int(end_ns))),
+        "active_days": int(j - i),
+        "edges": edges,
+        "bottlenecks": bottlenecks,
+    }
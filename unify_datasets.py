@@ -2,10 +2,15 @@
 Unify SAP + Jira + Teams datasets into a single master CSV.
 Input:  sap_event_log.csv, synthetic_jira_data.csv, synthetic_teams_data.csv
 Output: unified_master.csv
+        process_ocel.store/   (object-centric store: events linked to PO items,
+                               Jira tickets and Teams threads, see object_store.py)
 """
 import pandas as pd
 import sys
 
+from event_store import read_event_log
+from object_store import build_object_store
+
 
 def unify():
     print("=" * 55)
@@ -14,7 +19,7 @@ def unify():
 
     # ─── 1. Load SAP ───────────────────────────────────────
     try:
-        sap = pd.read_csv('sap_event_log.csv')
+        sap = read_event_log('sap_event_log.csv')
         sap['Source'] = 'SAP'
         print(f"[OK] SAP events:   {len(sap):>8,} rows")
     except FileNotFoundError:
@@ -100,6 +105,14 @@ def unify():
         training.to_csv('training_data.csv', index=False)
         print(f"\n[OK] Training data: {len(training):,} rows -> 'training_data.csv'")
 
+    # ─── 9. Object-centric store ───────────────────────────
+    # Events reference every object they touch, so per-PO / per-ticket views
+    # and the object-centric DFG need no SAP_PO_ID joins on the stacked CSV
+    print()
+    ocel = build_object_store()
+    for object_type, dfg in ocel.oc_dfg().items():
+        print(f"   {object_type}: {dfg['objects']:,} objects, {len(dfg['edges'])} DFG edges")
+
 
 if __name__ == '__main__':
     unify()
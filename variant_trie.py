@@ -0,0 +1,235 @@
+"""
+Variant Table and Prefix Trie — activity-sequence variants with fast path queries.
+
+Variant table: one row per distinct activity sequence, numbered by case
+count (most frequent first, ties in order of first occurrence), with the
+sequence as activity codes in CSR form and case duration stats (mean,
+median, p90, min, max hours, first to last event).
+
+Prefix trie: one node per distinct sequence prefix, holding the number of
+cases that pass through it and that end there. Nodes are numbered in
+preorder with children by descending count, so
+  - the subtree of a node (all variants sharing its prefix) is the
+    contiguous node range [node, node + size), and the top-k paths with a
+    prefix are the first k variants whose end node falls in that range;
+  - the children of a node (what usually follows the prefix) are a CSR
+    slice, already sorted by frequency.
+
+Output: process_variants.npz   (variant table + trie node arrays)
+
+Usage:
+  trie = VariantTrie.from_variants(activities, variants, case_variants, case_hours)
+  save_variants(trie)
+  trie = load_variants()                                 # None if there is no artifact
+  trie.top_paths(5)                                      # happy path = top_paths(1)[0]
+  trie.next_activities(['Create Purchase Order Item'])   # what usually follows
+"""
+
+import numpy as np
+
+
+VARIANTS_FILE = 'process_variants.npz'
+
+# Case-duration quantiles of the variant table
+DURATION_QUANTILES = (0.5, 0.9)
+
+
+def _group_quantile(values, offsets, q):
+    """Linear-interpolated quantile q of every sorted group values[offsets[i]:offsets[i + 1]]."""
+    pos = offsets[:-1] + q * (np.diff(offsets) - 1)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.ceil(pos).astype(np.int64)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+
+class VariantTrie:
+    """Variant table and prefix trie over activity codes (see module docstring for the layout)."""
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.activities = [str(a) for a in arrays['activities']]
+        self.codes = {name: a for a, name in enumerate(self.activities)}
+
+    @classmethod
+    def from_variants(cls, activities, variants, case_variants, case_hours):
+        """
+        variants: Counter {(activity, ...): n_cases} in variant-number order
+        (trace_variants() / MiningAggregates.variants()); case_variants and
+        case_hours: variant number and duration of every non-empty case.
+        """
+        activities = list(activities)
+        codes = {name: a for a, name in enumerate(activities)}
+        sequences = [np.array([codes[a] for a in seq], dtype=np.int32) for seq in variants]
+        case_variants = np.asarray(case_variants, dtype=np.int64)
+        case_hours = np.asarray(case_hours, dtype=float)
+
+        # Variant ids by descending case count, stable on first occurrence
+        counts = np.bincount(case_variants, minlength=len(sequences))
+        order = np.argsort(-counts, kind='stable')
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        sequences = [sequences[v] for v in order]
+        counts = counts[order]
+
+        # Case duration stats per variant: durations sorted within variant groups
+        # (every variant has at least one case)
+        vid = rank[case_variants]
+        hours = case_hours[np.lexsort((case_hours, vid))]
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        stats = {'dur_mean_hours': np.bincount(vid, weights=case_hours,
+                                               minlength=len(counts)) / np.maximum(counts, 1)}
+        for q in DURATION_QUANTILES:
+            stats[f'dur_p{int(q * 100)}_hours'] = _group_quantile(hours, offsets, q)
+        stats['dur_min_hours'] = hours[offsets[:-1]]
+        stats['dur_max_hours'] = hours[offsets[1:] - 1]
+
+        # Trie: insert every variant, then renumber nodes in preorder
+        children, node_act, node_parent = [{}], [-1], [-1]
+        node_count, node_end = [0], [0]
+        end_node = np.empty(len(sequences), dtype=np.int64)
+        for v, seq in enumerate(sequences):
+            n = 0
+            node_count[0] += counts[v]
+            for a in seq.tolist():
+                child = children[n].get(a)
+                if child is None:
+                    child = children[n][a] = len(node_act)
+                    children.append({})
+                    node_act.append(a)
+                    node_parent.append(n)
+                    node_count.append(0)
+                    node_end.append(0)
+                n = child
+                node_count[n] += counts[v]
+            node_end[n] += counts[v]
+            end_node[v] = n
+
+        preorder, stack = [], [0]
+        while stack:
+            n = stack.pop()
+            preorder.append(n)
+            kids = sorted(children[n].values(), key=lambda k: node_count[k], reverse=True)
+            stack.extend(reversed(kids))
+        preorder = np.array(preorder, dtype=np.int64)
+        new_id = np.empty(len(preorder), dtype=np.int64)
+        new_id[preorder] = np.arange(len(preorder))
+
+        parent = np.array(node_parent, dtype=np.int64)[preorder]
+        parent = np.where(parent >= 0, new_id[np.maximum(parent, 0)], -1)
+        count = np.array(node_count, dtype=np.int64)[preorder]
+        size = np.ones(len(preorder), dtype=np.int64)
+        for n in range(len(preorder) - 1, 0, -1):
+            size[parent[n]] += size[n]
+        # Children CSR: preorder already lists siblings by descending count
+        child_nodes = np.lexsort((np.arange(1, len(parent)), parent[1:])) + 1
+        child_offsets = np.searchsorted(parent[child_nodes], np.arange(len(parent) + 1))
+
+        return cls({
+            'activities': np.array(activities, dtype=str),
+            'variant_count': counts.astype(np.int64),
+            'variant_offsets': np.concatenate([[0], np.cumsum([len(s) for s in sequences])]
+                                              ).astype(np.int64),
+            'variant_acts': (np.concatenate(sequences) if sequences
+                             else np.empty(0, dtype=np.int32)),
+            'variant_node': new_id[end_node],
+            **stats,
+            'node_act': np.array(node_act, dtype=np.int32)[preorder],
+            'node_parent': parent,
+            'node_count': count,
+            'node_end': np.array(node_end, dtype=np.int64)[preorder],
+            'node_size': size,
+            'child_offsets': child_offsets.astype(np.int64),
+            'child_nodes': child_nodes.astype(np.int64),
+        })
+
+    @property
+    def n_variants(self):
+        return len(self.arrays['variant_count'])
+
+    @property
+    def n_nodes(self):
+        return len(self.arrays['node_act'])
+
+    def sequence(self, variant):
+        """Activity names of a variant id."""
+        offsets = self.arrays['variant_offsets']
+        acts = self.arrays['variant_acts'][offsets[variant]:offsets[variant + 1]]
+        return [self.activities[a] for a in acts]
+
+    def children(self, node):
+        offsets = self.arrays['child_offsets']
+        return self.arrays['child_nodes'][offsets[node]:offsets[node + 1]]
+
+    def find(self, prefix):
+        """Trie node of an activity-name prefix, or None if no case starts with it."""
+        node = 0
+        for name in prefix:
+            code = self.codes.get(name)
+            kids = self.children(node)
+            match = kids[self.arrays['node_act'][kids] == code] if code is not None else kids[:0]
+            if not len(match):
+                return None
+            node = int(match[0])
+        return node
+
+    def variant_row(self, variant):
+        a = self.arrays
+        total = int(a['node_count'][0])
+        row = {
+            "variant_id": int(variant),
+            "activities": self.sequence(variant),
+            "count": int(a['variant_count'][variant]),
+            "share": round(float(a['variant_count'][variant]) / total, 4) if total else 0,
+        }
+        for name in ('dur_mean_hours', *(f'dur_p{int(q * 100)}_hours' for q in DURATION_QUANTILES),
+                     'dur_min_hours', 'dur_max_hours'):
+            value = float(a[name][variant])
+            row[name.replace('dur_', 'duration_')] = round(value, 2) if np.isfinite(value) else 0
+        return row
+
+    def top_paths(self, k=10, prefix=()):
+        """The k most frequent complete variants starting with prefix (table rows)."""
+        node = self.find(prefix)
+        if node is None:
+            return []
+        end = self.arrays['variant_node']
+        hit = np.flatnonzero((end >= node) & (end < node + self.arrays['node_size'][node]))
+        return [self.variant_row(v) for v in hit[:k]]
+
+    def next_activities(self, prefix, k=None):
+        """
+        What follows prefix: {"prefix", "cases", "end" {count, probability},
+        "next": [{activity, count, probability}] by descending count}.
+        Returns None if no case starts with prefix.
+        """
+        node = self.find(prefix)
+        if node is None:
+            return None
+        a = self.arrays
+        cases = int(a['node_count'][node])
+        kids = self.children(node)[:k]
+        return {
+            "prefix": list(prefix),
+            "cases": cases,
+            "end": {"count": int(a['node_end'][node]),
+                    "probability": round(int(a['node_end'][node]) / cases, 4) if cases else 0},
+            "next": [
+                {"activity": self.activities[a['node_act'][c]], "count": int(a['node_count'][c]),
+                 "probability": round(int(a['node_count'][c]) / cases, 4)}
+                for c in kids
+            ],
+        }
+
+
+def save_variants(trie, path=VARIANTS_FILE):
+    np.savez_compressed(path, **trie.arrays)
+    print(f"[OK] Saved '{path}' ({trie.n_variants} variants, {trie.n_nodes} trie nodes)")
+
+
+def load_variants(path=VARIANTS_FILE):
+    """VariantTrie written by save_variants(), or None if there is no artifact."""
+    try:
+        with np.load(path) as data:
+            return VariantTrie({k: data[k] for k in data.files})
+    except FileNotFoundError:
+        return None